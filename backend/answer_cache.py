@@ -0,0 +1,153 @@
+"""
+answer_cache.py - Cache de respostas para perguntas repetidas
+
+As mesmas perguntas ("qual o prazo de vigência?", "quem são as partes?") são
+feitas muitas vezes sobre o mesmo documento, e cada uma custa uma geração
+completa do modelo. Este módulo guarda as respostas já geradas:
+1. Chave = identidade do documento (hash do conteúdo) + pergunta normalizada
+2. Busca exata pela pergunta normalizada (sem acentos, pontuação ou caixa)
+3. Se não houver acerto exato, busca a pergunta mais parecida do mesmo documento
+   pelos embeddings (similaridade de cosseno acima de um limiar configurável)
+4. Expiração por tempo (TTL) e remoção das entradas usadas há mais tempo (LRU)
+5. Métricas de acertos exatos, semânticos e taxa de acerto
+
+Respostas em cache voltam em milissegundos em vez de dezenas de segundos.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Normaliza a pergunta para a busca exata (caixa, acentos, pontuação e espaços)"""
+    text = unicodedata.normalize("NFKD", question.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class _CachedAnswer:
+    __slots__ = ("answer", "embedding", "expires_at")
+
+    def __init__(self, answer: str, embedding: Optional[np.ndarray], expires_at: float):
+        self.answer = answer
+        self.embedding = embedding
+        self.expires_at = expires_at
+
+
+class AnswerCache:
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0, similarity_threshold: float = 0.92):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Similaridade de cosseno mínima para reaproveitar a resposta de outra pergunta
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Tuple[str, str], _CachedAnswer]" = OrderedDict()
+        # Perguntas em cache por documento, para a busca por vizinho mais próximo
+        self._by_document: Dict[str, Dict[Tuple[str, str], None]] = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _unit(embedding) -> Optional[np.ndarray]:
+        if embedding is None:
+            return None
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else None
+
+    def _remove(self, key: Tuple[str, str]):
+        """Remove uma entrada (chamar com o lock)"""
+        self._entries.pop(key, None)
+        keys = self._by_document.get(key[0])
+        if keys is not None:
+            keys.pop(key, None)
+            if not keys:
+                del self._by_document[key[0]]
+
+    def _live(self, key: Tuple[str, str], now: float) -> Optional[_CachedAnswer]:
+        """Entrada válida para a chave, descartando-a se expirou (chamar com o lock)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < now:
+            self._remove(key)
+            self.expirations += 1
+            return None
+        return entry
+
+    def get(self, document_key: str, question: str, embedding=None) -> Optional[Tuple[str, str]]:
+        """
+        Procura uma resposta para a pergunta no documento.
+        Retorna (resposta, "exact" | "semantic") ou None.
+        """
+        if not document_key:
+            return None
+        now = time.time()
+        key = (document_key, normalize_question(question))
+        with self._lock:
+            entry = self._live(key, now)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry.answer, "exact"
+
+            query = self._unit(embedding)
+            if query is not None:
+                best_key, best_score = None, self.similarity_threshold
+                for candidate_key in list(self._by_document.get(document_key, ())):
+                    candidate = self._live(candidate_key, now)
+                    if candidate is None or candidate.embedding is None:
+                        continue
+                    score = float(np.dot(candidate.embedding, query))
+                    if score >= best_score:
+                        best_key, best_score = candidate_key, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                    return self._entries[best_key].answer, "semantic"
+
+            self.misses += 1
+            return None
+
+    def put(self, document_key: str, question: str, answer: str, embedding=None):
+        """Guarda a resposta gerada para a pergunta"""
+        if not document_key or not answer:
+            return
+        key = (document_key, normalize_question(question))
+        with self._lock:
+            self._entries[key] = _CachedAnswer(answer, self._unit(embedding), time.time() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            self._by_document.setdefault(document_key, {})[key] = None
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get_stats(self) -> Dict:
+        """Retorna ocupação e taxa de acerto do cache de respostas"""
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
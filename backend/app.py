@@ -15,20 +15,37 @@ para responder com base no texto extraído do PDF.
 
 from fastapi import FastAPI, UploadFile, HTTPException, File, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 import os
 import tempfile
 from model_manager import ModelManager
-from pdf_processor import PDFProcessor
+from pdf_processor import PDFProcessor, EXTRACTOR_VERSION, shutdown_process_pool
+from index_cache import IndexCache
+from document_registry import DocumentEntry, DocumentRegistry
+from ingestion import IngestionPipeline
+from scheduler import Scheduler, QueueFullError
+from answer_cache import AnswerCache
+from intent_router import IntentRouter
+from text_normalizer import TextNormalizer
+from page_extractor import TieredExtractor
+from chunker import TextChunker
+from cancellation import CancellationToken, REASON_DOCUMENT_BUDGET
+from metrics import REGISTRY, STAGE_SECONDS, UPLOAD_BYTES
+from request_profiler import ProfileStore, ProfilingMiddleware, RequestProfiler, profiled
+from upload_limit import UploadLimitMiddleware
+from typing import Optional
+import hashlib
+import json
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 import logging
 import warnings
+import threading
 import time
 import uvicorn
 import torch
-import requests
 
 # Configurar logging e suprimir warnings específicos
 logging.basicConfig(level=logging.INFO)
@@ -51,86 +68,422 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Perfil sob demanda (ver request_profiler.py): sem PROFILING_TOKEN o middleware
+# nem é instalado e os endpoints /admin/profile* respondem 404
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+request_profiler = None
+if PROFILING_TOKEN:
+    request_profiler = RequestProfiler(
+        PROFILING_TOKEN,
+        ProfileStore(
+            os.getenv("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "pdf_analyzer_profiles"),
+            max_profiles=int(os.getenv("PROFILE_MAX_FILES", 50)),
+        ),
+        interval=float(os.getenv("PROFILE_INTERVAL", 0.005)),
+    )
+    app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+
 # Inicializar componentes globalmente, mas sem carregar modelo ainda
 model_manager = ModelManager()
-pdf_processor = PDFProcessor()
-executor = ThreadPoolExecutor(max_workers=2)
+# Admissão: filas limitadas e concorrência máxima para ingestão e geração
+INGESTION_CONCURRENCY = int(os.getenv("INGESTION_CONCURRENCY", 2))
+scheduler = Scheduler(
+    ingestion_concurrency=INGESTION_CONCURRENCY,
+    ingestion_waiting=int(os.getenv("INGESTION_QUEUE_SIZE", 8)),
+    generation_concurrency=int(os.getenv("GENERATION_CONCURRENCY", 4)),
+    generation_waiting=int(os.getenv("GENERATION_QUEUE_SIZE", 16)),
+)
+# Uma thread por ingestão admitida + uma para tarefas curtas (cache)
+executor = ThreadPoolExecutor(max_workers=INGESTION_CONCURRENCY + 1)
+index_cache = IndexCache(
+    cache_dir=os.getenv("PDF_CACHE_DIR"),
+    max_bytes=int(os.getenv("PDF_CACHE_MAX_BYTES", 2 * 1024 ** 3)),
+)
+# Extração de páginas: "process" usa um pool de processos por intervalos de páginas
+PDF_EXTRACTION_MODE = os.getenv("PDF_EXTRACTION_MODE", "process")
+PDF_EXTRACTION_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", os.cpu_count() or 4))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 8))
+# Normalização do texto extraído: forma Unicode opcional (ex: NFKC) e junção de palavras hifenizadas
+PDF_TEXT_UNICODE_FORM = os.getenv("PDF_TEXT_UNICODE_FORM") or None
+PDF_DEHYPHENATE = os.getenv("PDF_DEHYPHENATE", "0") == "1"
+# Extração rápida (PyPDF2) antes do layout do pdfplumber; "0" para usar só o pdfplumber
+PDF_FAST_TIER = os.getenv("PDF_FAST_TIER", "1") != "0"
+# Tamanho dos trechos indexados e sobreposição entre trechos vizinhos (tokens estimados)
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", 200))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 40))
+# Orçamentos de tempo da extração (s): por página e por documento; depois deles a
+# ingestão devolve o que já foi indexado, e o /upload-pdf desiste após PDF_UPLOAD_TIMEOUT
+PDF_PAGE_BUDGET = float(os.getenv("PDF_PAGE_BUDGET", 20))
+PDF_DOCUMENT_BUDGET = float(os.getenv("PDF_DOCUMENT_BUDGET", 150))
+PDF_UPLOAD_TIMEOUT = float(os.getenv("PDF_UPLOAD_TIMEOUT", 180))
+# Limite de tamanho do upload: aplicado pelo middleware enquanto o corpo chega (413)
+PDF_MAX_UPLOAD_BYTES = int(os.getenv("PDF_MAX_UPLOAD_BYTES", 512 * 1024 ** 2))
+app.add_middleware(UploadLimitMiddleware, max_bytes=PDF_MAX_UPLOAD_BYTES)
+UPLOAD_CHUNK_SIZE = 1024 ** 2
+# Documentos carregados, por ID, com orçamento de memória (LRU)
+document_registry = DocumentRegistry(
+    max_bytes=int(os.getenv("PDF_REGISTRY_MAX_BYTES", 1024 ** 3)),
+)
+# Regras de saudação, estatísticas e formato compiladas uma única vez
+intent_router = IntentRouter()
+# Respostas já geradas, por documento e pergunta (busca exata e por similaridade)
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1024)),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", 3600)),
+    similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", 0.92)),
+)
+
+def collect_cache_metrics():
+    """Acertos e falhas dos caches (contadores mantidos pelos próprios caches), lidos a cada consulta ao /metrics."""
+    answers = answer_cache.get_stats()
+    indexes = index_cache.get_stats()
+    return [
+        ("pdf_analyzer_answer_cache_lookups_total", "counter", "Consultas ao cache de respostas por resultado",
+         [({"result": "exact"}, answers["exact_hits"]), ({"result": "semantic"}, answers["semantic_hits"]),
+          ({"result": "miss"}, answers["misses"])]),
+        ("pdf_analyzer_answer_cache_hit_ratio", "gauge", "Fração das consultas respondidas pelo cache de respostas",
+         [({}, answers["hit_rate"])]),
+        ("pdf_analyzer_index_cache_lookups_total", "counter", "Consultas ao cache em disco de índices por resultado",
+         [({"result": "hit"}, indexes["hits"]), ({"result": "miss"}, indexes["misses"])]),
+        ("pdf_analyzer_index_cache_hit_ratio", "gauge", "Fração dos uploads servidos pelo cache em disco",
+         [({}, indexes["hit_rate"])]),
+    ]
+
+REGISTRY.register_collector(collect_cache_metrics)
 
 class ChatMessage(BaseModel):
     message: str
+    document_id: Optional[str] = None
+    # Conversa dentro do documento (histórico e contexto do Ollama); sem ID, usa a conversa padrão
+    conversation_id: Optional[str] = None
+
+def new_pdf_processor():
+    """Cria um PDFProcessor com a configuração de extração do servidor."""
+    return PDFProcessor(
+        extraction_mode=PDF_EXTRACTION_MODE,
+        max_workers=PDF_EXTRACTION_WORKERS,
+        pages_per_task=PDF_PAGES_PER_TASK,
+        normalizer=TextNormalizer(unicode_form=PDF_TEXT_UNICODE_FORM, dehyphenate=PDF_DEHYPHENATE),
+        extractor=TieredExtractor(fast_tier=PDF_FAST_TIER),
+        chunker=TextChunker(chunk_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS),
+    )
+
+async def save_upload_to_temp(file: UploadFile):
+    """Valida e salva o upload num arquivo temporário. Retorna (caminho, hash do conteúdo)."""
+    if not file.filename or not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Apenas arquivos PDF são permitidos e o nome do arquivo é obrigatório.")
+
+    # O corpo já foi recebido pelo Starlette (o limite durante a recepção fica no
+    # UploadLimitMiddleware). Copiar para um arquivo com nome, que o PyPDF2/pdfplumber
+    # abrem pelo caminho, em blocos de tamanho fixo, calculando o hash na cópia
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
+    temp_file_path = temp_file.name
+    digest = hashlib.sha256()
+    size = 0
+    start_time = time.perf_counter()
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > PDF_MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail=f"Arquivo PDF excede o limite de {PDF_MAX_UPLOAD_BYTES // (1024 ** 2)} MB.")
+            digest.update(chunk)
+            await run_in_threadpool(profiled(temp_file.write), chunk)
+        await run_in_threadpool(temp_file.close)
+        if not size:
+            raise HTTPException(status_code=400, detail="Arquivo PDF vazio.")
+    except BaseException:
+        temp_file.close()
+        await run_in_threadpool(remove_temp_file, temp_file_path)
+        raise
+
+    # Só a cópia para o arquivo temporário; a recepção do corpo é medida no UploadLimitMiddleware
+    STAGE_SECONDS.observe(time.perf_counter() - start_time, stage="upload_copy")
+    UPLOAD_BYTES.inc(size)
+    print(f"Arquivo PDF salvo temporariamente em: {temp_file_path} ({size} bytes)")
+    return temp_file_path, digest.hexdigest()
+
+def remove_temp_file(temp_file_path, retries=3):
+    """Remove o arquivo temporário do upload, se ainda existir (sem bloquear: novas tentativas são agendadas)."""
+    if temp_file_path and os.path.exists(temp_file_path):
+        try:
+            os.unlink(temp_file_path)
+            print(f"Arquivo temporário removido: {temp_file_path}")
+        except PermissionError:
+            # Ainda aberto por outro processo (ex: Windows); tentar de novo mais tarde
+            if retries > 0:
+                timer = threading.Timer(1.0, remove_temp_file, (temp_file_path, retries - 1))
+                timer.daemon = True
+                timer.start()
+            else:
+                print(f"Erro de permissão ao remover {temp_file_path}. Pode ainda estar em uso.")
+        except Exception as e:
+            print(f"Não foi possível remover o arquivo temporário {temp_file_path}: {str(e)}")
+
+def make_cache_key(content_hash, pdf_processor):
+    """Chave do cache: hash do conteúdo + versões e opções do extrator, normalização, chunker e modelo de embeddings."""
+    return IndexCache.make_key(
+        content_hash,
+        EXTRACTOR_VERSION,
+        pdf_processor.extractor.version,
+        pdf_processor.normalizer.version,
+        pdf_processor.chunker.version,
+        model_manager.embedding_model_name,
+        model_manager.index_version,
+    )
+
+def load_from_cache(cache_key, document, pdf_processor):
+    """Restaura páginas e índice do cache em disco. Retorna False se não houver entrada."""
+    cached = index_cache.get(cache_key)
+    if not cached:
+        return False
+    print("PDF encontrado no cache, pulando extração e embeddings.")
+    pdf_processor.load_pages(cached["pages"])
+    model_manager.load_index(
+        cached["chunks"], cached["embeddings"], cached["index"],
+        document=document, page_store=pdf_processor.pages
+    )
+    document.pages = pdf_processor.pages
+    document.refresh_snapshot()
+    document.status = "ready"
+    return True
+
+def new_cancellation_token():
+    """Token com os orçamentos de tempo de extração do servidor."""
+    return CancellationToken(document_budget=PDF_DOCUMENT_BUDGET, page_budget=PDF_PAGE_BUDGET)
+
+def ingest_document(document, pdf_processor, temp_file_path, cache_key, on_event=None, token=None):
+    """
+    Executa a ingestão em streaming (no executor) e grava o resultado no cache.
+    Retorna True se o documento ficou pronto para consulta (mesmo que parcial).
+    """
+    pipeline = IngestionPipeline(model_manager, pdf_processor, document, on_event=on_event)
+    if not pipeline.run(temp_file_path, token):
+        return False
+
+    document_registry.update_size(document.document_id)
+    if document.status != "ready":
+        # Resultado parcial (páginas puladas): não gravar no cache em disco
+        return True
+    # Gravar no cache sem atrasar a resposta; o texto dos trechos só é
+    # materializado durante a gravação, a partir dos intervalos sobre as páginas
+    chunks = (
+        {**metadata, "content": content}
+        for metadata, content in zip(document.chunk_metadata, document.text_chunks)
+    )
+    executor.submit(
+        index_cache.put,
+        cache_key,
+        pdf_processor.pages,
+        chunks,
+        document.embeddings,
+        document.index
+    )
+    return True
+
+def queue_full_exception(error: QueueFullError):
+    """Resposta 429 para requisições rejeitadas pelo controle de admissão."""
+    print(f"Requisição rejeitada: {error}")
+    return HTTPException(
+        status_code=429,
+        detail="Servidor ocupado. Tente novamente em instantes.",
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+async def cancel_on_disconnect(request: Request, token, job, interval: float = 1.0):
+    """Cancela a ingestão se o cliente desconectar antes do fim."""
+    while not job.done():
+        if await request.is_disconnected():
+            print("Cliente desconectou; cancelando a ingestão.")
+            token.cancel()
+            return
+        await asyncio.sleep(interval)
 
 @app.post("/upload-pdf")
-async def upload_pdf(file: UploadFile = File(...)):
+async def upload_pdf(request: Request, file: UploadFile = File(...)):
     """Endpoint para upload, processamento e indexação de PDF."""
     temp_file_path = None
+    document = None
+    job = None
+    try:
+        slot_started = await scheduler.ingestion.acquire()
+    except QueueFullError as e:
+        raise queue_full_exception(e)
+
     try:
-        if not file.filename or not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="Apenas arquivos PDF são permitidos e o nome do arquivo é obrigatório.")
-
-        # Salvar o arquivo temporariamente de forma segura
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            content = await file.read()
-            if not content:
-                 raise HTTPException(status_code=400, detail="Arquivo PDF vazio.")
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-            print(f"Arquivo PDF salvo temporariamente em: {temp_file_path}")
-
-        # Processar o PDF com timeout
-        print("Iniciando processamento do PDF no executor...")
+        temp_file_path, content_hash = await save_upload_to_temp(file)
+
+        # Cada upload tem seu próprio processador e sua própria entrada no registro
+        pdf_processor = new_pdf_processor()
+        document = DocumentEntry(content_hash=content_hash, filename=file.filename)
+        cache_key = make_cache_key(content_hash, pdf_processor)
+
+        loop = asyncio.get_event_loop()
+        if await loop.run_in_executor(executor, profiled(load_from_cache), cache_key, document, pdf_processor):
+            document_registry.add(document)
+            return build_upload_response(document.stats, document.document_id)
+
+        # Extração, chunking e indexação encadeados, com orçamentos de tempo
+        print("Iniciando ingestão do PDF no executor...")
+        document_registry.add(document)
+        token = new_cancellation_token()
+        job = loop.run_in_executor(
+            executor,
+            profiled(ingest_document),
+            document,
+            pdf_processor,
+            temp_file_path,
+            cache_key,
+            None,
+            token
+        )
+        watcher = asyncio.ensure_future(cancel_on_disconnect(request, token, job))
         try:
-            success, message, pages = await asyncio.wait_for(
-                asyncio.get_event_loop().run_in_executor(
-                    executor,
-                    pdf_processor.process_pdf,
-                    temp_file_path
-                ),
-                timeout=120.0  # Aumentado para 120s para PDFs maiores
-            )
-            print(f"Processamento do PDF concluído. Sucesso: {success}")
+            success = await asyncio.wait_for(asyncio.shield(job), timeout=PDF_UPLOAD_TIMEOUT)
+            print(f"Ingestão do PDF concluída. Sucesso: {success}")
         except asyncio.TimeoutError:
-            print("Timeout ao processar PDF")
-            raise HTTPException(status_code=504, detail="Timeout: O processamento do PDF demorou muito.")
+            # A ingestão para no próximo ponto de verificação; o que já foi indexado continua consultável
+            print("Timeout ao processar PDF; cancelando a ingestão.")
+            token.cancel(REASON_DOCUMENT_BUDGET)
+            if not document.is_ready():
+                raise HTTPException(status_code=504, detail="Timeout: O processamento do PDF demorou muito.")
+            return build_upload_response(document.stats, document.document_id, partial=True)
+        except asyncio.CancelledError:
+            # Requisição abandonada: não continuar extraindo para ninguém
+            token.cancel()
+            raise
         except Exception as e:
-             print(f"Erro durante execução do process_pdf no executor: {e}")
+             print(f"Erro durante a ingestão do PDF no executor: {e}")
              raise HTTPException(status_code=500, detail=f"Erro interno ao processar PDF: {e}")
+        finally:
+            watcher.cancel()
 
-        if not success or not pdf_processor.is_loaded():
-            print("Falha no processamento do PDF ou PDF não carregado após processamento.")
+        if not success:
+            print("Falha no processamento do PDF ou nenhum conteúdo indexado.")
             raise HTTPException(status_code=500, detail="Erro: Falha ao processar o conteúdo do PDF.")
 
-        # Indexar o PDF com timeout
-        print("Iniciando indexação do PDF no executor...")
+        return build_upload_response(document.stats, document.document_id)
+
+    except HTTPException as http_exc:
+         print(f"HTTP Exception em /upload-pdf: {http_exc.detail}")
+         if document is not None:
+             document_registry.remove(document.document_id)
+         raise http_exc
+    except Exception as e:
+        print(f"Erro inesperado em /upload-pdf: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        if document is not None:
+            document_registry.remove(document.document_id)
+        raise HTTPException(status_code=500, detail=f"Erro inesperado no servidor durante o upload: {str(e)}")
+    finally:
+        if job is not None and not job.done():
+            # Vaga e arquivo temporário só são liberados quando a ingestão realmente termina
+            job.add_done_callback(lambda _: scheduler.ingestion.release(slot_started))
+            job.add_done_callback(lambda _: executor.submit(remove_temp_file, temp_file_path))
+        else:
+            scheduler.ingestion.release(slot_started)
+            # Tentar remover o arquivo temporário se ele foi criado (fora do loop de eventos)
+            await run_in_threadpool(remove_temp_file, temp_file_path)
+
+def format_sse(event):
+    """Formata um evento de progresso como Server-Sent Event."""
+    return f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+@app.post("/upload-pdf/stream")
+async def upload_pdf_stream(file: UploadFile = File(...)):
+    """
+    Upload com progresso via SSE: emite eventos a cada página extraída e a cada
+    lote indexado. O document_id vem no primeiro evento, e o documento já pode
+    ser consultado no /chat antes do fim da ingestão.
+    """
+    try:
+        slot_started = await scheduler.ingestion.acquire()
+    except QueueFullError as e:
+        raise queue_full_exception(e)
+
+    try:
+        temp_file_path, content_hash = await save_upload_to_temp(file)
+    except BaseException:
+        scheduler.ingestion.release(slot_started)
+        raise
+
+    pdf_processor = new_pdf_processor()
+    document = DocumentEntry(content_hash=content_hash, filename=file.filename)
+    cache_key = make_cache_key(content_hash, pdf_processor)
+    document_registry.add(document)
+
+    loop = asyncio.get_event_loop()
+    events = asyncio.Queue()
+
+    def on_event(event):
+        # Chamado na thread do executor: repassar ao loop de eventos
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    def run():
+        if load_from_cache(cache_key, document, pdf_processor):
+            document_registry.update_size(document.document_id)
+            return True
+        return ingest_document(document, pdf_processor, temp_file_path, cache_key, on_event=on_event, token=token)
+
+    token = new_cancellation_token()
+    job = loop.run_in_executor(executor, profiled(run))
+    # A vaga de ingestão fica ocupada até o fim do trabalho, não da resposta HTTP
+    job.add_done_callback(lambda _: scheduler.ingestion.release(slot_started))
+    # O arquivo temporário só é removido quando a ingestão termina
+    job.add_done_callback(lambda _: executor.submit(remove_temp_file, temp_file_path))
+
+    async def event_stream():
         try:
-            pages_to_index = pdf_processor.get_pages_for_indexing()
-            if not pages_to_index:
-                 print("Nenhum conteúdo de página para indexar.")
-                 raise HTTPException(status_code=500, detail="Erro: Nenhum conteúdo extraído do PDF para consulta.")
-
-            await asyncio.wait_for(
-                asyncio.get_event_loop().run_in_executor(
-                    executor,
-                    model_manager.index_pdf,
-                    pages_to_index
-                ),
-                timeout=60.0  # 60 segundos para indexação
-            )
-            print("Indexação do PDF concluída com sucesso.")
-        except asyncio.TimeoutError:
-            print("Timeout ao indexar PDF")
-            raise HTTPException(status_code=504, detail="Timeout: A indexação do conteúdo do PDF demorou muito.")
+            async for event in ingestion_events():
+                yield event
+        finally:
+            if not job.done():
+                # Cliente desconectou no meio da ingestão: parar a extração (o que já foi
+                # indexado continua consultável pelo document_id já enviado)
+                print("Cliente desconectou; cancelando a ingestão.")
+                token.cancel()
+
+    async def ingestion_events():
+        yield format_sse({"event": "registered", "document_id": document.document_id, "filename": file.filename})
+        while True:
+            get_event = asyncio.ensure_future(events.get())
+            done, _ = await asyncio.wait({get_event, job}, return_when=asyncio.FIRST_COMPLETED)
+            if get_event in done:
+                yield format_sse(get_event.result())
+                continue
+            get_event.cancel()
+            break
+
+        # Esvaziar eventos restantes e enviar o resultado final
+        while not events.empty():
+            yield format_sse(events.get_nowait())
+        try:
+            success = job.result()
         except Exception as e:
-             print(f"Erro durante execução do index_pdf no executor: {e}")
-             raise HTTPException(status_code=500, detail=f"Erro interno ao indexar PDF: {e}")
+            success = False
+            print(f"Erro durante a ingestão do PDF no executor: {e}")
+        if success:
+            yield format_sse({"event": "done", **build_upload_response(document.stats, document.document_id)})
+        else:
+            document_registry.remove(document.document_id)
+            yield format_sse({"event": "error", "document_id": document.document_id,
+                              "message": "Erro: Falha ao processar o conteúdo do PDF."})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
 
-        # Obter estatísticas após processamento e indexação bem-sucedidos
-        stats = pdf_processor.get_statistics()
-        if not stats["success"]:
-            print("Erro ao obter estatísticas após processamento bem-sucedido.")
-            raise HTTPException(status_code=500, detail=stats.get("message", "Erro interno ao obter estatísticas do PDF."))
+def build_upload_response(stats, document_id, partial=False):
+    """Monta a resposta do /upload-pdf a partir das estatísticas do documento."""
+    stats = dict(stats)
+    partial = partial or stats.get("partial", False)
+    if not stats["success"]:
+        print("Erro ao obter estatísticas após processamento bem-sucedido.")
+        raise HTTPException(status_code=500, detail=stats.get("message", "Erro interno ao obter estatísticas do PDF."))
 
-        # Formatar mensagem de resposta para o chat
-        response_message = f"""PDF processado e indexado com sucesso!
+    # Formatar mensagem de resposta para o chat
+    response_message = f"""PDF processado e indexado com sucesso!
 
 **Estatísticas do Documento:**
 - Páginas Totais: {stats['total_pages']}
@@ -141,82 +494,60 @@ async def upload_pdf(file: UploadFile = File(...)):
 
 Agora você pode fazer perguntas sobre este documento.
 """
-        # Estrutura final da resposta
-        response_data = {
-            "success": True,
-            "message": response_message,
-            "statistics": response_message, # Adicionado para garantir compatibilidade com frontend
-            "stats": stats
-        }
+    if partial:
+        skipped = len(stats.get("skipped_pages", []))
+        response_message += (f"\n**Atenção:** processamento parcial (tempo esgotado); "
+                             f"{skipped} página(s) não foram extraídas.\n" if skipped else
+                             "\n**Atenção:** processamento parcial (tempo esgotado); "
+                             "o restante do documento não foi indexado.\n")
+    # Estrutura final da resposta
+    response_data = {
+        "success": True,
+        "document_id": document_id,
+        "message": response_message,
+        "statistics": response_message, # Adicionado para garantir compatibilidade com frontend
+        "stats": stats,
+        "partial": partial
+    }
 
-        # Logar EXATAMENTE o que está sendo retornado
-        print(f"Retornando resposta para /upload-pdf: {response_data}")
+    # Logar EXATAMENTE o que está sendo retornado
+    print(f"Retornando resposta para /upload-pdf: {response_data}")
 
-        # Retornar a estrutura
-        return response_data
+    # Retornar a estrutura
+    return response_data
 
-    except HTTPException as http_exc:
-         print(f"HTTP Exception em /upload-pdf: {http_exc.detail}")
-         raise http_exc
-    except Exception as e:
-        print(f"Erro inesperado em /upload-pdf: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=f"Erro inesperado no servidor durante o upload: {str(e)}")
-    finally:
-        # Tentar remover o arquivo temporário se ele foi criado
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                time.sleep(0.5) # Pequeno delay síncrono
-                os.unlink(temp_file_path)
-                print(f"Arquivo temporário removido: {temp_file_path}")
-            except PermissionError:
-                 print(f"Erro de permissão ao remover {temp_file_path}. Pode ainda estar em uso.")
-            except Exception as e:
-                print(f"Não foi possível remover o arquivo temporário {temp_file_path}: {str(e)}")
-
-def responder_pergunta_simples(pergunta, stats):
+def responder_pergunta_simples(pergunta, stats, route=None):
     """
     Responde a perguntas específicas sobre o PDF baseado nas estatísticas
     fornecidas, sem usar o modelo de IA.
     """
-    pergunta_lower = pergunta.lower()
-    
-    # Verifica formato de retorno solicitado
-    formato_retorno = verificar_formato_retorno(pergunta)
+    # Intenção e formato de retorno solicitados (uma única passada pela pergunta)
+    route = route or intent_router.route(pergunta)
+    formato_retorno = route.format
     
     # Verifica perguntas sobre número de páginas
-    termos_paginas = ["quantas páginas", "quantas paginas", "número de páginas", "numero de paginas", 
-                      "total de páginas", "total de paginas", "páginas tem", "paginas tem"]
-    if any(termo in pergunta_lower for termo in termos_paginas):
+    if route.intent == "pages":
         resposta = f"O documento tem {stats['total_pages']} página(s)."
         return formatar_resposta(resposta, formato_retorno)
     
     # Verifica perguntas sobre número de palavras
-    termos_palavras = ["quantas palavras", "número de palavras", "numero de palavras", 
-                       "total de palavras", "palavras tem", "contagem de palavras"]
-    if any(termo in pergunta_lower for termo in termos_palavras):
+    if route.intent == "words":
         resposta = f"O documento tem aproximadamente {stats['total_words']} palavra(s)."
         return formatar_resposta(resposta, formato_retorno)
     
     # Verifica perguntas sobre idioma
-    termos_idioma = ["qual idioma", "em que idioma", "idioma do", "língua do", "lingua do", 
-                     "linguagem do", "escrito em qual"]
-    if any(termo in pergunta_lower for termo in termos_idioma):
+    if route.intent == "language":
         resposta = f"O documento está escrito em {stats['language'].upper()}."
         return formatar_resposta(resposta, formato_retorno)
     
     # Verifica perguntas sobre média de palavras por página
-    termos_media_palavras = ["média de palavras", "media de palavras", "palavras por página", 
-                            "palavras por pagina", "média por página", "media por pagina"]
-    if any(termo in pergunta_lower for termo in termos_media_palavras):
+    if route.intent == "average_words":
         media = stats['average_words_per_page']
         resposta = f"O documento tem uma média de {media:.1f} palavra(s) por página."
         return formatar_resposta(resposta, formato_retorno)
     
     # Verifica perguntas sobre tamanho do documento (simples)
-    termos_tamanho = ["tamanho", "grande", "pequeno", "extenso", "longo", "curto"]
-    if any(termo in pergunta_lower for termo in termos_tamanho):
+    if route.intent == "size":
         if stats['total_words'] < 100:
             resposta = f"O documento é muito curto, com apenas {stats['total_words']} palavras em {stats['total_pages']} página(s)."
         elif stats['total_words'] < 500:
@@ -264,131 +595,293 @@ def formatar_resposta(resposta, formato):
     # Se for um formato não implementado ou não reconhecido, retorna a resposta original
     return resposta
 
-@app.post("/chat")
-async def chat(message: ChatMessage):
-    """Endpoint para chat com o modelo sobre o PDF carregado."""
-    if not pdf_processor.is_loaded():
+def prepare_chat(message: ChatMessage):
+    """
+    Etapas comuns ao /chat e ao /chat/stream: valida a mensagem, responde as
+    perguntas rápidas e, se o modelo for necessário, monta o prompt.
+    Retorna (resposta_pronta, None) ou (None, contexto_para_o_modelo).
+    """
+    document = document_registry.get(message.document_id)
+    if document is None or not document.is_ready():
         return {
             "success": False,
             "response": "Nenhum PDF foi carregado. Por favor, carregue um PDF primeiro."
-        }
+        }, None
         
     if not message or not message.message.strip():
          return {
             "success": False,
             "response": "Mensagem vazia não permitida."
-         }
+         }, None
 
     user_message = message.message.strip()
     print(f"Recebida pergunta no chat: '{user_message}'")
 
+    # Retrato imutável do documento: estatísticas e texto completo já calculados na ingestão
+    snapshot = document.snapshot
+    stats = snapshot.statistics
+    
+    # Intenção (saudação, fora do escopo, estatística) e formato solicitado
+    route = intent_router.route(user_message)
+    formato_resposta = route.format
+    
+    if not stats.get("has_text"):
+        return {
+            "success": False,
+            "response": "Não foi possível extrair conteúdo do PDF."
+        }, None
+    
+    # Verificar se é uma saudação simples
+    if route.intent == "greeting":
+        resposta = f"Olá! Posso responder perguntas sobre o PDF que você carregou. O que gostaria de saber sobre o documento?"
+        return {
+            "success": True,
+            "response": formatar_resposta(resposta, formato_resposta)
+        }, None
+    
+    # Verificar perguntas não relacionadas ao conteúdo do PDF
+    if route.intent == "unrelated":
+        resposta = "Desculpe, só posso responder perguntas relacionadas ao conteúdo do PDF carregado."
+        return {
+            "success": True,
+            "response": formatar_resposta(resposta, formato_resposta)
+        }, None
+    
+    # Responder perguntas simples sobre estatísticas
+    resposta_simples = responder_pergunta_simples(user_message, stats, route)
+    if resposta_simples:
+        print("Pergunta respondida com resposta rápida sobre estatísticas")
+        return {
+            "success": True,
+            "response": resposta_simples  # Já está formatada
+        }, None
+    
+    # Embedding da pergunta: usado tanto no cache de respostas quanto na busca semântica
+    query_embedding = model_manager.embed_query(user_message)
+    document_key = document.content_hash or document.document_id
+    conversation = document.conversation(message.conversation_id)
+    # Conversa em andamento: reaproveitar o contexto do Ollama em vez do histórico em texto
+    history, model_context, base_turn = model_manager.conversation_state(conversation)
+    # Cache só para a primeira pergunta da conversa (mesma regra de cache_answer): uma
+    # continuação depende do histórico e não pode receber a resposta de outra pergunta
+    cached = None
+    if not history and not model_context:
+        cached = answer_cache.get(document_key, user_message, query_embedding)
+    if cached:
+        ia_response, kind = cached
+        print(f"Pergunta respondida pelo cache de respostas ({kind})")
+        model_manager.record_turn(user_message, ia_response, conversation, base_turn=base_turn)
+        return {
+            "success": True,
+            "response": formatar_resposta(ia_response, formato_resposta),
+            "cached": kind
+        }, None
+    
+    # Para qualquer outra pergunta, usar o modelo de IA
+    print("Usando o modelo de IA para responder à pergunta...")
+    
+    # Montar o prompt dentro da janela de tokens do modelo: trechos recuperados
+    # (vetorial + BM25), escolhidos por MMR; sem resultados, usa o início do documento
+    prompt = model_manager.pack_prompt(
+        user_message,
+        document=document,
+        query_embedding=query_embedding,
+        fallback=snapshot.head,
+        model_context=model_context,
+        history=history,
+    )
+    
+    return None, {
+        "document": document,
+        "conversation": conversation,
+        "base_turn": base_turn,
+        "history": history,
+        "user_message": user_message,
+        "formato_resposta": formato_resposta,
+        "prompt": prompt,
+        "document_key": document_key,
+        "query_embedding": query_embedding,
+        "model_context": model_context,
+    }
+
+def cache_answer(context, ia_response: str):
+    """
+    Guarda no cache a resposta gerada pelo modelo, só com o documento completo e
+    sem conversa anterior: uma resposta que dependeu do histórico ou do contexto
+    do Ollama (ex: "e o prazo dele?") não vale para outras conversas.
+    """
+    if context["document"].status != "ready":
+        return
+    if context["history"] or context["model_context"]:
+        return
+    answer_cache.put(context["document_key"], context["user_message"], ia_response, context["query_embedding"])
+
+def record_turn(context, ia_response: str, model_context):
+    """Registra a resposta do modelo na conversa da pergunta (ver ModelManager.record_turn)."""
+    model_manager.record_turn(context["user_message"], ia_response, context["conversation"],
+                              model_context=model_context, base_turn=context["base_turn"])
+
+CHAT_ERROR_RESPONSE = {
+    "success": False,
+    "response": "Ocorreu um erro inesperado ao processar sua pergunta. Por favor, tente novamente."
+}
+
+@app.post("/chat")
+async def chat(message: ChatMessage):
+    """Endpoint para chat com o modelo sobre o PDF carregado."""
     try:
-        # Obter estatísticas do PDF para respostas rápidas
-        stats = pdf_processor.get_statistics()
-        
-        # Verificar formato solicitado
-        formato_resposta = verificar_formato_retorno(user_message)
-        
-        # Recuperar o conteúdo completo do PDF para resposta direta
-        all_content = ""
-        for page in pdf_processor.pages:
-            if "content" in page:
-                all_content += page["content"] + "\n\n"
-        
-        if not all_content.strip():
-            return {
-                "success": False,
-                "response": "Não foi possível extrair conteúdo do PDF."
-            }
-        
-        # Verificar se é uma saudação simples
-        saudacoes = ["oi", "olá", "ola", "bom dia", "boa tarde", "boa noite", "hey", "hi", "hello"]
-        pergunta_lower = user_message.lower()
-        
-        if pergunta_lower in saudacoes or pergunta_lower.startswith(tuple(saudacoes)):
-            resposta = f"Olá! Posso responder perguntas sobre o PDF que você carregou. O que gostaria de saber sobre o documento?"
-            return {
-                "success": True,
-                "response": formatar_resposta(resposta, formato_resposta)
-            }
-        
-        # Verificar perguntas não relacionadas ao conteúdo do PDF
-        perguntas_nao_relacionadas = ["como vai", "tudo bem", "quem é você", "quem e voce", "qual seu nome"]
-        if any(frase in pergunta_lower for frase in perguntas_nao_relacionadas):
-            resposta = "Desculpe, só posso responder perguntas relacionadas ao conteúdo do PDF carregado."
-            return {
-                "success": True,
-                "response": formatar_resposta(resposta, formato_resposta)
-            }
-        
-        # Responder perguntas simples sobre estatísticas
-        resposta_simples = responder_pergunta_simples(user_message, stats)
-        if resposta_simples:
-            print("Pergunta respondida com resposta rápida sobre estatísticas")
-            return {
-                "success": True,
-                "response": resposta_simples  # Já está formatada
-            }
-        
-        # Para qualquer outra pergunta, usar o modelo de IA
-        print("Usando o modelo de IA para responder à pergunta...")
-        
-        # Obter contexto relevante do PDF usando a busca semântica
-        relevant_context = model_manager.search_pdf(user_message)
-        
-        # Verificar se conseguimos encontrar contexto relevante
-        if not relevant_context or "Não foi possível encontrar" in relevant_context:
-            print("Contexto não encontrado, usando o conteúdo completo do PDF")
-            # Se não encontrou contexto relevante, usar conteúdo completo (limitado)
-            if len(all_content) > 4000:  # Limitar tamanho para não sobrecarregar o modelo
-                relevant_context = all_content[:4000] + "..."
-            else:
-                relevant_context = all_content
-        
-        # Preparar o prompt para o modelo
-        prompt = model_manager.format_prompt(relevant_context, user_message)
+        # Busca semântica e montagem do prompt usam CPU: rodar fora do loop de eventos
+        ready_response, context = await run_in_threadpool(profiled(prepare_chat), message)
+        if ready_response:
+            return ready_response
         
-        # Gerar resposta usando o modelo
-        ia_response = model_manager.generate_response(prompt)
+        # Gerar resposta usando o modelo (chamada assíncrona ao Ollama)
+        async with scheduler.generation.slot():
+            result = await model_manager.generate_answer(context["prompt"], context["model_context"])
+        ia_response = result["response"]
+        if result["generated"]:
+            cache_answer(context, ia_response)
         
-        # Adicionar ao histórico de conversa
-        model_manager.add_to_history(user_message, ia_response)
+        # Adicionar ao histórico de conversa (com o contexto devolvido pelo Ollama)
+        record_turn(context, ia_response, result["context"])
         
         # Retornar a resposta formatada
         return {
             "success": True,
-            "response": formatar_resposta(ia_response, formato_resposta)
+            "response": formatar_resposta(ia_response, context["formato_resposta"])
         }
         
+    except QueueFullError as e:
+        raise queue_full_exception(e)
     except Exception as e:
         print(f"Erro inesperado em /chat: {str(e)}")
         import traceback
         print(traceback.format_exc())
         
-        return {
-            "success": False,
-            "response": "Ocorreu um erro inesperado ao processar sua pergunta. Por favor, tente novamente."
-        }
+        return CHAT_ERROR_RESPONSE
+
+@app.post("/chat/stream")
+async def chat_stream(message: ChatMessage):
+    """
+    Chat com streaming de tokens via SSE: eventos "token" conforme o modelo gera
+    (sem o raciocínio interno) e um evento "done" com a resposta final formatada
+    e as métricas (tempo até o primeiro token, tokens por segundo).
+    """
+    try:
+        ready_response, context = await run_in_threadpool(profiled(prepare_chat), message)
+    except Exception as e:
+        print(f"Erro inesperado em /chat/stream: {str(e)}")
+        ready_response, context = CHAT_ERROR_RESPONSE, None
+
+    # Rejeitar com 429 logo de cara se a fila estiver cheia. A vaga só é ocupada
+    # dentro do gerador: se o cliente desconectar antes do corpo começar, o gerador
+    # nem inicia e não há vaga a liberar
+    if not ready_response:
+        try:
+            scheduler.generation.check_admission()
+        except QueueFullError as e:
+            raise queue_full_exception(e)
+
+    async def event_stream():
+        if ready_response:
+            yield format_sse({"event": "done", **ready_response})
+            return
+
+        try:
+            async with scheduler.generation.slot():
+                async for item in model_manager.stream_response(context["prompt"], context["model_context"]):
+                    if item["type"] == "token":
+                        yield format_sse({"event": "token", "text": item["text"]})
+                        continue
+
+                    ia_response = item["response"]
+                    if item.get("generated"):
+                        cache_answer(context, ia_response)
+                    record_turn(context, ia_response, item["context"])
+                    yield format_sse({
+                        "event": "done",
+                        "success": True,
+                        "response": formatar_resposta(ia_response, context["formato_resposta"]),
+                        "stats": item["stats"],
+                    })
+        except QueueFullError as e:
+            # A fila encheu entre a verificação e o início do corpo
+            print(f"Requisição rejeitada: {e}")
+            yield format_sse({"event": "done", "success": False,
+                              "response": "Servidor ocupado. Tente novamente em instantes.",
+                              "retry_after": e.retry_after})
+        except Exception as e:
+            print(f"Erro inesperado em /chat/stream: {str(e)}")
+            yield format_sse({"event": "done", **CHAT_ERROR_RESPONSE})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 @app.get("/health")
 async def health_check():
     """Verifica a saúde do servidor e o status do modelo."""
     # Para Ollama, verificamos a conexão em vez do modelo carregado
     try:
-        ollama_status = requests.get(f"{model_manager.ollama_api_url}/tags", timeout=5)
-        model_loaded = ollama_status.status_code == 200
-    except:
+        await model_manager.ollama.tags(timeout=5)
+        model_loaded = True
+    except Exception:
         model_loaded = False
         
-    pdf_processed = pdf_processor.is_loaded()
+    pdf_processed = len(document_registry) > 0
     return {
         "status": "ok",
         "model_status": "connected" if model_loaded else "not_connected",
         "pdf_status": "processed" if pdf_processed else "no_pdf",
         "model_name": model_manager.model_name,
-        "device": model_manager.device
+        "device": model_manager.device,
+        "cache": index_cache.get_stats(),
+        "answer_cache": answer_cache.get_stats(),
+        "documents": document_registry.get_stats(),
+        "scheduler": scheduler.get_stats()
     }
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Métricas de latência por etapa, tokens do Ollama e acertos dos caches (formato do Prometheus)."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def require_profiler(request: Request):
+    """Perfilador configurado e token correto no cabeçalho X-Profile (senão, 404/403)."""
+    if request_profiler is None:
+        raise HTTPException(status_code=404, detail="Perfil de requisições desativado (defina PROFILING_TOKEN).")
+    if not request_profiler.authorized(request.headers.get("x-profile")):
+        raise HTTPException(status_code=403, detail="Token de perfil inválido.")
+    return request_profiler
+
+@app.post("/admin/profile")
+async def arm_profiling(request: Request, count: int = 1):
+    """Perfila as próximas `count` requisições de /upload-pdf e /chat (0 desarma)."""
+    profiler = require_profiler(request)
+    return {"armed": profiler.arm(count)}
+
+@app.get("/admin/profiles")
+async def list_profiles(request: Request):
+    """Perfis gravados (ID, caminho, duração, amostras), do mais recente ao mais antigo."""
+    profiler = require_profiler(request)
+    return {"profiler": profiler.get_stats(), "profiles": await run_in_threadpool(profiler.store.list)}
+
+@app.get("/admin/profiles/{profile_id}")
+async def download_profile(request: Request, profile_id: str):
+    """Pilhas colapsadas do perfil (flamegraph.pl, speedscope)."""
+    profiler = require_profiler(request)
+    path = profiler.store.folded_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado.")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
+
+@app.on_event("startup")
+async def startup_event():
+    """Verifica a disponibilidade do Ollama sem bloquear a inicialização."""
+    # Carregar os perfis do langdetect antes da primeira pergunta
+    await run_in_threadpool(model_manager.language_detector.warm_up)
+    # Carregar o tokenizador da contagem de tokens fora do caminho da primeira pergunta
+    await run_in_threadpool(model_manager.context_packer.token_counter.warm_up)
+    await model_manager.check_ollama_available()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Limpa recursos ao desligar o servidor."""
@@ -398,6 +891,9 @@ async def shutdown_event():
     print("Sinalizando para o executor de threads desligar (wait=False)...")
     executor.shutdown(wait=False) # Alterado para False
     print("Sinal de desligamento enviado ao executor, não esperando mais.")
+    shutdown_process_pool()
+    # Fechar as conexões mantidas com o Ollama
+    await model_manager.ollama.close()
 
     # A limpeza dos recursos do model_manager será feita pelo seu __del__
     print("Permitindo que ModelManager.__del__ cuide da limpeza de seus recursos.")
@@ -410,76 +906,7 @@ def verificar_formato_retorno(pergunta):
     Verifica se a pergunta é sobre o formato em que a resposta deve ser retornada.
     Retorna None se a pergunta não for sobre formato, ou uma string com o formato solicitado.
     """
-    pergunta_lower = pergunta.lower()
-    
-    # Lista de termos que indicam pedido de formatação específica
-    termos_formatacao = {
-        "tópicos": ["lista de tópicos", "em tópicos", "em forma de tópicos", "formato de tópicos", 
-                   "em bullet points", "em pontos", "em itens", "listado", "como lista", 
-                   "enumere", "enumerar", "enumerado", "como tópicos", "liste", "listar"],
-        
-        "tabela": ["em tabela", "formato de tabela", "como tabela", "em forma de tabela", 
-                  "organize em tabela", "apresente em tabela", "mostre em tabela", 
-                  "formato tabular", "estrutura de tabela", "tabular"],
-        
-        "resumo": ["resumidamente", "de forma resumida", "em resumo", "sintetize", "síntese", 
-                  "versão resumida", "versao resumida", "resuma", "resumo", "sumarize", 
-                  "sumário", "sumario", "de forma concisa", "concisamente"],
-        
-        "detalhado": ["detalhadamente", "em detalhes", "de forma detalhada", "com detalhes", 
-                     "explicação detalhada", "explicacao detalhada", "seja detalhado", 
-                     "com informações completas", "com informacoes completas", 
-                     "de maneira abrangente", "abrangente", "completo", "aprofundado"],
-        
-        "markdown": ["em markdown", "formato markdown", "use markdown", "com markdown", 
-                    "sintaxe markdown", "utilize markdown"],
-        
-        "html": ["em html", "formato html", "use html", "com html", "sintaxe html", 
-                "utilize html", "código html", "codigo html"],
-        
-        "json": ["em json", "formato json", "use json", "com json", "sintaxe json", 
-                "utilize json", "código json", "codigo json", "notação json", "notacao json"],
-        
-        "gráfico": ["em gráfico", "em grafico", "formato de gráfico", "formato de grafico", 
-                   "como gráfico", "como grafico", "visualização", "visualizacao", 
-                   "gráfico de barras", "grafico de barras", "gráfico de pizza", 
-                   "grafico de pizza", "de forma visual", "visualmente"]
-    }
-    
-    # Padrões para reconhecer pedidos de formatação
-    padroes_formatacao = [
-        r"responda (?:em|usando|com|no formato(?: de)?|como) ([\w\s]+)",
-        r"apresente (?:em|usando|com|no formato(?: de)?|como) ([\w\s]+)",
-        r"mostre (?:em|usando|com|no formato(?: de)?|como) ([\w\s]+)",
-        r"exiba (?:em|usando|com|no formato(?: de)?|como) ([\w\s]+)",
-        r"formate (?:em|usando|como|no formato(?: de)?) ([\w\s]+)",
-        r"quero (?:em|no formato(?: de)?|como) ([\w\s]+)",
-        r"formato (?:de|em) ([\w\s]+)",
-        r"organizado (?:em|como) ([\w\s]+)"
-    ]
-    
-    # Verifica se a pergunta tem algum termo direto de formatação
-    for formato, termos in termos_formatacao.items():
-        if any(termo in pergunta_lower for termo in termos):
-            return formato
-    
-    # Verifica se a pergunta segue algum padrão de pedido de formatação
-    import re
-    for padrao in padroes_formatacao:
-        match = re.search(padrao, pergunta_lower)
-        if match:
-            formato_solicitado = match.group(1).strip()
-            
-            # Mapeia o texto extraído para um formato reconhecido
-            for formato, termos in termos_formatacao.items():
-                if any(termo.endswith(formato_solicitado) or 
-                       termo.startswith(formato_solicitado) or 
-                       formato_solicitado in termo
-                       for termo in termos):
-                    return formato
-    
-    # Se não encontrou nenhum formato específico
-    return None
+    return intent_router.route(pergunta).format
 
 if __name__ == "__main__":
     print("Iniciando servidor Uvicorn...")
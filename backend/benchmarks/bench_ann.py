@@ -0,0 +1,130 @@
+"""
+bench_ann.py - Recall vs latência dos índices aproximados contra a busca exata
+
+Para cada tamanho de corpus, constrói o índice exato (IndexFlatIP, referência),
+HNSW e IVF com o IndexBuilder do servidor e mede:
+- tempo de construção (inclui o treino do IVF)
+- latência por consulta (uma pergunta por vez, como em search_pdf)
+- recall@k em relação à busca exata, variando efSearch / nprobe
+
+Os vetores são sintéticos (agrupados em tópicos, dimensão do all-MiniLM) e
+normalizados, para não depender do modelo de embeddings. Use --embeddings para
+medir com vetores reais salvos em .npy (ex: embeddings.npy do cache em disco).
+
+Uso (a partir da pasta backend):
+    python benchmarks/bench_ann.py --vectors 20000 200000
+    python benchmarks/bench_ann.py --embeddings caminho/embeddings.npy
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_index import IndexBuilder, normalize  # noqa: E402
+
+
+def synthetic_embeddings(count: int, dim: int = 384, topics: int = 200, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    labels = rng.integers(0, topics, count)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    return normalize(vectors)
+
+
+def query_latencies(index, queries: np.ndarray, k: int):
+    results = np.empty((len(queries), k), dtype=np.int64)
+    latencies = []
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, indices = index.search(queries[i:i + 1], k)
+        latencies.append(time.perf_counter() - start)
+        results[i] = indices[0]
+    latencies.sort()
+    return results, {
+        "latency_ms_avg": 1000 * sum(latencies) / len(latencies),
+        "latency_ms_p95": 1000 * latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+    }
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(row) & set(expected)) for row, expected in zip(found, truth))
+    return hits / truth.size
+
+
+def run(embeddings: np.ndarray, queries: np.ndarray, k: int, ef_values, nprobe_values):
+    results = []
+
+    start = time.perf_counter()
+    flat = IndexBuilder().build(embeddings, "flat")
+    build_seconds = time.perf_counter() - start
+    truth, timing = query_latencies(flat, queries, k)
+    results.append({"index": "flat", "build_seconds": build_seconds, "recall": 1.0, **timing})
+
+    builder = IndexBuilder()
+    start = time.perf_counter()
+    hnsw = builder.build(embeddings, "hnsw")
+    build_seconds = time.perf_counter() - start
+    for ef in ef_values:
+        hnsw.hnsw.efSearch = ef
+        found, timing = query_latencies(hnsw, queries, k)
+        results.append({"index": "hnsw", "ef_search": ef, "build_seconds": build_seconds,
+                        "recall": recall(found, truth), **timing})
+
+    start = time.perf_counter()
+    ivf = builder.build(embeddings, "ivf")
+    build_seconds = time.perf_counter() - start
+    for nprobe in nprobe_values:
+        if nprobe > ivf.nlist:
+            continue
+        ivf.nprobe = nprobe
+        found, timing = query_latencies(ivf, queries, k)
+        results.append({"index": "ivf", "nlist": ivf.nlist, "nprobe": nprobe, "build_seconds": build_seconds,
+                        "recall": recall(found, truth), **timing})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, nargs="+", default=[20000, 100000])
+    parser.add_argument("--embeddings", help="Arquivo .npy com vetores reais (ignora --vectors)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64])
+    parser.add_argument("--output", help="Arquivo JSON para gravar os resultados")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        corpora = [normalize(np.load(args.embeddings))]
+    else:
+        corpora = [synthetic_embeddings(count) for count in args.vectors]
+
+    report = []
+    for embeddings in corpora:
+        rng = np.random.default_rng(1)
+        # Consultas: vetores do corpus com ruído (perguntas próximas de trechos existentes)
+        picks = rng.choice(len(embeddings), min(args.queries, len(embeddings)), replace=False)
+        queries = normalize(embeddings[picks] + 0.3 * rng.standard_normal(embeddings[picks].shape).astype(np.float32))
+
+        print(f"\n{len(embeddings)} vetores, {len(queries)} consultas, k={args.k}")
+        results = run(embeddings, queries, args.k, args.ef_search, args.nprobe)
+        for row in results:
+            params = ", ".join(f"{key}={row[key]}" for key in ("ef_search", "nlist", "nprobe") if key in row)
+            print(f"  {row['index']:5s} {params:24s} recall {row['recall']:.3f}  "
+                  f"{row['latency_ms_avg']:7.3f} ms/consulta (p95 {row['latency_ms_p95']:.3f})  "
+                  f"construção {row['build_seconds']:.2f}s")
+        report.append({"vectors": len(embeddings), "results": results})
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"k": args.k, "report": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+bench_extraction.py - Escalonamento da extração de páginas por número de núcleos
+
+Compara o tempo de parede de PDFProcessor.process_pdf no modo "thread"
+(referência) com o modo "process" para diferentes números de trabalhadores.
+
+Uso (a partir da pasta backend):
+    python benchmarks/bench_extraction.py --pages 500 --workers 1 2 4 8
+    python benchmarks/bench_extraction.py --pdf caminho/para/arquivo.pdf
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_processor import PDFProcessor, shutdown_process_pool  # noqa: E402
+from benchmarks.synthetic_corpus import corpus_path  # noqa: E402
+
+
+def time_extraction(file_path: str, mode: str, workers: int, pages_per_task: int):
+    processor = PDFProcessor(extraction_mode=mode, max_workers=workers, pages_per_task=pages_per_task)
+    if mode == "process":
+        # Aquecer o pool para não medir a criação dos processos
+        processor.process_pdf(file_path)
+    start = time.perf_counter()
+    success, message, pages = processor.process_pdf(file_path)
+    elapsed = time.perf_counter() - start
+    if not success:
+        raise RuntimeError(message)
+    return elapsed, len(pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="PDF a usar (padrão: PDF sintético gerado)")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 4])
+    parser.add_argument("--pages-per-task", type=int, default=8)
+    parser.add_argument("--output", help="Arquivo JSON para gravar os resultados")
+    args = parser.parse_args()
+
+    file_path = args.pdf or corpus_path(args.pages)
+
+    results = []
+    baseline, page_count = time_extraction(file_path, "thread", 4, args.pages_per_task)
+    results.append({"mode": "thread", "workers": 4, "seconds": baseline, "pages": page_count})
+    print(f"thread  x4: {baseline:7.2f}s ({page_count / baseline:6.1f} páginas/s)")
+
+    for workers in sorted(set(args.workers)):
+        elapsed, page_count = time_extraction(file_path, "process", workers, args.pages_per_task)
+        results.append({"mode": "process", "workers": workers, "seconds": elapsed, "pages": page_count})
+        print(f"process x{workers}: {elapsed:7.2f}s ({page_count / elapsed:6.1f} páginas/s, "
+              f"speedup {baseline / elapsed:4.2f}x)")
+
+    shutdown_process_pool()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"pdf": file_path, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+bench_normalizer.py - Normalização de texto: clean_text anterior vs TextNormalizer
+
+Mede o tempo por página da limpeza anterior (regex + junção caractere a
+caractere com isprintable) e do TextNormalizer, conferindo antes que os
+resultados são idênticos no modo padrão. Também mede o custo das opções
+(NFKC e junção de palavras hifenizadas).
+
+As páginas vêm de um PDF real (texto bruto do pdfplumber, antes da limpeza)
+com --pdf, ou do corpus sintético com quebras de linha, hifenização e
+alguns caracteres não imprimíveis, como no texto extraído de PDFs.
+
+Uso (a partir da pasta backend):
+    python benchmarks/bench_normalizer.py --pdf caminho/para/arquivo.pdf
+    python benchmarks/bench_normalizer.py --pages 500
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_normalizer import TextNormalizer  # noqa: E402
+from benchmarks.synthetic_corpus import synthetic_pages  # noqa: E402
+
+
+def legacy_clean_text(text):
+    """PDFProcessor.clean_text anterior (sem o lru_cache, que não acertava entre páginas)"""
+    if not text:
+        return ""
+    text = re.sub(r'\s+', ' ', text)
+    text = ''.join(char for char in text if char.isprintable())
+    return text.strip()
+
+
+def raw_pdf_pages(path: str):
+    import pdfplumber
+    with pdfplumber.open(path) as pdf:
+        return [page.extract_text(x_tolerance=3, y_tolerance=3) or "" for page in pdf.pages]
+
+
+def raw_synthetic_pages(count: int, seed: int = 7):
+    """Páginas com quebras de linha, hifenização e caracteres como os de PDFs extraídos"""
+    rng = random.Random(seed)
+    pages = []
+    for page in synthetic_pages(count):
+        lines, line = [], ""
+        for word in page["content"].split():
+            if len(line) + len(word) > 90:
+                if rng.random() < 0.1 and len(word) > 6:
+                    # Palavra hifenizada na quebra de linha
+                    lines.append(f"{line} {word[:3]}-")
+                    line = word[3:]
+                    continue
+                lines.append(line)
+                line = ""
+            line = f"{line} {word}".strip()
+        lines.append(line)
+        text = "\n".join(lines)
+        if rng.random() < 0.3:
+            text = text.replace("fi", "ﬁ", 3).replace("ti", "ti­", 2) + "\x00​"
+        pages.append(text)
+    return pages
+
+
+def measure(function, pages, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            function(page)
+    return (time.perf_counter() - start) / (repeat * len(pages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="PDF real (padrão: páginas sintéticas)")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Arquivo JSON para gravar os resultados")
+    args = parser.parse_args()
+
+    pages = raw_pdf_pages(args.pdf) if args.pdf else raw_synthetic_pages(args.pages)
+    default = TextNormalizer()
+    for page in pages:
+        if default.normalize(page) != legacy_clean_text(page):
+            raise SystemExit("TextNormalizer diverge do clean_text anterior")
+
+    variants = {
+        "legacy": legacy_clean_text,
+        "default": default.normalize,
+        "nfkc": TextNormalizer(unicode_form="NFKC").normalize,
+        "nfkc+dehyphenate": TextNormalizer(unicode_form="NFKC", dehyphenate=True).normalize,
+    }
+    results = {name: measure(function, pages, args.repeat) for name, function in variants.items()}
+    chars = sum(len(page) for page in pages) / len(pages)
+    print(f"{len(pages)} páginas, {chars:.0f} caracteres/página em média")
+    for name, seconds in results.items():
+        print(f"  {name:18s} {seconds * 1e6:9.1f} µs/página ({results['legacy'] / seconds:5.1f}x vs anterior)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"pages": len(pages), "seconds_per_page": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
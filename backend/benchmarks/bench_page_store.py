@@ -0,0 +1,84 @@
+"""
+bench_page_store.py - Memória por página: lista de dicionários vs PageStore
+
+Mede (com tracemalloc) a memória retida por um documento carregado nas duas
+representações:
+- "dicts": lista de dicionários por página, texto completo concatenado e
+  uma cópia do texto em cada trecho (representação anterior)
+- "compact": PageStore + ChunkStore + Document compartilhando um único buffer
+
+Uso (a partir da pasta backend):
+    python benchmarks/bench_page_store.py --pages 1000 5000 20000
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunker import TextChunker  # noqa: E402
+from document import Document  # noqa: E402
+from page_store import ChunkStore, PageStore  # noqa: E402
+from benchmarks.synthetic_corpus import synthetic_pages  # noqa: E402
+
+
+def build_dicts(page_count: int, chunker: TextChunker):
+    pages = synthetic_pages(page_count)
+    chunks = chunker.chunk_pages(pages)
+    text_chunks = [chunk["content"] for chunk in chunks]
+    chunk_metadata = [{"page": c["page"], "start": c["start"], "end": c["end"]} for c in chunks]
+    snapshot = Document.from_pages(pages)
+    return pages, text_chunks, chunk_metadata, snapshot
+
+
+def build_compact(page_count: int, chunker: TextChunker):
+    store = PageStore()
+    chunk_store = ChunkStore(store)
+    for page in synthetic_pages(page_count):
+        store.append(page)
+        chunk_store.extend(chunker.chunk_page(page["content"], page["number"]))
+    snapshot = Document.from_page_store(store)
+    return store, chunk_store, snapshot
+
+
+def measure(builder, page_count: int, chunker: TextChunker):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    retained = builder(page_count, chunker)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del retained
+    return {"seconds": elapsed, "bytes": current, "peak_bytes": peak, "bytes_per_page": current / page_count}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--output", help="Arquivo JSON para gravar os resultados")
+    args = parser.parse_args()
+
+    chunker = TextChunker()
+    results = []
+    for page_count in args.pages:
+        dicts = measure(build_dicts, page_count, chunker)
+        compact = measure(build_compact, page_count, chunker)
+        results.append({"pages": page_count, "dicts": dicts, "compact": compact})
+        print(f"{page_count:6d} páginas: dicts {dicts['bytes_per_page'] / 1024:6.2f} KiB/página, "
+              f"compact {compact['bytes_per_page'] / 1024:6.2f} KiB/página "
+              f"({dicts['bytes'] / compact['bytes']:4.2f}x menos memória)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+bench_router.py - Microbenchmark do roteamento de intenção e formato
+
+Compara o IntentRouter (autômato Aho-Corasick + regex pré-compiladas, uma
+passada) com a implementação anterior (varreduras lineares de substrings e
+regex compiladas a cada chamada, com verificar_formato_retorno executado duas
+vezes por pergunta). Antes de medir, confere que os dois devolvem a mesma
+intenção e o mesmo formato para todas as perguntas de exemplo.
+
+Uso (a partir da pasta backend):
+    python benchmarks/bench_router.py --repeat 2000
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_router import VOCABULARIES, IntentRouter  # noqa: E402
+
+QUESTIONS = [
+    "Olá",
+    "bom dia, tudo bem?",
+    "quem é você?",
+    "Quantas páginas tem o documento?",
+    "qual o número de palavras?",
+    "Em que idioma o documento foi escrito?",
+    "qual a média de palavras por página?",
+    "o documento é muito extenso?",
+    "Qual o prazo de vigência do contrato? Responda em tópicos",
+    "Liste as obrigações da contratada",
+    "apresente em tabela os valores e datas de pagamento",
+    "quais as multas por rescisão? responda em json",
+    "Resuma a cláusula de confidencialidade",
+    "quero no formato de markdown a lista de anexos",
+    "responda como html as partes do contrato",
+    "explique detalhadamente a cláusula 5.2.1 e o CNPJ 12.345.678/0001-90 da contratante",
+    "Quem são as partes envolvidas e qual o foro eleito para dirimir controvérsias?",
+    "qual o valor mensal do contrato e o índice de reajuste aplicado anualmente?",
+]
+
+
+def legacy_format(question: str):
+    """verificar_formato_retorno anterior (mesmo vocabulário)"""
+    lowered = question.lower()
+    vocabulary = VOCABULARIES["pt"]
+    formats = dict(vocabulary["formats"])
+    for format_name, terms in formats.items():
+        if any(term in lowered for term in terms):
+            return format_name
+    for _, pattern in vocabulary["format_patterns"]:
+        match = re.search(pattern, lowered)
+        if match:
+            requested = match.group(1).strip()
+            for format_name, terms in formats.items():
+                if any(term.endswith(requested) or term.startswith(requested) or requested in term
+                       for term in terms):
+                    return format_name
+    return None
+
+
+def legacy_route(question: str):
+    """Sequência anterior de verificações do /chat (formato calculado duas vezes)"""
+    vocabulary = VOCABULARIES["pt"]
+    format_name = legacy_format(question)
+    lowered = question.lower()
+    greetings = vocabulary["greeting"]
+    if lowered in greetings or lowered.startswith(tuple(greetings)):
+        return "greeting", format_name
+    if any(term in lowered for term in vocabulary["unrelated"]):
+        return "unrelated", format_name
+    legacy_format(question)
+    for intent, terms in vocabulary["statistics"]:
+        if any(term in lowered for term in terms):
+            return intent, format_name
+    return None, format_name
+
+
+def measure(function, questions, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for question in questions:
+            function(question)
+    return (time.perf_counter() - start) / (repeat * len(questions))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--output", help="Arquivo JSON para gravar os resultados")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    router = IntentRouter()
+    build_seconds = time.perf_counter() - start
+
+    for question in QUESTIONS:
+        expected = legacy_route(question)
+        got = tuple(router.route(question))
+        if got != expected:
+            raise SystemExit(f"Divergência em {question!r}: esperado {expected}, obtido {got}")
+
+    legacy = measure(legacy_route, QUESTIONS, args.repeat)
+    routed = measure(router.route, QUESTIONS, args.repeat)
+    print(f"Construção do roteador: {build_seconds * 1000:.2f} ms")
+    print(f"Anterior:     {legacy * 1e6:8.2f} µs/pergunta")
+    print(f"IntentRouter: {routed * 1e6:8.2f} µs/pergunta ({legacy / routed:.1f}x mais rápido)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "questions": len(QUESTIONS),
+                "build_seconds": build_seconds,
+                "legacy_seconds_per_question": legacy,
+                "router_seconds_per_question": routed,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
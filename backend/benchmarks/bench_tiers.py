@@ -0,0 +1,81 @@
+"""
+bench_tiers.py - Custo por página da extração em camadas vs pdfplumber sempre
+
+Extrai todas as páginas de um corpus misto (páginas densas, esparsas e só com
+desenhos) de duas formas, página a página e numa única thread:
+- pdfplumber sempre (fluxo anterior: layout com tolerâncias padrão e nova
+  extração com tolerâncias maiores quando sobra pouco texto)
+- TieredExtractor (PyPDF2 primeiro, pdfplumber só para páginas problemáticas)
+
+Mostra o tempo médio por página, o tempo por camada e quantas páginas foram
+resolvidas em cada camada.
+
+Uso (a partir da pasta backend):
+    python benchmarks/bench_tiers.py --pages 200
+    python benchmarks/bench_tiers.py --pdf caminho/para/arquivo.pdf
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from page_extractor import TieredExtractor  # noqa: E402
+from benchmarks.synthetic_corpus import corpus_path  # noqa: E402
+
+
+def measure(file_path: str, fast_tier: bool):
+    """Extrai todas as páginas; devolve {camada: [segundos por página]}"""
+    timings = defaultdict(list)
+    with TieredExtractor(fast_tier=fast_tier).open(file_path) as session:
+        for index in range(len(session)):
+            start = time.perf_counter()
+            _, tier = session.extract(index)
+            timings[tier].append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(name: str, timings) -> dict:
+    seconds = [value for values in timings.values() for value in values]
+    summary = {
+        "pages": len(seconds),
+        "seconds": sum(seconds),
+        "seconds_per_page": sum(seconds) / len(seconds) if seconds else 0,
+        "tiers": {
+            tier: {"pages": len(values), "seconds_per_page": sum(values) / len(values)}
+            for tier, values in sorted(timings.items())
+        },
+    }
+    print(f"{name}: {summary['seconds']:.2f}s, {summary['seconds_per_page'] * 1000:.2f} ms/página")
+    for tier, data in summary["tiers"].items():
+        print(f"  {tier:14s} {data['pages']:6d} páginas  {data['seconds_per_page'] * 1000:8.2f} ms/página")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="PDF a usar (padrão: PDF sintético misto gerado)")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--output", help="Arquivo JSON para gravar os resultados")
+    args = parser.parse_args()
+
+    logging.getLogger("pdfminer").setLevel(logging.ERROR)
+    file_path = args.pdf or corpus_path(args.pages, layout="mixed")
+
+    layout = summarize("pdfplumber sempre", measure(file_path, fast_tier=False))
+    tiered = summarize("em camadas", measure(file_path, fast_tier=True))
+    if tiered["seconds"]:
+        print(f"Ganho: {layout['seconds'] / tiered['seconds']:.1f}x")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"pdf": file_path, "layout_only": layout, "tiered": tiered}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
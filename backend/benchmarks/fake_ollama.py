@@ -0,0 +1,150 @@
+"""
+fake_ollama.py - Servidor local que imita a API do Ollama para benchmarks
+
+Implementa só o que o ModelManager usa:
+- GET /api/tags: lista com o modelo configurado
+- POST /api/generate: resposta completa (stream=false) ou em NDJSON (stream=true),
+  com "context" e as contagens/durações que o Ollama devolve
+
+A latência é sintética e determinística: um atraso fixo para processar o prompt
+(mais um custo por token do prompt) e um atraso por token gerado. Assim os
+benchmarks do /chat medem o servidor, não o modelo.
+
+Uso (a partir da pasta backend):
+    python benchmarks/fake_ollama.py --port 11435
+    OLLAMA_API_URL=http://127.0.0.1:11435/api uvicorn app:app
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = ("<think>Analisando os trechos do documento.</think>"
+          "De acordo com o documento, o contrato tem vigência de doze meses, com reajuste anual "
+          "pelo índice definido na cláusula de pagamento e multa por rescisão antecipada.")
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Configurados por make_server
+    model_name = "deepseek-r1:latest"
+    prompt_delay = 0.0
+    prompt_token_delay = 0.0
+    token_delay = 0.0
+
+    def log_message(self, format, *args):
+        # Silencioso: o log por requisição atrapalharia as medições
+        pass
+
+    def _send_json(self, payload, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/api/tags":
+            self._send_json({"models": [{"name": self.model_name, "size": 0}]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/api/generate":
+            self._send_json({"error": "not found"}, 404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        prompt = request.get("prompt", "")
+        # Aproximação de tokens: ~4 caracteres por token; o contexto recebido não é reprocessado
+        prompt_tokens = max(1, len(prompt) // 4)
+        context = list(request.get("context") or [])
+
+        start = time.perf_counter()
+        time.sleep(self.prompt_delay + prompt_tokens * self.prompt_token_delay)
+        prompt_seconds = time.perf_counter() - start
+        tokens = [word + " " for word in ANSWER.split(" ")]
+        context = context + list(range(len(context), len(context) + prompt_tokens + len(tokens)))
+
+        if request.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in tokens:
+                time.sleep(self.token_delay)
+                self._write_chunk({"model": self.model_name, "response": token, "done": False})
+            self._write_chunk(self._final(prompt_tokens, len(tokens), prompt_seconds, start, context))
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            time.sleep(self.token_delay * len(tokens))
+            self._send_json({**self._final(prompt_tokens, len(tokens), prompt_seconds, start, context),
+                             "response": "".join(tokens).strip()})
+
+    def _write_chunk(self, payload):
+        data = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _final(self, prompt_tokens, eval_tokens, prompt_seconds, start, context):
+        total = time.perf_counter() - start
+        return {
+            "model": self.model_name,
+            "response": "",
+            "done": True,
+            "context": context,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_seconds * 1e9),
+            "eval_count": eval_tokens,
+            "eval_duration": int((total - prompt_seconds) * 1e9),
+            "total_duration": int(total * 1e9),
+        }
+
+
+def make_server(host: str = "127.0.0.1", port: int = 0, model_name: str = "deepseek-r1:latest",
+                prompt_delay: float = 0.05, prompt_token_delay: float = 0.00002,
+                token_delay: float = 0.002) -> ThreadingHTTPServer:
+    """Cria o servidor (porta 0: escolhida pelo sistema; ver server.server_address)"""
+    handler = type("ConfiguredFakeOllamaHandler", (FakeOllamaHandler,), {
+        "model_name": model_name,
+        "prompt_delay": prompt_delay,
+        "prompt_token_delay": prompt_token_delay,
+        "token_delay": token_delay,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_background(**kwargs):
+    """Inicia o servidor numa thread; devolve (servidor, URL base da API para OLLAMA_API_URL)"""
+    server = make_server(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/api"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--prompt-delay", type=float, default=0.05, help="Segundos fixos por prompt")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="Segundos por token gerado")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, prompt_delay=args.prompt_delay, token_delay=args.token_delay)
+    print(f"Ollama falso em http://{args.host}:{args.port}/api")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+run_suite.py - Suíte de benchmarks de ponta a ponta (extração, índice, busca e /chat)
+
+Para cada tamanho e layout do corpus sintético (ver synthetic_corpus.py), mede:
+1. PDFProcessor.process_pdf (extração e limpeza das páginas)
+2. ModelManager.index_pdf (embeddings + índice vetorial e BM25 dos trechos)
+3. ModelManager.search_pdf e format_prompt / pack_prompt (por pergunta)
+4. O caminho completo pela API: /upload-pdf e /chat (perguntas novas e repetidas,
+   que devem vir do cache de respostas), com o Ollama substituído por um
+   servidor local (fake_ollama.py) via OLLAMA_API_URL
+
+O resultado é gravado em JSON, com o commit atual, para comparar execuções.
+
+Uso (a partir da pasta backend):
+    python benchmarks/run_suite.py --pages 10 200 2000 --output resultados.json
+    python benchmarks/run_suite.py --pages 50 --layouts text --skip-api
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.fake_ollama import start_in_background  # noqa: E402
+from benchmarks.synthetic_corpus import corpus_path  # noqa: E402
+
+QUESTIONS = [
+    "Qual o prazo de vigência do contrato?",
+    "Quais são as obrigações da contratada?",
+    "Como é feito o reajuste do valor mensal?",
+    "Qual a multa por rescisão antecipada?",
+    "O que diz a cláusula de confidencialidade dos dados pessoais?",
+    "Quem são as testemunhas e qual a data da assinatura?",
+    "Qual o foro e a comarca eleitos?",
+    "Quais garantias de entrega estão previstas no cronograma?",
+]
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+    return {
+        "avg_ms": 1000 * sum(ordered) / len(ordered),
+        "p50_ms": 1000 * ordered[len(ordered) // 2],
+        "p95_ms": 1000 * ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+        "count": len(ordered),
+    }
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_components(app_module, file_path: str, questions):
+    """Etapas isoladas, chamadas diretamente (sem HTTP)"""
+    from document_registry import DocumentEntry
+
+    processor = app_module.new_pdf_processor()
+    (success, message, pages), extraction = timed(processor.process_pdf, file_path)
+    if not success:
+        raise RuntimeError(message)
+    chunks, chunking = timed(processor.get_chunks_for_indexing)
+
+    model_manager = app_module.model_manager
+    document = DocumentEntry()
+    _, indexing = timed(model_manager.index_pdf, chunks, document=document)
+    document.pages = processor.pages
+    document.refresh_snapshot()
+
+    search, prompt, packing = [], [], []
+    for question in questions:
+        content, seconds = timed(model_manager.search_pdf, question, document=document)
+        search.append(seconds)
+        prompt.append(timed(model_manager.format_prompt, content, question)[1])
+        packing.append(timed(model_manager.pack_prompt, question, document=document,
+                             fallback=document.snapshot.head)[1])
+
+    return {
+        "pages": len(pages),
+        "chunks": len(chunks),
+        "process_pdf_s": extraction,
+        "pages_per_s": len(pages) / extraction if extraction else None,
+        "chunking_s": chunking,
+        "index_pdf_s": indexing,
+        "search_pdf": percentiles(search),
+        "format_prompt": percentiles(prompt),
+        "pack_prompt": percentiles(packing),
+    }
+
+
+def bench_api(client, file_path: str, questions):
+    """Caminho completo pela API (upload + perguntas novas e repetidas)"""
+    with open(file_path, "rb") as f:
+        start = time.perf_counter()
+        response = client.post("/upload-pdf", files={"file": (os.path.basename(file_path), f, "application/pdf")})
+        upload = time.perf_counter() - start
+    response.raise_for_status()
+    document_id = response.json()["document_id"]
+
+    def ask(question):
+        # Conversa nova a cada pergunta: sem histórico, a resposta pode entrar (e sair) do cache
+        payload = {"message": question, "document_id": document_id, "conversation_id": uuid.uuid4().hex}
+        start = time.perf_counter()
+        reply = client.post("/chat", json=payload)
+        elapsed = time.perf_counter() - start
+        reply.raise_for_status()
+        return elapsed, reply.json()
+
+    cold = [ask(question) for question in questions]
+    warm = [ask(question) for question in questions]
+    failures = sum(1 for _, data in cold + warm if not data.get("success"))
+    return {
+        "upload_s": upload,
+        "chat_cold": percentiles([seconds for seconds, _ in cold]),
+        "chat_warm": percentiles([seconds for seconds, _ in warm]),
+        "warm_cache_hits": sum(1 for _, data in warm if data.get("cached")),
+        "failures": failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 200, 1000])
+    parser.add_argument("--layouts", nargs="+", default=["text", "sparse"], choices=["text", "sparse", "mixed"])
+    parser.add_argument("--questions", type=int, default=len(QUESTIONS))
+    parser.add_argument("--skip-api", action="store_true", help="Mede só as etapas isoladas (sem /upload-pdf e /chat)")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="Latência por token do Ollama falso (s)")
+    parser.add_argument("--verbose", action="store_true", help="Mostra os logs do servidor")
+    parser.add_argument("--output", help="Arquivo JSON para gravar os resultados")
+    args = parser.parse_args()
+
+    # O servidor lê a configuração na importação: Ollama falso e cache em disco vazio
+    fake_ollama, ollama_url = start_in_background(token_delay=args.token_delay)
+    os.environ["OLLAMA_API_URL"] = ollama_url
+    os.environ["PDF_CACHE_DIR"] = tempfile.mkdtemp(prefix="pdf_analyzer_suite_")
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        import app as app_module
+    questions = (QUESTIONS * (args.questions // len(QUESTIONS) + 1))[:args.questions]
+
+    results = []
+    client_context = contextlib.nullcontext(None)
+    if not args.skip_api:
+        from fastapi.testclient import TestClient
+        client_context = TestClient(app_module.app)
+
+    with client_context as client:
+        for layout in args.layouts:
+            for pages in args.pages:
+                file_path = corpus_path(pages, layout)
+                quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+                with quiet:
+                    result = {"layout": layout, "requested_pages": pages,
+                              **bench_components(app_module, file_path, questions)}
+                    if client is not None:
+                        result["api"] = bench_api(client, file_path, questions)
+                results.append(result)
+                line = (f"{layout:6s} {pages:5d} págs: extração {result['process_pdf_s']:7.2f}s  "
+                        f"índice {result['index_pdf_s']:6.2f}s  busca {result['search_pdf']['avg_ms']:6.1f}ms  "
+                        f"prompt {result['pack_prompt']['avg_ms']:6.1f}ms")
+                if "api" in result:
+                    line += (f"  upload {result['api']['upload_s']:6.2f}s  chat {result['api']['chat_cold']['avg_ms']:7.1f}ms"
+                             f" (cache {result['api']['chat_warm']['avg_ms']:5.1f}ms)")
+                print(line)
+
+    app_module.shutdown_process_pool()
+    fake_ollama.shutdown()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "commit": current_commit(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "token_delay": args.token_delay,
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+synthetic_corpus.py - Geração de PDFs sintéticos para benchmarks
+
+Gera PDFs locais (via reportlab) de poucas até milhares de páginas, nos layouts:
+- "text": páginas densas, com vários parágrafos por página
+- "sparse": páginas com poucas linhas (títulos, campos, rodapés)
+- "graphics": páginas só com desenhos, sem texto (como páginas escaneadas)
+- "mixed": alterna os três anteriores, com predominância de texto
+
+Os textos são determinísticos (semente fixa), para que as medições sejam
+comparáveis entre execuções e commits. Para benchmarks que não precisam do
+PDF, synthetic_pages gera diretamente as páginas já "extraídas".
+"""
+
+import os
+import random
+import tempfile
+
+WORDS = (
+    "contrato prazo vigência partes cláusula pagamento multa rescisão objeto "
+    "prestação serviços empresa contratante contratada valor mensal reajuste "
+    "índice foro comarca obrigações responsabilidade confidencialidade dados "
+    "pessoais garantia entrega relatório anexo assinatura testemunhas data "
+    "documento análise processo projeto equipe cronograma orçamento meta"
+).split()
+
+
+# Sequência de layouts das páginas do corpus "mixed"
+MIXED_LAYOUTS = ("text", "text", "sparse", "text", "graphics")
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+    words[0] = words[0].capitalize()
+    if rng.random() < 0.2:
+        words.append(f"{rng.randint(10, 99)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}/0001-{rng.randint(10, 99)}")
+    return " ".join(words) + "."
+
+
+def generate_pdf(path: str, pages: int, layout: str = "text", seed: int = 42) -> str:
+    """Gera um PDF sintético com o número de páginas e o layout pedidos"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    rng = random.Random(seed)
+    width, height = A4
+    pdf = canvas.Canvas(path, pagesize=A4)
+
+    for page_number in range(1, pages + 1):
+        page_layout = MIXED_LAYOUTS[page_number % len(MIXED_LAYOUTS)] if layout == "mixed" else layout
+        if page_layout == "graphics":
+            for _ in range(rng.randint(5, 20)):
+                pdf.rect(rng.uniform(40, width - 140), rng.uniform(40, height - 140),
+                         rng.uniform(20, 100), rng.uniform(20, 100), fill=rng.random() < 0.5)
+            pdf.showPage()
+            continue
+
+        text = pdf.beginText(50, height - 60)
+        text.setFont("Helvetica", 10)
+        if page_layout == "sparse":
+            text.textLine(f"Anexo {page_number}")
+            for _ in range(rng.randint(1, 3)):
+                text.textLine(_sentence(rng)[:90])
+        else:
+            line_count = 0
+            while line_count < 60:
+                sentence = _sentence(rng)
+                # Quebrar a sentença em linhas de até ~95 caracteres
+                line = ""
+                for word in sentence.split():
+                    if len(line) + len(word) + 1 > 95:
+                        text.textLine(line)
+                        line_count += 1
+                        line = ""
+                    line = f"{line} {word}".strip()
+                if line:
+                    text.textLine(line)
+                    line_count += 1
+        pdf.drawText(text)
+        pdf.drawString(width / 2, 30, str(page_number))
+        pdf.showPage()
+
+    pdf.save()
+    return path
+
+
+def synthetic_pages(pages: int, words_per_page: int = 450, seed: int = 42):
+    """Gera páginas no formato de PDFProcessor ({"number", "content", ...}) sem criar o PDF"""
+    rng = random.Random(seed)
+    result = []
+    for page_number in range(1, pages + 1):
+        sentences = []
+        word_count = 0
+        while word_count < words_per_page:
+            sentence = _sentence(rng)
+            sentences.append(sentence)
+            word_count += len(sentence.split())
+        content = " ".join(sentences)
+        result.append({
+            "number": page_number,
+            "content": content,
+            "word_count": len(content.split()),
+            "extracted_success": True,
+        })
+    return result
+
+
+def corpus_path(pages: int, layout: str = "text", directory: str = None) -> str:
+    """Retorna (gerando se necessário) o caminho de um PDF sintético em cache local"""
+    directory = directory or os.path.join(tempfile.gettempdir(), "pdf_analyzer_bench")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"synthetic_{layout}_{pages}.pdf")
+    if not os.path.exists(path):
+        print(f"Gerando PDF sintético: {path}")
+        generate_pdf(path, pages, layout)
+    return path
@@ -0,0 +1,189 @@
+"""
+cancellation.py - Cancelamento cooperativo e orçamentos de tempo da extração
+
+Uma página patológica podia segurar o documento inteiro, e o timeout do
+/upload-pdf não interrompia o trabalho já iniciado no executor. Este módulo:
+1. CancellationToken: sinal de cancelamento compartilhado entre a requisição e
+   as threads de ingestão, com prazo opcional para o documento inteiro. Para os
+   processos trabalhadores, o cancelamento é sinalizado por um arquivo
+   (share_with_processes), verificado entre as páginas
+2. PageBudget: prazo de uma página, verificado entre as camadas de extração
+3. page_alarm: nos processos trabalhadores, interrompe de fato a página que
+   estoura o orçamento (SIGALRM), já que o layout do pdfminer não tem pontos
+   de verificação próprios
+
+As verificações são cooperativas: o trabalho para no próximo ponto de
+verificação (entre páginas e entre camadas) e o que já foi extraído é mantido.
+"""
+
+import os
+import signal
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+# Motivos registrados nas páginas puladas
+REASON_CANCELLED = "cancelled"
+REASON_DOCUMENT_BUDGET = "document_budget"
+REASON_PAGE_BUDGET = "page_budget"
+# Falha ao extrair um intervalo de páginas (registrado como "error: <mensagem>")
+REASON_ERROR = "error"
+
+
+class OperationCancelled(Exception):
+    """O trabalho foi interrompido (cancelamento ou prazo esgotado)"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancellationToken:
+    def __init__(self, document_budget: Optional[float] = None, page_budget: Optional[float] = None):
+        self._event = threading.Event()
+        self._reason: Optional[str] = None
+        # Prazos em time.time(): comparáveis também dentro dos processos trabalhadores
+        self.deadline = time.time() + document_budget if document_budget else None
+        self.page_budget = page_budget
+        # Arquivo que sinaliza o cancelamento aos processos trabalhadores (ver share_with_processes)
+        self.cancel_file: Optional[str] = None
+
+    def __getstate__(self):
+        # Enviado aos processos trabalhadores: prazos e o estado atual (o Event não é serializável)
+        return {"deadline": self.deadline, "page_budget": self.page_budget, "reason": self._reason,
+                "cancel_file": self.cancel_file}
+
+    def __setstate__(self, state):
+        self._event = threading.Event()
+        self._reason = None
+        self.deadline = state["deadline"]
+        self.page_budget = state["page_budget"]
+        self.cancel_file = state.get("cancel_file")
+        if state["reason"]:
+            self._set(state["reason"])
+
+    def share_with_processes(self) -> str:
+        """
+        Caminho do arquivo de cancelamento, criado por cancel() e verificado pelas
+        cópias do token nos processos trabalhadores. Chamar antes de enviar o token;
+        quem chama remove o arquivo (discard_cancel_file) quando os trabalhadores terminarem.
+        """
+        if self.cancel_file is None:
+            self.cancel_file = os.path.join(tempfile.gettempdir(), f"pdf_analyzer_cancel_{uuid.uuid4().hex}")
+            if self._event.is_set():
+                self.signal_workers(self._reason)
+        return self.cancel_file
+
+    def signal_workers(self, reason: str = REASON_CANCELLED):
+        """Pede aos processos trabalhadores que parem, sem cancelar o token local"""
+        if self.cancel_file is None:
+            return
+        try:
+            with open(self.cancel_file, "w", encoding="utf-8") as f:
+                f.write(reason)
+        except OSError as e:
+            print(f"Não foi possível sinalizar o cancelamento aos processos: {str(e)}")
+
+    def discard_cancel_file(self):
+        if self.cancel_file is not None:
+            try:
+                os.remove(self.cancel_file)
+            except OSError:
+                pass
+
+    def _set(self, reason: str):
+        if not self._event.is_set():
+            self._reason = reason
+            self._event.set()
+
+    def cancel(self, reason: str = REASON_CANCELLED):
+        """Pede a interrupção do trabalho (ex: cliente desconectou ou timeout da requisição)"""
+        if not self._event.is_set():
+            self._set(reason)
+            self.signal_workers(reason)
+
+    @property
+    def reason(self) -> Optional[str]:
+        if self._event.is_set():
+            return self._reason
+        if self.deadline is not None and time.time() >= self.deadline:
+            return REASON_DOCUMENT_BUDGET
+        if self.cancel_file is not None and os.path.exists(self.cancel_file):
+            # Cancelado pelo processo principal (cópia do token num trabalhador)
+            try:
+                with open(self.cancel_file, encoding="utf-8") as f:
+                    reason = f.read().strip() or REASON_CANCELLED
+            except OSError:
+                reason = REASON_CANCELLED
+            self._set(reason)
+            return reason
+        return None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def remaining(self) -> Optional[float]:
+        """Segundos até o prazo do documento (None se não houver prazo)"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.time())
+
+    def check(self):
+        """Levanta OperationCancelled se o trabalho deve parar"""
+        reason = self.reason
+        if reason is not None:
+            raise OperationCancelled(reason)
+
+    def page(self) -> "PageBudget":
+        """Prazo para a próxima página (o menor entre o da página e o do documento)"""
+        deadline = time.time() + self.page_budget if self.page_budget else None
+        if self.deadline is not None:
+            deadline = self.deadline if deadline is None else min(deadline, self.deadline)
+        return PageBudget(deadline, self)
+
+
+class PageBudget:
+    """Prazo de uma página; verificado entre as camadas de extração"""
+
+    def __init__(self, deadline: Optional[float] = None, token: CancellationToken = None):
+        self.deadline = deadline
+        self.token = token
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.time())
+
+    def check(self):
+        if self.token is not None:
+            self.token.check()
+        if self.deadline is not None and time.time() >= self.deadline:
+            raise OperationCancelled(REASON_PAGE_BUDGET)
+
+
+@contextmanager
+def page_alarm(seconds: Optional[float]):
+    """
+    Interrompe o bloco com OperationCancelled(page_budget) após `seconds`.
+    Só funciona na thread principal de um processo (caso dos trabalhadores do
+    pool de processos); fora dela, não faz nada e vale só a verificação cooperativa.
+    """
+    if (not seconds or not hasattr(signal, "setitimer")
+            or threading.current_thread() is not threading.main_thread()):
+        yield
+        return
+
+    def on_alarm(signum, frame):
+        raise OperationCancelled(REASON_PAGE_BUDGET)
+
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
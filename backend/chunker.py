@@ -0,0 +1,127 @@
+"""
+chunker.py - Segmentação das páginas em trechos para indexação
+
+Este módulo implementa a etapa de chunking entre a extração e a indexação:
+1. Divide o texto de cada página em sentenças
+2. Agrupa sentenças em trechos respeitando um orçamento de tokens
+3. Mantém uma sobreposição configurável entre trechos consecutivos
+4. Preserva o número da página e os offsets de caracteres de cada trecho
+
+Trechos menores e alinhados a sentenças deixam a busca semântica mais precisa
+e reduzem o número de tokens enviados ao modelo em cada pergunta.
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+# Fim de sentença: pontuação final seguida de espaço ou fim do texto
+SENTENCE_END = re.compile(r'[.!?;]+(?=\s|$)')
+WORD = re.compile(r'\S+')
+
+
+class TextChunker:
+    def __init__(self, chunk_tokens: int = 200, overlap_tokens: int = 40, chars_per_token: int = 4):
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError("A sobreposição deve ser menor que o tamanho do trecho.")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.chars_per_token = chars_per_token
+
+    @property
+    def version(self) -> str:
+        """Identifica a configuração do chunker (usada nas chaves de cache)"""
+        return f"chunker-{self.chunk_tokens}-{self.overlap_tokens}-{self.chars_per_token}"
+
+    def estimate_tokens(self, text: str) -> int:
+        """Estimativa barata do número de tokens de um texto"""
+        return max(1, len(text) // self.chars_per_token)
+
+    def _sentence_spans(self, text: str) -> List[Tuple[int, int]]:
+        """Retorna os intervalos (início, fim) de cada sentença do texto"""
+        spans = []
+        start = 0
+        for match in SENTENCE_END.finditer(text):
+            end = match.end()
+            if text[start:end].strip():
+                spans.append(self._strip_span(text, start, end))
+            start = end
+        if text[start:].strip():
+            spans.append(self._strip_span(text, start, len(text)))
+        return spans
+
+    @staticmethod
+    def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+        """Remove espaços das bordas de um intervalo sem copiar o texto"""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
+
+    def _split_long_span(self, text: str, start: int, end: int) -> List[Tuple[int, int]]:
+        """Divide em limites de palavra uma sentença maior que o orçamento do trecho"""
+        max_chars = self.chunk_tokens * self.chars_per_token
+        pieces = []
+        piece_start = None
+        piece_end = None
+        for word in WORD.finditer(text, start, end):
+            if piece_start is None:
+                piece_start = word.start()
+            elif word.end() - piece_start > max_chars:
+                pieces.append((piece_start, piece_end))
+                piece_start = word.start()
+            piece_end = word.end()
+        if piece_start is not None:
+            pieces.append((piece_start, piece_end))
+        return pieces
+
+    def chunk_page(self, text: str, page_number: int) -> List[Dict]:
+        """Divide o texto de uma página em trechos alinhados a sentenças"""
+        if not text or not text.strip():
+            return []
+
+        spans = []
+        for start, end in self._sentence_spans(text):
+            if self.estimate_tokens(text[start:end]) > self.chunk_tokens:
+                spans.extend(self._split_long_span(text, start, end))
+            else:
+                spans.append((start, end))
+
+        chunks = []
+        first = 0
+        while first < len(spans):
+            # Acumular sentenças até estourar o orçamento do trecho
+            last = first
+            while (last + 1 < len(spans) and
+                   self.estimate_tokens(text[spans[first][0]:spans[last + 1][1]]) <= self.chunk_tokens):
+                last += 1
+
+            start, end = spans[first][0], spans[last][1]
+            chunks.append({
+                "page": page_number,
+                "start": start,
+                "end": end,
+                "content": text[start:end],
+            })
+
+            if last + 1 >= len(spans):
+                break
+
+            # Recuar sentenças finais para formar a sobreposição, desde que o
+            # próximo trecho ainda caiba no orçamento com a sentença seguinte
+            next_first = last + 1
+            next_end = spans[last + 1][1]
+            while (next_first - 1 > first and
+                   self.estimate_tokens(text[spans[next_first - 1][0]:end]) <= self.overlap_tokens and
+                   self.estimate_tokens(text[spans[next_first - 1][0]:next_end]) <= self.chunk_tokens):
+                next_first -= 1
+            first = next_first
+
+        return chunks
+
+    def chunk_pages(self, pages: List[Dict]) -> List[Dict]:
+        """Divide uma lista de páginas ({"number", "content"}) em trechos"""
+        chunks = []
+        for page in pages:
+            chunks.extend(self.chunk_page(page.get("content", ""), page.get("number", 0)))
+        return chunks
@@ -0,0 +1,181 @@
+"""
+context_packer.py - Montagem do contexto do prompt por orçamento de tokens
+
+Cortar o conteúdo em N caracteres não tem relação com a janela de contexto do
+modelo, pode partir a evidência ao meio e desperdiça espaço com trechos
+repetidos. Este módulo monta o contexto do prompt:
+1. Conta tokens com o tokenizador do modelo (transformers.AutoTokenizer), com
+   estimativa por caracteres quando o tokenizador não está disponível
+2. Ordena os trechos recuperados por relevância marginal máxima (MMR), usando
+   os embeddings já guardados no índice, e descarta quase-duplicatas
+3. Preenche um orçamento exato de tokens dividido entre contexto, histórico
+   e pergunta (o que sobra da janela após reservar espaço para a resposta)
+
+Prompts menores e mais relevantes reduzem o tempo de prefill de cada pergunta.
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class TokenCounter:
+    # Nenhum token real passa de ~16 caracteres: limite do texto lido para cortar em N tokens
+    max_chars_per_token = 16
+
+    def __init__(self, tokenizer_name: Optional[str] = None, chars_per_token: int = 4):
+        self.tokenizer_name = tokenizer_name
+        self.chars_per_token = chars_per_token
+        self._tokenizer = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _get_tokenizer(self):
+        """Carrega o tokenizador sob demanda; se falhar, usa a estimativa por caracteres"""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    if self.tokenizer_name:
+                        try:
+                            from transformers import AutoTokenizer
+                            self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name)
+                            print(f"Tokenizador {self.tokenizer_name} carregado para contagem de tokens")
+                        except Exception as e:
+                            print(f"Tokenizador indisponível ({e}); usando estimativa por caracteres")
+                    self._loaded = True
+        return self._tokenizer
+
+    def warm_up(self):
+        """Carrega o tokenizador (download e leitura lentos) antes da primeira pergunta"""
+        self._get_tokenizer()
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        tokenizer = self._get_tokenizer()
+        if tokenizer is None:
+            return -(-len(text) // self.chars_per_token)
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Corta o texto em `max_tokens`, preferindo terminar numa sentença"""
+        if max_tokens <= 0:
+            return ""
+        # Não tokenizar o documento inteiro
+        text = text[:max_tokens * self.max_chars_per_token]
+        if self.count(text) <= max_tokens:
+            return text
+        tokenizer = self._get_tokenizer()
+        if tokenizer is None:
+            truncated = text[:max_tokens * self.chars_per_token]
+        else:
+            ids = tokenizer.encode(text, add_special_tokens=False)[:max_tokens]
+            truncated = tokenizer.decode(ids)
+        sentence_end = max(truncated.rfind(". "), truncated.rfind("! "), truncated.rfind("? "))
+        if sentence_end > len(truncated) // 2:
+            return truncated[:sentence_end + 1]
+        # Margem para o "..." não estourar o orçamento
+        return truncated[:max(0, len(truncated) - 3)] + "..."
+
+
+class ContextPacker:
+    def __init__(self, token_counter: TokenCounter, context_window: int = 8192, reserve_output: int = 1024,
+                 history_share: float = 0.2, mmr_lambda: float = 0.7, duplicate_threshold: float = 0.95):
+        self.token_counter = token_counter
+        # Janela total do modelo e tokens reservados para a resposta (inclui o raciocínio)
+        self.context_window = context_window
+        self.reserve_output = reserve_output
+        # Fração máxima do orçamento disponível destinada ao histórico
+        self.history_share = history_share
+        # Peso da relevância frente à diversidade no MMR
+        self.mmr_lambda = mmr_lambda
+        # Similaridade de cosseno a partir da qual um trecho é considerado repetido
+        self.duplicate_threshold = duplicate_threshold
+        self._separator_tokens = None
+
+    @property
+    def separator_tokens(self) -> int:
+        """Tokens do separador entre trechos (contados na primeira montagem, não na construção)"""
+        if self._separator_tokens is None:
+            self._separator_tokens = self.token_counter.count("\n\n") or 1
+        return self._separator_tokens
+
+    def split_budget(self, fixed_tokens: int, history_tokens: int) -> Tuple[int, int]:
+        """
+        Divide o que sobra da janela (descontados resposta, instruções e pergunta)
+        entre histórico e contexto. Retorna (orçamento do histórico, orçamento do contexto).
+        """
+        available = max(0, self.context_window - self.reserve_output - fixed_tokens)
+        history_budget = min(history_tokens, int(available * self.history_share))
+        return history_budget, available - history_budget
+
+    def pack_history(self, history: List[Dict], budget: int) -> str:
+        """Inclui as interações mais recentes que couberem no orçamento"""
+        if not history or budget <= 0:
+            return ""
+        header = "Histórico de conversa:\n"
+        used = self.token_counter.count(header)
+        exchanges = []
+        for exchange in reversed(history):
+            text = f"Pergunta: {exchange['question']}\nResposta: {exchange['answer']}\n\n"
+            tokens = self.token_counter.count(text)
+            if used + tokens > budget:
+                break
+            exchanges.append(text)
+            used += tokens
+        if not exchanges:
+            return ""
+        return header + "".join(reversed(exchanges))
+
+    def select(self, candidates: List[Dict], budget: int, query_embedding: Optional[np.ndarray] = None,
+               embeddings: Optional[np.ndarray] = None) -> Tuple[List[Dict], int]:
+        """
+        Escolhe os trechos por MMR até preencher o orçamento.
+        `candidates` vem de ModelManager.retrieve ({"index", "page", "content", ...}) e
+        `embeddings` tem uma linha (normalizada) por candidato. Retorna (trechos, tokens usados).
+        """
+        if not candidates or budget <= 0:
+            return [], 0
+
+        if query_embedding is not None and embeddings is not None and len(embeddings) == len(candidates):
+            relevance = embeddings @ np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+            similarity = embeddings @ embeddings.T
+        else:
+            # Sem vetores: manter a ordem da recuperação, sem diversificação
+            relevance = np.linspace(1.0, 0.0, len(candidates), dtype=np.float32)
+            similarity = None
+
+        remaining = list(range(len(candidates)))
+        chosen: List[int] = []
+        used = 0
+        while remaining:
+            if similarity is not None and chosen:
+                redundancy = similarity[np.ix_(remaining, chosen)].max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining), dtype=np.float32)
+            scores = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * redundancy
+            position = int(np.argmax(scores))
+            best = remaining.pop(position)
+            if redundancy[position] >= self.duplicate_threshold:
+                continue
+
+            candidate = candidates[best]
+            cost = self.token_counter.count(self.render(candidate)) + self.separator_tokens
+            if used + cost > budget:
+                # Não coube inteiro; um trecho menor ainda pode caber
+                continue
+            chosen.append(best)
+            used += cost
+
+        # Ordem do documento facilita a leitura pelo modelo
+        selected = sorted((candidates[i] for i in chosen), key=lambda c: c["index"])
+        return selected, used
+
+    @staticmethod
+    def render(candidate: Dict) -> str:
+        page = candidate.get("page")
+        return (f"[Página {page}] " if page else "") + candidate["content"]
+
+    def render_context(self, selected: List[Dict]) -> str:
+        return "\n\n".join(self.render(candidate) for candidate in selected)
@@ -0,0 +1,121 @@
+"""
+document.py - Retrato imutável de um documento processado
+
+A ingestão produz um objeto Document com tudo o que o /chat precisa já calculado:
+1. Texto completo (os segmentos imutáveis publicados pelo PageStore, sem uma
+   segunda cópia numa string única; o chat lê só páginas e o início do texto)
+2. Offsets de cada página dentro do texto completo
+3. Estatísticas (páginas, palavras, média por página, páginas puladas)
+4. Idioma detectado de cada página e idioma geral (ponderado pelas palavras)
+
+Como o objeto é imutável, pode ser compartilhado entre requisições concorrentes
+sem cópias nem locks, e o caminho do chat apenas lê campos prontos em O(1).
+"""
+
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from page_store import PAGE_SEPARATOR, PageStore, TextSegments, dominant_language
+
+
+@dataclass(frozen=True)
+class Document:
+    content_hash: Optional[str]
+    text: TextSegments
+    # (número da página, início, fim) de cada página dentro do texto completo
+    page_offsets: Tuple[Tuple[int, int, int], ...]
+    statistics: Mapping = field(default_factory=lambda: MappingProxyType({}))
+    language: str = "N/A"
+    # Idioma detectado de cada página (mesma ordem de page_offsets)
+    page_languages: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_pages(cls, pages: List[Dict], content_hash: str = None, language: str = None,
+                   skipped_pages: Iterable[int] = ()) -> "Document":
+        """Monta o retrato a partir das páginas extraídas (idioma geral calculado das páginas se omitido)"""
+        if isinstance(pages, PageStore):
+            return cls.from_page_store(pages, content_hash, language, skipped_pages)
+
+        parts = []
+        offsets = []
+        position = 0
+        total_words = 0
+        page_languages = []
+        for page in pages:
+            content = page.get("content")
+            if content is None:
+                continue
+            parts.append(content)
+            offsets.append((page.get("number", len(offsets) + 1), position, position + len(content)))
+            position += len(content) + len(PAGE_SEPARATOR)
+            total_words += page.get("word_count", 0)
+            page_languages.append(page.get("language", "N/A"))
+
+        full_text = PAGE_SEPARATOR.join(parts) + PAGE_SEPARATOR if parts else ""
+        text = TextSegments((full_text,), (0,)) if full_text else TextSegments()
+        if language is None:
+            language = dominant_language(
+                (page.get("language", "N/A"), page.get("word_count", 0)) for page in pages
+            )
+        return cls._build(content_hash, text, tuple(offsets), len(pages), total_words, language,
+                          tuple(page_languages), tuple(skipped_pages))
+
+    @classmethod
+    def from_page_store(cls, store: PageStore, content_hash: str = None, language: str = None,
+                        skipped_pages: Iterable[int] = ()) -> "Document":
+        """Monta o retrato reaproveitando o texto publicado pelo PageStore (sem cópia do texto)"""
+        # Páginas contadas antes de pegar o texto: o PageStore publica o texto antes dos metadados
+        count = len(store)
+        text = store.view
+        offsets = tuple(
+            (store.numbers[i], store.offsets[i], store.offsets[i] + store.lengths[i]) for i in range(count)
+        )
+        if language is None:
+            language = store.dominant_language()
+        return cls._build(content_hash, text, offsets, count, store.total_words, language,
+                          store.page_languages[:count], tuple(skipped_pages))
+
+    @classmethod
+    def _build(cls, content_hash, text, offsets, processed_pages, total_words, language,
+               page_languages=(), skipped_pages=()) -> "Document":
+        statistics = {
+            "success": processed_pages > 0,
+            "message": "Estatísticas calculadas com sucesso" if processed_pages else "Nenhum conteúdo extraído.",
+            "total_pages": processed_pages + len(skipped_pages),
+            "processed_pages": processed_pages,
+            "total_words": total_words,
+            "average_words_per_page": total_words / processed_pages if processed_pages > 0 else 0,
+            "language": language,
+            # Páginas não extraídas por orçamento de tempo ou cancelamento (resultado parcial)
+            "skipped_pages": tuple(skipped_pages),
+            "partial": bool(skipped_pages),
+            # Há texto além de espaços (evita percorrer o texto a cada pergunta)
+            "has_text": total_words > 0,
+        }
+        return cls(
+            content_hash=content_hash,
+            text=text,
+            page_offsets=offsets,
+            statistics=MappingProxyType(statistics),
+            language=language,
+            page_languages=page_languages,
+        )
+
+    @property
+    def page_count(self) -> int:
+        return len(self.page_offsets)
+
+    @property
+    def full_text(self) -> str:
+        """Texto completo numa única string (nova cópia a cada leitura; fora do caminho do chat)"""
+        return self.text.join()
+
+    def head(self, max_chars: int) -> str:
+        """Início do texto, até `max_chars` caracteres (sem montar o texto completo)"""
+        return self.text.head(max_chars)
+
+    def page_text(self, index: int) -> str:
+        """Texto da página na posição `index` (sem cópia do documento inteiro)"""
+        _, start, end = self.page_offsets[index]
+        return self.text.slice(start, end)
@@ -0,0 +1,202 @@
+"""
+document_registry.py - Registro de documentos carregados
+
+Este módulo substitui o estado global de PDF único por um registro de
+documentos identificados por ID:
+1. Cada upload gera uma entrada com suas próprias páginas, índice e estatísticas
+2. Cada documento mantém suas conversas (histórico e contexto do Ollama),
+   identificadas pelo conversation_id enviado pelo cliente
+3. O registro respeita um orçamento de memória, removendo os documentos
+   usados há mais tempo (LRU) quando o limite é ultrapassado
+
+Assim, usuários diferentes não sobrescrevem o documento uns dos outros e um
+único servidor pode manter muitos documentos carregados em memória.
+"""
+
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from document import Document
+from page_store import ChunkStore, PageStore
+
+
+class Conversation:
+    """
+    Histórico e contexto do Ollama de uma conversa sobre um documento.
+    O contexto só vale enquanto cobrir exatamente os turnos do histórico
+    (context_turn == turns); um turno registrado sem ele (resposta do cache,
+    pergunta concorrente) o invalida.
+    """
+
+    def __init__(self, conversation_id: str = None):
+        self.conversation_id = conversation_id
+        self.history: List[Dict] = []
+        # Contexto devolvido pelo Ollama no último turno (reaproveitado na próxima pergunta)
+        self.model_context: Optional[List[int]] = None
+        # Total de turnos registrados e o turno ao qual model_context corresponde
+        self.turns = 0
+        self.context_turn = 0
+        self.lock = threading.Lock()
+        self.last_access = time.time()
+
+
+class DocumentEntry:
+    """Estado de um documento carregado (páginas, índice, estatísticas e conversas)"""
+
+    def __init__(self, content_hash: str = None, filename: str = None, max_conversations: int = 64):
+        self.document_id = uuid.uuid4().hex
+        self.content_hash = content_hash
+        self.filename = filename
+        self.pages = PageStore()
+        # Retrato imutável (texto completo, estatísticas, idioma), trocado atomicamente
+        self.snapshot: Optional[Document] = None
+
+        # Estado de busca (preenchido por ModelManager.index_pdf/load_index)
+        self.text_chunks: List[str] = []
+        self.chunk_metadata: List[Dict] = []
+        self.index = None
+        self.lexical_index = None
+        self.embeddings = None
+        self.embedding_buffer = None
+        self.index_lock = threading.Lock()
+        # Conversas por conversation_id (LRU); sem ID, os clientes compartilham a conversa padrão
+        self.conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+        self.max_conversations = max_conversations
+        self._conversations_lock = threading.Lock()
+
+        # "processing" durante a ingestão em streaming, depois "ready", "partial" ou "failed"
+        self.status = "processing"
+        # Páginas puladas por orçamento de tempo ou cancelamento ({"number", "skipped": motivo})
+        self.skipped_pages: List[Dict] = []
+
+        self.created_at = time.time()
+        self.last_access = self.created_at
+
+    @property
+    def stats(self):
+        """Estatísticas pré-calculadas do documento"""
+        return self.snapshot.statistics if self.snapshot is not None else {}
+
+    def conversation(self, conversation_id: Optional[str] = None) -> Conversation:
+        """Retorna (criando se preciso) a conversa indicada, descartando as usadas há mais tempo"""
+        key = conversation_id or "default"
+        with self._conversations_lock:
+            conversation = self.conversations.get(key)
+            if conversation is None:
+                conversation = self.conversations[key] = Conversation(key)
+                while len(self.conversations) > self.max_conversations:
+                    self.conversations.popitem(last=False)
+            else:
+                self.conversations.move_to_end(key)
+            conversation.last_access = time.time()
+            return conversation
+
+    def refresh_snapshot(self, language: str = None):
+        """Recalcula o retrato imutável a partir das páginas atuais"""
+        kwargs = {"language": language} if language else {}
+        skipped = [page["number"] for page in self.skipped_pages]
+        self.snapshot = Document.from_pages(self.pages, self.content_hash, skipped_pages=skipped, **kwargs)
+        return self.snapshot
+
+    def is_ready(self) -> bool:
+        """Retorna True se o documento já pode ser consultado (mesmo parcialmente)"""
+        return self.status != "failed" and self.snapshot is not None and self.index is not None
+
+    def estimate_size(self) -> int:
+        """Estimativa do uso de memória do documento, em bytes"""
+        if isinstance(self.pages, PageStore):
+            size = self.pages.memory_usage()
+            shared_segments = set(map(id, self.pages.view.segments))
+        else:
+            size = sum(sys.getsizeof(page.get("content", "")) for page in self.pages)
+            shared_segments = set()
+        if self.snapshot is not None:
+            # Segmentos do retrato que o PageStore já não compartilha (fundidos depois do retrato)
+            size += sum(sys.getsizeof(segment) for segment in self.snapshot.text.segments
+                        if id(segment) not in shared_segments)
+        if isinstance(self.text_chunks, ChunkStore):
+            # Trechos são apenas intervalos sobre o texto das páginas
+            size += self.text_chunks.memory_usage()
+        else:
+            size += sum(sys.getsizeof(chunk) for chunk in self.text_chunks)
+        if self.lexical_index is not None:
+            size += self.lexical_index.memory_usage()
+        if self.embedding_buffer is not None:
+            # Buffer de embeddings (pode ter capacidade extra durante a ingestão)
+            size += self.embedding_buffer.nbytes
+        if self.embeddings is not None:
+            # Cópia dos vetores mantida dentro do índice FAISS
+            size += self.embeddings.nbytes
+        return size
+
+
+class DocumentRegistry:
+    def __init__(self, max_bytes: int = 1024 ** 3):
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._entries: "OrderedDict[str, DocumentEntry]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, entry: DocumentEntry) -> str:
+        """Registra um documento e aplica o orçamento de memória"""
+        with self._lock:
+            self._entries[entry.document_id] = entry
+            self._sizes[entry.document_id] = entry.estimate_size()
+            self._evict(keep=entry.document_id)
+        return entry.document_id
+
+    def get(self, document_id: Optional[str]) -> Optional[DocumentEntry]:
+        """Retorna o documento e o marca como usado recentemente"""
+        if not document_id:
+            return None
+        with self._lock:
+            entry = self._entries.get(document_id)
+            if entry is not None:
+                self._entries.move_to_end(document_id)
+                entry.last_access = time.time()
+            return entry
+
+    def update_size(self, document_id: str):
+        """Recalcula o tamanho de um documento (ex: ao fim da ingestão) e aplica o orçamento"""
+        with self._lock:
+            entry = self._entries.get(document_id)
+            if entry is not None:
+                self._sizes[document_id] = entry.estimate_size()
+                self._evict(keep=document_id)
+
+    def remove(self, document_id: str) -> bool:
+        """Remove um documento do registro"""
+        with self._lock:
+            self._sizes.pop(document_id, None)
+            return self._entries.pop(document_id, None) is not None
+
+    def _evict(self, keep: str = None):
+        """Remove documentos frios até caber no orçamento (chamar com o lock)"""
+        total = sum(self._sizes.values())
+        for document_id in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if document_id == keep:
+                continue
+            self._entries.pop(document_id)
+            total -= self._sizes.pop(document_id, 0)
+            self.evictions += 1
+            print(f"Documento {document_id} removido da memória (LRU)")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        """Retorna ocupação e contadores do registro"""
+        with self._lock:
+            return {
+                "documents": len(self._entries),
+                "size_bytes": sum(self._sizes.values()),
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,173 @@
+"""
+index_cache.py - Cache persistente do processamento de PDFs
+
+Este módulo guarda em disco o resultado caro do upload de um PDF:
+1. Páginas limpas e trechos extraídos (JSON)
+2. Matriz de embeddings (formato .npy)
+3. Índice FAISS serializado
+
+As entradas são endereçadas pelo conteúdo: a chave combina o hash dos bytes
+do PDF com a versão do extrator, o modelo de embeddings e a configuração do
+chunker. Um novo upload do mesmo arquivo pula o pdfplumber e o modelo de
+embeddings e carrega o índice pronto. O tamanho total é limitado, com
+remoção das entradas usadas há mais tempo (LRU).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Dict, Optional
+
+import faiss
+import numpy as np
+
+PAGES_FILE = "pages.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+INDEX_FILE = "index.faiss"
+
+
+class IndexCache:
+    def __init__(self, cache_dir: str = None, max_bytes: int = 2 * 1024 ** 3):
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "pdf_analyzer_cache")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Tamanho de cada entrada, mantido em memória (get_stats não percorre o disco);
+        # lido do disco só aqui e na remoção por LRU
+        self._sizes: Dict[str, int] = {
+            os.path.basename(path): size for _, size, path in self._entries()
+        }
+
+    @staticmethod
+    def make_key(content_hash: str, *versions: str) -> str:
+        """Combina o hash do PDF com as versões do extrator/modelo numa chave"""
+        key = hashlib.sha256(content_hash.encode("utf-8"))
+        for version in versions:
+            key.update(b"\0" + str(version).encode("utf-8"))
+        return key.hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Retorna páginas, trechos, embeddings e índice guardados, ou None"""
+        entry_dir = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, PAGES_FILE), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            embeddings = np.load(os.path.join(entry_dir, EMBEDDINGS_FILE))
+            index = faiss.read_index(os.path.join(entry_dir, INDEX_FILE))
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except Exception as e:
+            print(f"Entrada de cache corrompida ({key[:12]}), descartando: {e}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            with self._lock:
+                self.misses += 1
+                self._sizes.pop(key, None)
+            return None
+
+        # Atualizar o horário de acesso (ordem LRU)
+        try:
+            os.utime(entry_dir, None)
+        except OSError:
+            pass
+
+        with self._lock:
+            self.hits += 1
+        return {
+            "pages": data["pages"],
+            "chunks": data["chunks"],
+            "embeddings": embeddings,
+            "index": index,
+        }
+
+    def put(self, key: str, pages, chunks, embeddings: np.ndarray, index) -> bool:
+        """Grava uma entrada de forma atômica e aplica o limite de tamanho"""
+        entry_dir = self._entry_dir(key)
+        if os.path.isdir(entry_dir):
+            return True
+
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=self.cache_dir)
+        try:
+            with open(os.path.join(tmp_dir, PAGES_FILE), "w", encoding="utf-8") as f:
+                json.dump({"pages": list(pages), "chunks": list(chunks)}, f, ensure_ascii=False)
+            np.save(os.path.join(tmp_dir, EMBEDDINGS_FILE), embeddings)
+            faiss.write_index(index, os.path.join(tmp_dir, INDEX_FILE))
+            size = self._dir_size(tmp_dir)
+            os.replace(tmp_dir, entry_dir)
+            with self._lock:
+                self._sizes[key] = size
+        except OSError as e:
+            # Outra requisição pode ter gravado a mesma chave em paralelo
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.isdir(entry_dir):
+                print(f"Erro ao gravar cache: {e}")
+                return False
+        except Exception as e:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            print(f"Erro ao gravar cache: {e}")
+            return False
+
+        self._evict()
+        return True
+
+    @staticmethod
+    def _dir_size(path: str) -> int:
+        total = 0
+        for name in os.listdir(path):
+            try:
+                total += os.path.getsize(os.path.join(path, name))
+            except OSError:
+                pass
+        return total
+
+    def _entries(self):
+        """Lista (último acesso, tamanho, caminho) de cada entrada"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            try:
+                entries.append((os.stat(path).st_mtime, self._dir_size(path), path))
+            except OSError:
+                continue
+        return entries
+
+    def _evict(self):
+        """Remove as entradas menos usadas até caber no limite"""
+        with self._lock:
+            entries = sorted(self._entries())
+            # Ressincroniza com o disco (ex: entradas removidas por fora)
+            self._sizes = {os.path.basename(path): size for _, size, path in entries}
+            total = sum(size for _, size, _ in entries)
+            while entries and total > self.max_bytes:
+                _, size, path = entries.pop(0)
+                shutil.rmtree(path, ignore_errors=True)
+                self._sizes.pop(os.path.basename(path), None)
+                total -= size
+                self.evictions += 1
+                print(f"Cache: entrada removida por LRU ({os.path.basename(path)[:12]})")
+
+    def get_stats(self) -> Dict:
+        """Retorna contadores de acerto/erro e ocupação do cache (em memória, sem acessar o disco)"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._sizes),
+                "size_bytes": sum(self._sizes.values()),
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,132 @@
+"""
+ingestion.py - Pipeline de ingestão em streaming
+
+Este módulo encadeia as etapas de ingestão de um PDF sem esperar o fim de cada uma:
+1. Uma thread produtora extrai as páginas (PDFProcessor.iter_pages) e as coloca numa fila
+2. O consumidor divide cada página em trechos assim que ela chega
+3. Os trechos são enviados ao modelo de embeddings em lotes e adicionados ao índice
+4. Eventos de progresso são emitidos a cada página e a cada lote indexado
+
+Como a extração das próximas páginas acontece enquanto os lotes anteriores são
+indexados, o tempo total de ingestão cai e o documento pode ser consultado
+antes da última página ficar pronta. Com um CancellationToken, a ingestão para
+no prazo ou quando o cliente desiste, e o documento fica com o que já foi
+indexado (status "partial", com as páginas puladas registradas).
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from cancellation import CancellationToken
+from page_store import PageStore
+from request_profiler import profiled
+
+# Marcador de fim da fila de páginas
+_END = object()
+
+
+class IngestionPipeline:
+    def __init__(self, model_manager, pdf_processor, document, on_event: Optional[Callable[[Dict], None]] = None,
+                 batch_size: int = None, queue_size: int = 64):
+        self.model_manager = model_manager
+        self.pdf_processor = pdf_processor
+        self.document = document
+        self.on_event = on_event
+        self.batch_size = batch_size or model_manager.embedding_batch_size
+        self.queue_size = queue_size
+        self.chunk_count = 0
+
+    def _emit(self, event: str, **data):
+        if self.on_event is None:
+            return
+        try:
+            self.on_event({"event": event, "document_id": self.document.document_id, **data})
+        except Exception as e:
+            print(f"Erro ao emitir evento de ingestão: {e}")
+
+    def _produce(self, file_path: str, pages: "queue.Queue", token: CancellationToken):
+        """Thread produtora: extrai as páginas e as coloca na fila"""
+        try:
+            for page in self.pdf_processor.iter_pages(file_path, token):
+                pages.put(page)
+        except Exception as e:
+            pages.put(e)
+        finally:
+            pages.put(_END)
+
+    def _flush(self, pending: List[Dict]):
+        """Indexa um lote de trechos e atualiza as estatísticas parciais"""
+        if not pending:
+            return
+        indexed = self.model_manager.append_to_index(
+            pending, document=self.document, page_store=self.pdf_processor.pages
+        )
+        self.chunk_count = indexed
+        # Retrato parcial: permite responder perguntas antes do fim da ingestão
+        self.document.refresh_snapshot()
+        self._emit("indexed", chunks=indexed, pages=len(self.document.pages))
+
+    def run(self, file_path: str, token: CancellationToken = None) -> bool:
+        """Executa a ingestão completa; retorna True se algum conteúdo foi indexado"""
+        token = token or CancellationToken()
+        start_time = time.perf_counter()
+        processor = self.pdf_processor
+        processor.pages = PageStore()
+        processor.pdf_loaded = False
+        # O documento compartilha o armazenamento de páginas, que cresce durante a ingestão
+        self.document.pages = processor.pages
+
+        pages: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        producer = threading.Thread(target=profiled(self._produce), args=(file_path, pages, token), daemon=True)
+        producer.start()
+        self._emit("started", filename=self.document.filename)
+
+        pending: List[Dict] = []
+        skipped: List[Dict] = []
+        error = None
+        while True:
+            item = pages.get()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                error = item
+                continue
+            if token.cancelled:
+                # Continuar esvaziando a fila (a produtora para em seguida), sem indexar mais nada
+                skipped.append({"number": item["number"], "skipped": token.reason})
+                continue
+
+            processor.pages.append(item)
+            pending.extend(processor.chunker.chunk_page(item["content"], item["number"]))
+            self._emit("page", page=item["number"], total_pages=processor.total_pages)
+
+            if len(pending) >= self.batch_size:
+                self._flush(pending)
+                pending = []
+
+        self._flush(pending)
+        producer.join()
+
+        elapsed = time.perf_counter() - start_time
+        if error is not None:
+            print(f"Erro durante a extração em streaming: {error}")
+        self.document.skipped_pages = sorted(processor.skipped_pages + skipped, key=lambda page: page["number"])
+        if not processor.pages or not self.chunk_count:
+            self.document.status = "failed"
+            self._emit("error", message=str(error) if error else "Nenhum conteúdo extraído do PDF.")
+            return False
+
+        processor.pdf_loaded = True
+        if not token.cancelled:
+            # Índice definitivo (exato, HNSW ou IVF) conforme o número de trechos;
+            # após um cancelamento fica o índice exato montado durante a ingestão
+            self.model_manager.finalize_index(document=self.document)
+        self.document.refresh_snapshot()
+        self.document.status = "partial" if self.document.skipped_pages else "ready"
+        if self.document.skipped_pages:
+            print(f"Ingestão parcial: {len(self.document.skipped_pages)} páginas puladas")
+        print(f"Ingestão concluída em {elapsed:.2f}s: {len(processor.pages)} páginas, {self.chunk_count} trechos "
+              f"(camadas de extração: {processor.pages.tier_counts()})")
+        return True
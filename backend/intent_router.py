@@ -0,0 +1,224 @@
+"""
+intent_router.py - Roteamento de intenção e formato das perguntas
+
+Antes de qualquer busca, o /chat verifica se a pergunta é uma saudação, uma
+pergunta fora do escopo, uma pergunta simples sobre as estatísticas do documento
+e se pede um formato de resposta (tópicos, tabela, JSON...). Este módulo:
+1. Guarda essas regras como dados (vocabulários por idioma), não como código
+2. Compila todos os termos, de todos os idiomas, num único autômato
+   Aho-Corasick, construído uma vez na inicialização
+3. Percorre a pergunta uma única vez e devolve intenção e formato juntos
+4. Só executa as expressões regulares de pedido de formato (pré-compiladas)
+   quando a palavra que as inicia aparece na pergunta
+
+Adicionar um idioma é só registrar outro vocabulário: o custo por pergunta
+continua proporcional ao tamanho da pergunta, não ao número de termos.
+"""
+
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Vocabulários por idioma. A ordem das listas define a prioridade das regras.
+VOCABULARIES = {
+    "pt": {
+        # Saudações: a pergunta precisa começar com o termo
+        "greeting": ["oi", "olá", "ola", "bom dia", "boa tarde", "boa noite", "hey", "hi", "hello"],
+        "unrelated": ["como vai", "tudo bem", "quem é você", "quem e voce", "qual seu nome"],
+        # Perguntas simples respondidas com as estatísticas do documento
+        "statistics": [
+            ("pages", ["quantas páginas", "quantas paginas", "número de páginas", "numero de paginas",
+                       "total de páginas", "total de paginas", "páginas tem", "paginas tem"]),
+            ("words", ["quantas palavras", "número de palavras", "numero de palavras",
+                       "total de palavras", "palavras tem", "contagem de palavras"]),
+            ("language", ["qual idioma", "em que idioma", "idioma do", "língua do", "lingua do",
+                          "linguagem do", "escrito em qual"]),
+            ("average_words", ["média de palavras", "media de palavras", "palavras por página",
+                               "palavras por pagina", "média por página", "media por pagina"]),
+            ("size", ["tamanho", "grande", "pequeno", "extenso", "longo", "curto"]),
+        ],
+        "formats": [
+            ("tópicos", ["lista de tópicos", "em tópicos", "em forma de tópicos", "formato de tópicos",
+                         "em bullet points", "em pontos", "em itens", "listado", "como lista",
+                         "enumere", "enumerar", "enumerado", "como tópicos", "liste", "listar"]),
+            ("tabela", ["em tabela", "formato de tabela", "como tabela", "em forma de tabela",
+                        "organize em tabela", "apresente em tabela", "mostre em tabela",
+                        "formato tabular", "estrutura de tabela", "tabular"]),
+            ("resumo", ["resumidamente", "de forma resumida", "em resumo", "sintetize", "síntese",
+                        "versão resumida", "versao resumida", "resuma", "resumo", "sumarize",
+                        "sumário", "sumario", "de forma concisa", "concisamente"]),
+            ("detalhado", ["detalhadamente", "em detalhes", "de forma detalhada", "com detalhes",
+                           "explicação detalhada", "explicacao detalhada", "seja detalhado",
+                           "com informações completas", "com informacoes completas",
+                           "de maneira abrangente", "abrangente", "completo", "aprofundado"]),
+            ("markdown", ["em markdown", "formato markdown", "use markdown", "com markdown",
+                          "sintaxe markdown", "utilize markdown"]),
+            ("html", ["em html", "formato html", "use html", "com html", "sintaxe html",
+                      "utilize html", "código html", "codigo html"]),
+            ("json", ["em json", "formato json", "use json", "com json", "sintaxe json",
+                      "utilize json", "código json", "codigo json", "notação json", "notacao json"]),
+            ("gráfico", ["em gráfico", "em grafico", "formato de gráfico", "formato de grafico",
+                         "como gráfico", "como grafico", "visualização", "visualizacao",
+                         "gráfico de barras", "grafico de barras", "gráfico de pizza",
+                         "grafico de pizza", "de forma visual", "visualmente"]),
+        ],
+        # Pedidos de formato em texto livre: (palavra que inicia o padrão, expressão regular)
+        "format_patterns": [
+            ("responda ", r"responda (?:em|usando|com|no formato(?: de)?|como) ([\w\s]+)"),
+            ("apresente ", r"apresente (?:em|usando|com|no formato(?: de)?|como) ([\w\s]+)"),
+            ("mostre ", r"mostre (?:em|usando|com|no formato(?: de)?|como) ([\w\s]+)"),
+            ("exiba ", r"exiba (?:em|usando|com|no formato(?: de)?|como) ([\w\s]+)"),
+            ("formate ", r"formate (?:em|usando|como|no formato(?: de)?) ([\w\s]+)"),
+            ("quero ", r"quero (?:em|no formato(?: de)?|como) ([\w\s]+)"),
+            ("formato ", r"formato (?:de|em) ([\w\s]+)"),
+            ("organizado ", r"organizado (?:em|como) ([\w\s]+)"),
+        ],
+    },
+}
+
+
+class AhoCorasick:
+    """Autômato de múltiplos padrões: encontra todos os termos numa única passada"""
+
+    def __init__(self, patterns: Iterable[Tuple[str, object]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Para cada estado: (tamanho do termo, valor associado) dos termos que terminam nele
+        self._output: List[List[Tuple[int, object]]] = [[]]
+        for pattern, value in patterns:
+            self._add(pattern, value)
+        self._build_failure_links()
+
+    def _add(self, pattern: str, value):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(pattern), value))
+
+    def _build_failure_links(self):
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0) if state else 0
+                # Herdar as saídas do estado de falha (termos que são sufixos)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find(self, text: str):
+        """Gera (início, valor) para cada ocorrência de termo no texto"""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                for length, value in output[state]:
+                    yield position - length + 1, value
+
+
+class Route(NamedTuple):
+    # "greeting", "unrelated", uma intenção de estatística ("pages", "words", ...) ou None
+    intent: Optional[str]
+    # Formato de resposta pedido ("tópicos", "tabela", ...) ou None
+    format: Optional[str]
+
+
+class IntentRouter:
+    def __init__(self, vocabularies: Dict[str, Dict] = None):
+        self.vocabularies: Dict[str, Dict] = {}
+        for language, vocabulary in (vocabularies or VOCABULARIES).items():
+            self.vocabularies[language] = vocabulary
+        self._compile()
+
+    def register_language(self, language: str, vocabulary: Dict):
+        """Adiciona (ou substitui) o vocabulário de um idioma e recompila o autômato"""
+        self.vocabularies[language] = vocabulary
+        self._compile()
+
+    def _compile(self):
+        terms: List[Tuple[str, Tuple[str, str]]] = []
+        intents: List[str] = ["greeting", "unrelated"]
+        formats: List[str] = []
+        format_terms: Dict[str, List[str]] = {}
+        patterns: List[Tuple[int, "re.Pattern"]] = []
+        triggers: List[str] = []
+
+        for vocabulary in self.vocabularies.values():
+            for term in vocabulary.get("greeting", ()):
+                terms.append((term, ("greeting", "greeting")))
+            for term in vocabulary.get("unrelated", ()):
+                terms.append((term, ("intent", "unrelated")))
+            for intent, intent_terms in vocabulary.get("statistics", ()):
+                if intent not in intents:
+                    intents.append(intent)
+                terms.extend((term, ("intent", intent)) for term in intent_terms)
+            for format_name, names in vocabulary.get("formats", ()):
+                if format_name not in formats:
+                    formats.append(format_name)
+                format_terms.setdefault(format_name, []).extend(names)
+                terms.extend((term, ("format", format_name)) for term in names)
+            for trigger, pattern in vocabulary.get("format_patterns", ()):
+                if trigger not in triggers:
+                    triggers.append(trigger)
+                patterns.append((triggers.index(trigger), re.compile(pattern)))
+
+        terms.extend((trigger, ("trigger", index)) for index, trigger in enumerate(triggers))
+        self._automaton = AhoCorasick(terms)
+        self._intents = intents
+        self._formats = formats
+        self._intent_priority = {intent: rank for rank, intent in enumerate(intents)}
+        self._format_priority = {format_name: rank for rank, format_name in enumerate(formats)}
+        self._patterns = patterns
+        # Todos os termos de cada formato numa única string: "x in termo" para algum termo
+        # equivale a "x in haystack" (o texto capturado não contém o separador)
+        self._format_haystacks = [(name, "\x00".join(format_terms[name])) for name in formats]
+
+    def route(self, question: str) -> Route:
+        """Intenção e formato da pergunta, numa única passada pelo texto"""
+        text = question.lower()
+        intent_rank = None
+        format_rank = None
+        triggered = set()
+        for start, (kind, label) in self._automaton.find(text):
+            if kind == "format":
+                rank = self._format_priority[label]
+                if format_rank is None or rank < format_rank:
+                    format_rank = rank
+            elif kind == "trigger":
+                triggered.add(label)
+            elif kind == "intent" or start == 0:
+                # Saudações só valem no início da pergunta
+                rank = self._intent_priority["greeting" if kind == "greeting" else label]
+                if intent_rank is None or rank < intent_rank:
+                    intent_rank = rank
+
+        intent = self._intents[intent_rank] if intent_rank is not None else None
+        if format_rank is not None:
+            return Route(intent, self._formats[format_rank])
+        return Route(intent, self._match_format_pattern(text, triggered) if triggered else None)
+
+    def _match_format_pattern(self, text: str, triggered) -> Optional[str]:
+        """Pedidos de formato em texto livre ("responda em ...") mapeados para um formato conhecido"""
+        for trigger, pattern in self._patterns:
+            if trigger not in triggered:
+                continue
+            match = pattern.search(text)
+            if match:
+                requested = match.group(1).strip()
+                for format_name, haystack in self._format_haystacks:
+                    if requested in haystack:
+                        return format_name
+        return None
@@ -0,0 +1,93 @@
+"""
+language_detector.py - Detecção de idioma de documentos e perguntas
+
+O langdetect é lento para inicializar e, sem semente fixa, pode dar respostas
+diferentes para o mesmo texto. Este módulo centraliza a detecção:
+1. Semente fixa (DetectorFactory.seed) para resultados determinísticos
+2. Perguntas: resultado memorizado (LRU) e, para textos curtos, uma heurística
+   barata por palavras funcionais antes de recorrer ao langdetect
+3. Documentos: idioma de cada página na extração (numa amostra do texto); o
+   idioma geral, ponderado pelas palavras, é calculado uma vez na ingestão
+   (page_store.dominant_language)
+
+Assim, o /chat não paga a detecção a cada pergunta e as estatísticas do
+documento trazem o idioma real em vez de "pt" fixo.
+"""
+
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Optional
+
+from langdetect import DetectorFactory, LangDetectException, detect
+
+# Resultados determinísticos para o mesmo texto
+DetectorFactory.seed = 0
+
+# Palavras funcionais que distinguem os idiomas mais comuns nas perguntas
+STOPWORDS = {
+    "pt": frozenset("o os as do da dos das não é são qual quais quem como onde quando quantas quantos "
+                    "para com uma um no na nos nas está isso este esta pelo pela sobre tem".split()),
+    "en": frozenset("the what who how is are of and to which does do many much where when this "
+                    "that with for about has have there".split()),
+    "es": frozenset("el los las del qué cuál cuáles quién cómo dónde cuándo cuántas cuántos es son "
+                    "y una un está esto este esta por sobre tiene hay".split()),
+}
+
+_WORD = re.compile(r"\w+")
+
+
+class LanguageDetector:
+    def __init__(self, default: str = "pt", short_text_words: int = 6, page_sample_chars: int = 1000,
+                 cache_size: int = 4096):
+        self.default = default
+        # Até quantas palavras a heuristica por palavras funcionais é tentada primeiro
+        self.short_text_words = short_text_words
+        # Trecho de cada página usado na detecção (o início basta e limita o custo)
+        self.page_sample_chars = page_sample_chars
+        self._detect_cached = lru_cache(maxsize=cache_size)(self._detect_question)
+
+    def warm_up(self):
+        """Carrega os perfis do langdetect (lento) antes da primeira requisição"""
+        self.detect_text("Este é um texto de exemplo para carregar os perfis de idioma.")
+
+    @staticmethod
+    def heuristic(text: str) -> Optional[str]:
+        """Idioma pelas palavras funcionais, ou None se não houver um vencedor claro"""
+        words = _WORD.findall(text.lower())
+        scores = Counter()
+        for word in words:
+            for language, stopwords in STOPWORDS.items():
+                if word in stopwords:
+                    scores[language] += 1
+        ranked = scores.most_common(2)
+        if not ranked or (len(ranked) > 1 and ranked[0][1] == ranked[1][1]):
+            return None
+        return ranked[0][0]
+
+    def detect_text(self, text: str) -> Optional[str]:
+        """langdetect (com semente fixa); None se não for possível detectar"""
+        try:
+            return detect(text)
+        except LangDetectException:
+            return None
+
+    def _detect_question(self, text: str) -> str:
+        if len(_WORD.findall(text)) <= self.short_text_words:
+            language = self.heuristic(text)
+            if language:
+                return language
+        return self.detect_text(text) or self.default
+
+    def detect_question(self, text: str) -> str:
+        """Idioma da pergunta (memorizado; textos curtos passam primeiro pela heurística)"""
+        if not text or not text.strip():
+            return self.default
+        return self._detect_cached(text.strip())
+
+    def detect_page(self, text: str) -> str:
+        """Idioma de uma página extraída ("N/A" para páginas sem texto suficiente)"""
+        sample = text[:self.page_sample_chars] if text else ""
+        if len(sample.strip()) < 20:
+            return (self.heuristic(sample) if sample else None) or "N/A"
+        return self.detect_text(sample) or "N/A"
@@ -0,0 +1,129 @@
+"""
+lexical_index.py - Índice invertido e ranqueamento BM25
+
+Os embeddings do all-MiniLM não distinguem bem termos exatos como números de
+cláusulas, CNPJs e códigos de produto. Este módulo complementa a busca vetorial:
+1. Um tokenizador que preserva identificadores (CNPJ/CPF, "cláusula 5.2.1",
+   códigos como "ABC-123") além das palavras comuns, sem acentos e sem caixa
+2. Um índice invertido (termo -> trechos e frequências em arrays tipados),
+   construído durante a ingestão e atualizado a cada lote de trechos
+3. Ranqueamento BM25 dos trechos para uma pergunta
+4. Fusão por posição recíproca (RRF) com os resultados do FAISS
+
+Os resultados combinados melhoram a primeira recuperação e evitam recorrer ao
+início do documento como contexto quando a busca vetorial não acha nada.
+"""
+
+import math
+import re
+import threading
+import unicodedata
+from array import array
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# Identificadores primeiro (CNPJ, CPF, números com pontos, códigos), depois palavras
+_TOKEN = re.compile(
+    r"\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}"      # CNPJ
+    r"|\d{3}\.\d{3}\.\d{3}-\d{2}"           # CPF
+    r"|\d+(?:[./-]\d+)+"                    # cláusulas (5.2.1), datas, valores
+    r"|[a-z]+-?\d+[a-z0-9-]*"               # códigos (abc-123, art5)
+    r"|\w+"
+)
+
+STOPWORDS = frozenset(
+    "a o e é de do da dos das em no na nos nas um uma uns umas para por com sem que se "
+    "ao aos as os ou como mais mas sua seu suas seus ser foi são qual quais quem "
+    "the of and to in is are for on with by an be this that what which who".split()
+)
+
+
+def _strip_accents(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokeniza o texto preservando identificadores; números compostos também viram só dígitos"""
+    tokens = []
+    for token in _TOKEN.findall(_strip_accents(text.casefold())):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if not token.isalnum() and any(char.isdigit() for char in token):
+            # "12.345.678/0001-90" também casa com "12345678000190"
+            digits = "".join(char for char in token if char.isalnum())
+            if digits != token:
+                tokens.append(digits)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Combina listas ordenadas de IDs somando 1 / (k + posição) de cada lista"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class LexicalIndex:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # termo -> (IDs dos trechos, frequência do termo em cada trecho)
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._lengths = array("l")
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, texts: Iterable[str]) -> int:
+        """Indexa novos trechos (IDs sequenciais, na mesma ordem do índice vetorial)"""
+        with self._lock:
+            for text in texts:
+                doc_id = len(self._lengths)
+                counts: Dict[str, int] = {}
+                tokens = tokenize(text)
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for token, count in counts.items():
+                    postings = self._postings.get(token)
+                    if postings is None:
+                        postings = self._postings[token] = (array("l"), array("l"))
+                    postings[0].append(doc_id)
+                    postings[1].append(count)
+                self._lengths.append(len(tokens))
+                self._total_length += len(tokens)
+            return len(self._lengths)
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[int, float]]:
+        """Retorna os `top_k` trechos (ID, pontuação BM25) para a pergunta"""
+        terms = set(tokenize(query))
+        with self._lock:
+            total = len(self._lengths)
+            if not total or not terms:
+                return []
+            average_length = self._total_length / total
+            k1, b = self.k1, self.b
+            lengths = self._lengths
+            scores: Dict[int, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                doc_ids, frequencies = postings
+                idf = math.log(1 + (total - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+                for doc_id, frequency in zip(doc_ids, frequencies):
+                    norm = k1 * (1 - b + b * lengths[doc_id] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (k1 + 1) / (frequency + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def memory_usage(self) -> int:
+        """Estimativa (bytes) das listas de ocorrências"""
+        with self._lock:
+            size = self._lengths.buffer_info()[1] * self._lengths.itemsize
+            for term, (doc_ids, frequencies) in self._postings.items():
+                size += len(term) + 2 * doc_ids.itemsize * len(doc_ids)
+            return size
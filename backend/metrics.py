@@ -0,0 +1,245 @@
+"""
+metrics.py - Métricas de latência por etapa no formato do Prometheus
+
+Os benchmarks medem o servidor isolado, mas em produção não havia como saber
+em qual etapa o tempo de um upload ou de uma pergunta estava indo. Este módulo
+mantém, sem dependências externas:
+1. Histogram: distribuição de durações (ou outros valores) em faixas cumulativas,
+   com soma e contagem, por combinação de rótulos
+2. Counter: contadores monotônicos (ex: tokens processados pelo Ollama)
+3. MetricsRegistry: o conjunto das métricas e dos coletores lidos na hora da
+   consulta (ex: acertos dos caches), exportado em texto por render()
+
+As métricas do servidor ficam definidas aqui (REGISTRY e as constantes abaixo)
+e cada módulo registra a própria etapa. Tudo é protegido por lock: as etapas
+rodam no loop de eventos, nas threads de ingestão e no pool de threads.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Faixas padrão (s): de 1 ms a 2 min, cobrindo de uma busca no FAISS a uma geração longa
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Páginas: a camada rápida fica abaixo de 10 ms, o layout pode passar de segundos
+PAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 500)
+
+# (nome, rótulos, valor) de uma amostra exportada
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: rótulos esperados {self.labelnames}, recebidos {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        if amount < 0:
+            raise ValueError("Um contador só pode aumentar")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            values = list(self._values.items())
+        return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in values]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por combinação de rótulos: [contagem por faixa (não cumulativa) + acima da última, soma]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        # Primeira faixa cujo limite superior comporta o valor (len(buckets): acima de todas)
+        position = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][position] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observa a duração do bloco (também quando ele termina com exceção)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        samples = []
+        for key, counts, total in values:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        # Coletores: funções chamadas a cada render() -> [(nome, tipo, ajuda, [(rótulos, valor)])]
+        self._collectors: List[Callable[[], Iterable[tuple]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrica já registrada: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[tuple]]):
+        """Valores lidos só na consulta (ex: contadores que o próprio componente já mantém)"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Todas as métricas no formato de texto do Prometheus (versão 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for collector in collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                print(f"Erro ao coletar métricas: {str(e)}")
+                continue
+            for name, type_name, documentation, values in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {type_name}")
+                for labels, value in values:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Etapas do upload e do chat: upload_receive, upload_copy, page_cleaning, embedding_chunks,
+# embedding_query, vector_search e prompt_build
+STAGE_SECONDS = REGISTRY.histogram(
+    "pdf_analyzer_stage_seconds", "Duração de cada etapa do upload e do chat (s)", ("stage",))
+PAGE_EXTRACTION_SECONDS = REGISTRY.histogram(
+    "pdf_analyzer_page_extraction_seconds", "Extração de texto por página, pela camada que resolveu a página (s)",
+    ("tier",), buckets=PAGE_BUCKETS)
+UPLOAD_BYTES = REGISTRY.counter(
+    "pdf_analyzer_upload_bytes_total", "Bytes de PDF recebidos nos uploads")
+
+# Geração (mode: complete para /chat, stream para /chat/stream)
+LLM_SECONDS = REGISTRY.histogram(
+    "pdf_analyzer_llm_seconds", "Latência da chamada ao Ollama, do envio à resposta completa (s)", ("mode",))
+LLM_TIME_TO_FIRST_TOKEN = REGISTRY.histogram(
+    "pdf_analyzer_llm_time_to_first_token_seconds", "Tempo até o primeiro token no streaming (s)", ("mode",))
+LLM_REQUESTS = REGISTRY.counter(
+    "pdf_analyzer_llm_requests_total", "Chamadas ao Ollama por resultado (generated, empty, error)",
+    ("mode", "outcome"))
+OLLAMA_PREFILL_SECONDS = REGISTRY.histogram(
+    "pdf_analyzer_ollama_prompt_eval_seconds", "Processamento do prompt no Ollama (prefill, prompt_eval_duration) (s)",
+    ("mode",))
+OLLAMA_DECODE_SECONDS = REGISTRY.histogram(
+    "pdf_analyzer_ollama_eval_seconds", "Geração dos tokens no Ollama (decode, eval_duration) (s)", ("mode",))
+OLLAMA_PROMPT_TOKENS = REGISTRY.counter(
+    "pdf_analyzer_ollama_prompt_eval_tokens_total", "Tokens de prompt processados pelo Ollama (prompt_eval_count)",
+    ("mode",))
+OLLAMA_EVAL_TOKENS = REGISTRY.counter(
+    "pdf_analyzer_ollama_eval_tokens_total", "Tokens gerados pelo Ollama (eval_count)", ("mode",))
+OLLAMA_DECODE_TOKENS_PER_SECOND = REGISTRY.histogram(
+    "pdf_analyzer_ollama_eval_tokens_per_second", "Velocidade de geração (eval_count / eval_duration)",
+    ("mode",), buckets=TOKENS_PER_SECOND_BUCKETS)
+OLLAMA_PREFILL_TOKENS_PER_SECOND = REGISTRY.histogram(
+    "pdf_analyzer_ollama_prompt_eval_tokens_per_second",
+    "Velocidade de processamento do prompt (prompt_eval_count / prompt_eval_duration)",
+    ("mode",), buckets=TOKENS_PER_SECOND_BUCKETS + (1000, 2000, 5000, 10000))
+
+
+def record_ollama_stats(mode: str, response: Dict):
+    """Contagens e durações (em ns) que o Ollama devolve na resposta final"""
+    prompt_tokens = response.get("prompt_eval_count")
+    eval_tokens = response.get("eval_count")
+    prompt_seconds = (response.get("prompt_eval_duration") or 0) / 1e9
+    eval_seconds = (response.get("eval_duration") or 0) / 1e9
+
+    if prompt_tokens:
+        OLLAMA_PROMPT_TOKENS.inc(prompt_tokens, mode=mode)
+    if eval_tokens:
+        OLLAMA_EVAL_TOKENS.inc(eval_tokens, mode=mode)
+    if prompt_seconds > 0:
+        OLLAMA_PREFILL_SECONDS.observe(prompt_seconds, mode=mode)
+        if prompt_tokens:
+            OLLAMA_PREFILL_TOKENS_PER_SECOND.observe(prompt_tokens / prompt_seconds, mode=mode)
+    if eval_seconds > 0:
+        OLLAMA_DECODE_SECONDS.observe(eval_seconds, mode=mode)
+        if eval_tokens:
+            OLLAMA_DECODE_TOKENS_PER_SECOND.observe(eval_tokens / eval_seconds, mode=mode)
@@ -12,49 +12,102 @@ Utiliza a API do Ollama para gerar respostas sobre o conteúdo de PDFs,
 além de implementar fallbacks quando o serviço não está disponível.
 """
 
-from typing import List, Dict, Tuple
-import json
+from typing import AsyncIterator, Callable, List, Dict, Tuple
 import os
-import faiss
 import numpy as np
 from sentence_transformers import SentenceTransformer
-import requests
+import threading
 import time
-import langdetect  # Para detectar o idioma da pergunta
+from thinking_filter import StreamingThinkingFilter
+from ollama_client import AsyncOllamaClient, OllamaError
+from page_store import ChunkStore
+from vector_index import IndexBuilder, normalize
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from context_packer import ContextPacker, TokenCounter
+from language_detector import LanguageDetector
+from document_registry import Conversation
+from metrics import (LLM_REQUESTS, LLM_SECONDS, LLM_TIME_TO_FIRST_TOKEN, STAGE_SECONDS,
+                     record_ollama_stats)
+import httpx
 
 class ModelManager:
     def __init__(self):
         # Configurar para usar Ollama localmente
-        self.ollama_api_url = "http://localhost:11434/api"
+        self.ollama_api_url = os.getenv("OLLAMA_API_URL", "http://localhost:11434/api")
         self.model_name = "deepseek-r1"  # Modelo DeepSeek R1
+        # Tokenizador (Hugging Face) usado para contar os tokens do prompt; deve corresponder
+        # ao modelo do Ollama. Carregado no startup do servidor (ou na primeira contagem)
+        self.tokenizer_name = os.getenv("CONTEXT_TOKENIZER", "deepseek-ai/DeepSeek-R1-Distill-Qwen-7B")
         self.device = "ollama_api"
         self.max_context_length = 8000
         
+        # Embeddings calculados em lotes (ajustar por host conforme o throughput reportado)
+        self.embedding_batch_size = max(1, int(os.getenv("EMBEDDING_BATCH_SIZE", 64)))
+        self.last_embedding_stats = {}
+        self.embedding_model_name = "sentence-transformers/all-MiniLM-L6-v2"
+        
+        # Tipo de índice escolhido pelo número de trechos (exato, HNSW ou IVF), com
+        # similaridade de cosseno (produto interno sobre vetores normalizados)
+        self.index_builder = IndexBuilder(
+            hnsw_min_vectors=int(os.getenv("VECTOR_INDEX_HNSW_MIN", 20000)),
+            ivf_min_vectors=int(os.getenv("VECTOR_INDEX_IVF_MIN", 500000)),
+            ef_search=int(os.getenv("VECTOR_INDEX_EF_SEARCH", 64)),
+            nprobe=int(os.getenv("VECTOR_INDEX_NPROBE", 0)) or None,
+        )
+        # Versão do formato dos vetores/índice (entra na chave do cache em disco)
+        self.index_version = "cosine-1"
+        # Busca híbrida: BM25 + vetorial, com `hybrid_candidates` x top_k candidatos de cada lado
+        self.hybrid_search = os.getenv("HYBRID_SEARCH", "1") != "0"
+        self.hybrid_candidates = 4
+        self.rrf_k = 60
+
+        # Prompt montado por orçamento de tokens (janela do modelo menos a reserva da resposta)
+        self.context_window = int(os.getenv("CONTEXT_WINDOW_TOKENS", 8192))
+        self.retrieval_candidates = 16
+        self.context_packer = ContextPacker(
+            TokenCounter(self.tokenizer_name),
+            context_window=self.context_window,
+            reserve_output=int(os.getenv("CONTEXT_RESERVE_OUTPUT_TOKENS", 1024)),
+        )
+
+        # Reaproveitar o contexto (tokens/KV) devolvido pelo Ollama entre as perguntas de
+        # uma conversa, em vez de reenviar o histórico como texto a cada turno
+        self.reuse_model_context = os.getenv("OLLAMA_REUSE_CONTEXT", "1") != "0"
+        # Espaço mínimo da janela para o novo turno; abaixo disso o contexto é descartado
+        self.min_turn_tokens = self.context_window // 4
+
+        # Idioma das perguntas: semente fixa, resultado memorizado e heurística para textos curtos
+        self.language_detector = LanguageDetector()
+        
         # FAISS Index para busca semântica
         self.text_chunks = []
+        self.chunk_metadata = []
         self.index = None
-        self.conversation_history = []
+        self.lexical_index = None
+        self.embeddings = None
+        self.embedding_buffer = None
+        self.index_lock = threading.Lock()
+        # Conversa usada quando nenhuma é indicada (uso com um único documento)
+        self.conversation = Conversation()
         self.max_history_length = 5
         
         try:
             print("Carregando modelo de embeddings...")
-            self.embedding_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+            self.embedding_model = SentenceTransformer(self.embedding_model_name)
             print("Modelo de embeddings carregado com sucesso")
         except Exception as e:
             print(f"Erro ao carregar modelo de embeddings: {str(e)}")
             self.embedding_model = None
             
+        # Cliente HTTP assíncrono com conexões reutilizadas (não bloqueia o loop de eventos)
+        self.ollama = AsyncOllamaClient(self.ollama_api_url)
+            
         print("ModelManager inicializado para usar Ollama com DeepSeek R1")
-        
-        # Verificar se o Ollama está disponível
-        self._check_ollama_available()
+        # A disponibilidade do Ollama é verificada no evento de startup do servidor
         
     def _detect_language(self, text):
-        """Detecta o idioma do texto fornecido"""
-        try:
-            return langdetect.detect(text)
-        except:
-            return "pt"  # Padrão para português em caso de erro
+        """Detecta o idioma do texto fornecido (português se não for possível detectar)"""
+        return self.language_detector.detect_question(text)
             
     def _get_language_instruction(self, lang_code):
         """Retorna a instrução de idioma baseada no código do idioma"""
@@ -70,28 +123,27 @@ class ModelManager:
         
         return language_instructions.get(lang_code, "Responda em português.")
         
-    def _check_ollama_available(self):
+    async def check_ollama_available(self):
         """Verifica se o Ollama está disponível"""
         try:
             print("Tentando conectar ao Ollama em " + self.ollama_api_url)
-            response = requests.get(f"{self.ollama_api_url}/tags", timeout=3)
-            if response.status_code == 200:
-                # Verificar se o modelo está disponível
-                models = response.json().get("models", [])
-                model_names = [model.get("name", "") for model in models]
-                print(f"Modelos disponíveis no Ollama: {model_names}")
-                
-                if any(name == self.model_name or name.startswith(self.model_name) for name in model_names):
-                    print(f"Modelo {self.model_name} encontrado!")
-                    return True
-                else:
-                    print(f"Aviso: Modelo {self.model_name} não encontrado no Ollama.")
-                    print(f"É necessário executar 'ollama pull {self.model_name}' para baixá-lo.")
-                    return False
+            tags = await self.ollama.tags(timeout=3)
+            # Verificar se o modelo está disponível
+            models = tags.get("models", [])
+            model_names = [model.get("name", "") for model in models]
+            print(f"Modelos disponíveis no Ollama: {model_names}")
+            
+            if any(name == self.model_name or name.startswith(self.model_name) for name in model_names):
+                print(f"Modelo {self.model_name} encontrado!")
+                return True
             else:
-                print(f"Erro ao conectar ao Ollama: {response.status_code}")
+                print(f"Aviso: Modelo {self.model_name} não encontrado no Ollama.")
+                print(f"É necessário executar 'ollama pull {self.model_name}' para baixá-lo.")
                 return False
-        except requests.exceptions.ConnectionError:
+        except OllamaError as e:
+            print(f"Erro ao conectar ao Ollama: {e.status_code}")
+            return False
+        except httpx.ConnectError:
             print(f"Erro de conexão. O serviço Ollama não está rodando em {self.ollama_api_url}")
             print("Execute 'ollama serve' para iniciar o serviço Ollama.")
             return False
@@ -99,37 +151,57 @@ class ModelManager:
             print(f"Erro ao verificar disponibilidade do Ollama: {str(e)}")
             return False
 
-    def load_model(self):
+    async def load_model(self):
         """
         Método mantido para compatibilidade.
         """
-        return self._check_ollama_available()
+        return await self.check_ollama_available()
     
-    def index_pdf(self, pages):
-        """Cria um índice vetorial do PDF"""
+    def index_pdf(self, pages, document=None):
+        """
+        Cria um índice vetorial do PDF.
+        O estado é gravado em `document` (DocumentEntry) ou, se omitido, no próprio ModelManager.
+        """
+        target = self if document is None else document
         try:
             # Verificar se pages é uma lista de dicionários com chave "content"
             if isinstance(pages, list):
                 if all(isinstance(page, dict) and "content" in page for page in pages):
-                    self.text_chunks = [page["content"] for page in pages]
+                    text_chunks = [page["content"] for page in pages]
+                    # Página e offsets de cada trecho (quando vindos do chunker)
+                    chunk_metadata = [
+                        {"page": page.get("page"), "start": page.get("start"), "end": page.get("end")}
+                        for page in pages
+                    ]
                 else:
                     # Se pages é uma lista de strings
-                    self.text_chunks = [p for p in pages if isinstance(p, str)]
+                    text_chunks = [p for p in pages if isinstance(p, str)]
+                    chunk_metadata = [{} for _ in text_chunks]
             else:
                 # Caso pages seja uma string única
-                self.text_chunks = [pages] if isinstance(pages, str) else []
+                text_chunks = [pages] if isinstance(pages, str) else []
+                chunk_metadata = [{} for _ in text_chunks]
                 
-            if not self.text_chunks:
+            if not text_chunks:
                 print("Aviso: Nenhum conteúdo válido para indexar")
                 return False
                 
-            print(f"Indexando {len(self.text_chunks)} trechos de texto")
-            # Criar embeddings para cada trecho
-            embeddings = np.array([self.embedding_model.encode(text) for text in self.text_chunks])
+            print(f"Indexando {len(text_chunks)} trechos de texto")
+            # Criar embeddings em lotes diretamente numa matriz contígua
+            embeddings = self.encode_batched(text_chunks)
             
-            # Criar e popular o índice FAISS
-            self.index = faiss.IndexFlatL2(embeddings.shape[1])
-            self.index.add(embeddings)
+            # Criar e popular o índice FAISS (tipo escolhido pelo número de trechos)
+            index = self.index_builder.build(embeddings)
+            lexical_index = LexicalIndex()
+            lexical_index.add(text_chunks)
+
+            with target.index_lock:
+                target.text_chunks = text_chunks
+                target.chunk_metadata = chunk_metadata
+                target.embeddings = embeddings
+                target.embedding_buffer = embeddings
+                target.index = index
+                target.lexical_index = lexical_index
             
             print("Índice FAISS criado com sucesso")
             return True
@@ -139,45 +211,294 @@ class ModelManager:
             print(traceback.format_exc())
             return False
 
-    def search_pdf(self, query, top_k=3):
+    def load_index(self, chunks, embeddings, index, document=None, page_store=None):
+        """
+        Restaura um índice já construído (ex: vindo do cache em disco).
+        Com `page_store`, os trechos viram intervalos sobre o texto das páginas (sem cópias).
+        """
+        target = self if document is None else document
+        # O índice invertido é barato de reconstruir e não vai para o cache em disco
+        lexical_index = LexicalIndex()
+        lexical_index.add(chunk["content"] for chunk in chunks)
+        with target.index_lock:
+            target.lexical_index = lexical_index
+            if page_store is not None:
+                chunk_store = ChunkStore(page_store)
+                chunk_store.extend(chunks)
+                target.text_chunks = chunk_store
+                target.chunk_metadata = chunk_store.metadata
+            else:
+                target.text_chunks = [chunk["content"] for chunk in chunks]
+                target.chunk_metadata = [
+                    {"page": chunk.get("page"), "start": chunk.get("start"), "end": chunk.get("end")}
+                    for chunk in chunks
+                ]
+            target.embeddings = embeddings
+            target.embedding_buffer = embeddings
+            target.index = self.index_builder.configure(index)
+        print(f"Índice FAISS restaurado com {index.ntotal} vetores")
+        return True
+
+    def append_to_index(self, chunks: List[Dict], document=None, page_store=None) -> int:
+        """
+        Adiciona um lote de trechos a um índice em construção (ingestão em streaming).
+        Os embeddings vão para um buffer contíguo que cresce por duplicação, e o
+        documento já pode ser consultado com os trechos indexados até aqui.
+        Com `page_store`, os trechos são guardados como intervalos sobre o texto das páginas.
+        """
+        target = self if document is None else document
+        if not chunks:
+            return len(target.text_chunks)
+
+        embeddings = self.encode_batched([chunk["content"] for chunk in chunks])
+
+        with target.index_lock:
+            count = len(target.text_chunks)
+            needed = count + len(embeddings)
+            buffer = target.embedding_buffer
+            if buffer is None or buffer.shape[0] < needed:
+                capacity = max(needed, 2 * (buffer.shape[0] if buffer is not None else 0), 256)
+                new_buffer = np.empty((capacity, embeddings.shape[1]), dtype=np.float32)
+                if count:
+                    new_buffer[:count] = buffer[:count]
+                buffer = new_buffer
+                target.embedding_buffer = buffer
+            buffer[count:needed] = embeddings
+
+            if target.index is None:
+                # Busca exata durante a ingestão; finalize_index troca pelo índice definitivo
+                target.index = self.index_builder.new_flat(embeddings.shape[1])
+            target.index.add(embeddings)
+            if target.lexical_index is None:
+                target.lexical_index = LexicalIndex()
+            target.lexical_index.add(chunk["content"] for chunk in chunks)
+
+            if page_store is not None:
+                if not isinstance(target.text_chunks, ChunkStore):
+                    target.text_chunks = ChunkStore(page_store)
+                    target.chunk_metadata = target.text_chunks.metadata
+                target.text_chunks.extend(chunks)
+            else:
+                # Crescer as listas no lugar: a busca lê só os `count` primeiros, também sob o lock
+                target.text_chunks.extend(chunk["content"] for chunk in chunks)
+                target.chunk_metadata.extend(
+                    {"page": chunk.get("page"), "start": chunk.get("start"), "end": chunk.get("end")}
+                    for chunk in chunks
+                )
+            target.embeddings = buffer[:needed]
+            return needed
+
+    def finalize_index(self, document=None) -> bool:
+        """
+        Ao fim da ingestão em streaming, troca o índice exato pelo tipo adequado ao
+        número de trechos (reconstruído a partir dos embeddings guardados) e libera
+        a capacidade extra do buffer de embeddings.
+        """
+        target = self if document is None else document
+        with target.index_lock:
+            embeddings = target.embeddings
+        if embeddings is None or not len(embeddings):
+            return False
+
+        # Cópia compacta (sem a folga do buffer), construída fora do lock
+        embeddings = np.ascontiguousarray(embeddings).copy()
+        kind = self.index_builder.choose(len(embeddings))
+        index = self.index_builder.build(embeddings, kind) if kind != "flat" else None
+
+        with target.index_lock:
+            if len(target.text_chunks) != len(embeddings):
+                # O índice mudou enquanto reconstruíamos; manter o atual
+                return False
+            target.embeddings = embeddings
+            target.embedding_buffer = embeddings
+            if index is not None:
+                target.index = index
+        return True
+
+    def encode_batched(self, texts: List[str], batch_size: int = None) -> np.ndarray:
+        """
+        Gera os embeddings em lotes, escrevendo cada lote numa única matriz
+        float32 pré-alocada (sem arrays por página para empilhar depois).
+        Os vetores saem normalizados (busca por similaridade de cosseno).
+        """
+        batch_size = batch_size or self.embedding_batch_size
+        total = len(texts)
+        dimension = self.embedding_model.get_sentence_embedding_dimension()
+        embeddings = np.empty((total, dimension), dtype=np.float32)
+
+        start_time = time.perf_counter()
+        for start in range(0, total, batch_size):
+            end = min(start + batch_size, total)
+            embeddings[start:end] = self.embedding_model.encode(
+                texts[start:end],
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            )
+        elapsed = time.perf_counter() - start_time
+        STAGE_SECONDS.observe(elapsed, stage="embedding_chunks")
+
+        pages_per_second = total / elapsed if elapsed > 0 else float(total)
+        self.last_embedding_stats = {
+            "texts": total,
+            "batch_size": batch_size,
+            "seconds": elapsed,
+            "pages_per_second": pages_per_second,
+        }
+        print(f"Embeddings: {total} trechos em {elapsed:.2f}s "
+              f"({pages_per_second:.1f} páginas/s, lote={batch_size})")
+        return embeddings
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embedding da pergunta (1 x dim, float32), reaproveitável entre busca e cache de respostas"""
+        with STAGE_SECONDS.time(stage="embedding_query"):
+            return normalize(self.embedding_model.encode(query).reshape(1, -1))
+
+    def retrieve(self, query, top_k=4, document=None, query_embedding=None) -> List[Dict]:
+        """
+        Recupera os trechos candidatos para a pergunta: busca vetorial (FAISS) e,
+        com a busca híbrida ativa, BM25 sobre o índice invertido, combinadas por
+        posição recíproca (RRF). Retorna [{"index", "page", "content", "score"}].
+        """
+        target = self if document is None else document
+        if target.index is None or not target.text_chunks:
+            return []
+
+        query_emb = self.embed_query(query) if query_embedding is None else query_embedding
+        candidates = top_k * self.hybrid_candidates if self.hybrid_search else top_k
+        with target.index_lock:
+            text_chunks = target.text_chunks
+            chunk_metadata = target.chunk_metadata
+            lexical_index = target.lexical_index
+            count = min(len(text_chunks), target.index.ntotal)
+            with STAGE_SECONDS.time(stage="vector_search"):
+                scores, indices = target.index.search(query_emb, min(candidates, count))
+
+        vector_ranking = [(int(idx), float(score)) for idx, score in zip(indices[0], scores[0]) if 0 <= idx < count]
+        if self.hybrid_search and lexical_index is not None:
+            lexical_ranking = [doc_id for doc_id, _ in lexical_index.search(query, candidates) if doc_id < count]
+            ranked = reciprocal_rank_fusion([[idx for idx, _ in vector_ranking], lexical_ranking], self.rrf_k)
+        else:
+            ranked = vector_ranking
+
+        results = []
+        for idx, score in ranked[:top_k]:
+            page = chunk_metadata[idx].get("page") if idx < len(chunk_metadata) else None
+            results.append({"index": idx, "page": page, "content": text_chunks[idx], "score": score})
+        return results
+
+    def search_pdf(self, query, top_k=4, document=None, query_embedding=None):
         """Busca os trechos mais relevantes para a pergunta"""
+        target = self if document is None else document
         try:
-            if self.index is None or not self.text_chunks:
+            if target.index is None or not target.text_chunks:
                 print("AVISO: Índice FAISS não está pronto ou não há texto para buscar")
                 return "Não foi possível encontrar conteúdo relevante no documento."
 
-            query_emb = self.embedding_model.encode(query).reshape(1, -1)
-            distances, indices = self.index.search(query_emb, min(top_k, len(self.text_chunks)))
-            
-            if len(indices[0]) == 0:
+            results = self.retrieve(query, top_k, document=document, query_embedding=query_embedding)
+            if not results:
                 return "Não foi possível encontrar conteúdo relevante no documento."
-                
-            results = [self.text_chunks[idx] for idx in indices[0] if idx < len(self.text_chunks)]
-            return " ".join(results)
+
+            return "\n\n".join(
+                (f"[Página {result['page']}] " if result["page"] else "") + result["content"]
+                for result in results
+            )
         except Exception as e:
             print(f"Erro ao buscar no PDF: {str(e)}")
             import traceback
             print(traceback.format_exc())
             return "Erro na busca do conteúdo do documento."
     
-    def format_prompt(self, pdf_content: str, user_question: str) -> str:
+    def format_prompt(self, pdf_content: str, user_question: str, history: List[Dict] = None) -> str:
         """
         Formata o prompt para o modelo com contexto do PDF e histórico.
         """
+        start_time = time.perf_counter()
         if not pdf_content:
             pdf_content = "Não foi possível recuperar conteúdo relevante do documento."
         
-        # Truncar conteúdo se necessário
-        if len(pdf_content) > self.max_context_length:
-            pdf_content = pdf_content[:self.max_context_length] + "..."
+        # Truncar conteúdo se necessário (no fim de uma sentença)
+        pdf_content = self.truncate_context(pdf_content)
             
-        history = self.format_history()
+        history = self.format_history(history)
         
         # Detectar o idioma da pergunta
         detected_language = self._detect_language(user_question)
         language_instruction = self._get_language_instruction(detected_language)
         print(f"Idioma detectado: {detected_language}")
         
+        prompt = self._render_prompt(pdf_content, history, user_question, language_instruction)
+        STAGE_SECONDS.observe(time.perf_counter() - start_time, stage="prompt_build")
+        return prompt
+
+    def pack_prompt(self, user_question: str, document=None, query_embedding=None,
+                    fallback: Callable[[int], str] = None, model_context: List[int] = None,
+                    history: List[Dict] = None) -> str:
+        """
+        Monta o prompt dentro da janela de tokens do modelo: recupera candidatos,
+        escolhe os trechos por MMR (sem quase-duplicatas) e divide o orçamento entre
+        contexto, histórico e pergunta. Sem candidatos, usa o início do documento
+        cortado no orçamento do contexto: `fallback(n)` devolve os primeiros n
+        caracteres (ex: Document.head) e só é chamado nesse caso.
+        `history` e `model_context` vêm de conversation_state. Com `model_context`
+        (contexto devolvido pelo Ollama no turno anterior), a conversa já está no
+        modelo: o prompt traz só os trechos novos e a pergunta.
+        O tempo registrado em prompt_build inclui a busca (também medida à parte).
+        """
+        start_time = time.perf_counter()
+        target = self if document is None else document
+        detected_language = self._detect_language(user_question)
+        language_instruction = self._get_language_instruction(detected_language)
+        print(f"Idioma detectado: {detected_language}")
+
+        packer = self.context_packer
+        counter = packer.token_counter
+        # Instruções + pergunta: parte fixa do prompt
+        render = self._render_followup_prompt if model_context else self._render_prompt
+        fixed_tokens = counter.count(render("", "", user_question, language_instruction))
+        if model_context:
+            fixed_tokens += len(model_context)
+        history = [] if model_context else list(history or [])
+        full_history_tokens = counter.count(self.format_history(history)) if history else 0
+        history_budget, context_budget = packer.split_budget(fixed_tokens, full_history_tokens)
+        history_text = packer.pack_history(history, history_budget)
+        # O que o histórico não usou fica para o contexto
+        context_budget += history_budget - counter.count(history_text)
+
+        if query_embedding is None:
+            query_embedding = self.embed_query(user_question)
+        candidates = self.retrieve(user_question, self.retrieval_candidates, document=document,
+                                   query_embedding=query_embedding)
+        embeddings = None
+        if candidates:
+            with target.index_lock:
+                if target.embeddings is not None:
+                    embeddings = target.embeddings[[candidate["index"] for candidate in candidates]]
+        selected, used = packer.select(candidates, context_budget, query_embedding, embeddings)
+
+        fallback_text = None
+        if not selected and fallback is not None:
+            # Só o início do documento, lido dos segmentos (o texto completo não é montado)
+            fallback_text = fallback(context_budget * counter.max_chars_per_token)
+
+        if selected:
+            pdf_content = packer.render_context(selected)
+        elif fallback_text:
+            print("Contexto não encontrado, usando o início do documento")
+            pdf_content = counter.truncate(fallback_text, context_budget)
+            used = counter.count(pdf_content)
+        else:
+            pdf_content = "Não foi possível recuperar conteúdo relevante do documento."
+
+        print(f"Contexto: {len(selected)} de {len(candidates)} trechos, {used}/{context_budget} tokens "
+              f"(fixo {fixed_tokens}, histórico {history_budget})")
+        prompt = render(pdf_content, history_text, user_question, language_instruction)
+        STAGE_SECONDS.observe(time.perf_counter() - start_time, stage="prompt_build")
+        return prompt
+
+    def _render_prompt(self, pdf_content: str, history: str, user_question: str, language_instruction: str) -> str:
+        """Texto do prompt (instruções, contexto, histórico e pergunta)"""
         # Contexto claro e direcionado para o modelo
         prompt = f"""Você é um assistente que analisa PDFs. Sua única função é ler o conteúdo extraído do PDF abaixo e responder questões de forma direta e concisa, sem informações adicionais.
 
@@ -192,53 +513,216 @@ Pergunta: {user_question}
 Responda de forma direta e concisa, baseando-se exclusivamente no conteúdo do PDF acima.
 """
         return prompt
+
+    def _render_followup_prompt(self, pdf_content: str, history: str, user_question: str,
+                                language_instruction: str) -> str:
+        """Prompt de continuação: instruções e turnos anteriores já estão no contexto do modelo"""
+        return f"""Conteúdo do PDF relevante para a nova pergunta:
+{pdf_content}
+
+Pergunta: {user_question}
+
+{language_instruction}
+Responda de forma direta e concisa, baseando-se exclusivamente no conteúdo do PDF.
+"""
+
+    def conversation_state(self, conversation: Conversation = None) -> Tuple[List[Dict], List[int], int]:
+        """
+        Lê juntos, sob o lock da conversa: o histórico, o contexto do Ollama a
+        reaproveitar (ou None para usar o histórico em texto) e o número do turno
+        atual (a passar para record_turn). O contexto é descartado se não cobrir
+        exatamente o histórico ou se estiver perto do limite da janela.
+        """
+        conversation = conversation or self.conversation
+        with conversation.lock:
+            history = list(conversation.history)
+            context = conversation.model_context
+            if context and conversation.context_turn != conversation.turns:
+                print("Contexto do modelo não corresponde ao histórico; voltando ao histórico em texto")
+                context = conversation.model_context = None
+            if context and len(context) > self.context_window - self.context_packer.reserve_output - self.min_turn_tokens:
+                print("Contexto do modelo perto do limite da janela; voltando ao histórico em texto")
+                context = conversation.model_context = None
+            return history, (context if self.reuse_model_context else None), conversation.turns
+
+    def record_turn(self, question: str, answer: str, conversation: Conversation = None,
+                    model_context: List[int] = None, base_turn: int = None):
+        """
+        Registra o turno no histórico. O contexto devolvido pelo Ollama só é
+        guardado se nenhum outro turno foi registrado desde base_turn (turno lido
+        em conversation_state); caso contrário, ou sem contexto (resposta do cache,
+        erro), o contexto anterior deixa de valer e volta-se ao histórico em texto.
+        """
+        conversation = conversation or self.conversation
+        with conversation.lock:
+            conversation.history.append({"question": question, "answer": answer})
+            # Limitar o tamanho do histórico
+            if len(conversation.history) > self.max_history_length:
+                conversation.history = conversation.history[-self.max_history_length:]
+            conversation.turns += 1
+            if model_context and base_turn is not None and base_turn + 1 == conversation.turns:
+                conversation.model_context = model_context
+                conversation.context_turn = conversation.turns
+            else:
+                conversation.model_context = None
     
-    def generate_response(self, prompt: str) -> str:
+    def _generation_payload(self, prompt: str, model_context: List[int] = None) -> Dict:
+        """Monta o payload da API /generate do Ollama"""
+        payload = {
+            "model": self.model_name,
+            "prompt": prompt,
+            "options": {
+                "temperature": 0.1,  # Temperatura baixa para respostas mais factuais
+                "top_p": 0.9,
+                "top_k": 40,
+                # Janela usada no orçamento do prompt (o padrão do Ollama é menor)
+                "num_ctx": self.context_window
+            }
+        }
+        if model_context:
+            # Tokens da conversa anterior: o Ollama reaproveita o prefixo já processado
+            payload["context"] = model_context
+        return payload
+
+    async def generate_response(self, prompt: str) -> str:
         """
         Gera uma resposta usando a API do Ollama com o modelo DeepSeek.
         """
+        return (await self.generate_answer(prompt))["response"]
+
+    async def generate_answer(self, prompt: str, model_context: List[int] = None) -> Dict:
+        """
+        Como generate_response, mas retorna {"response": ..., "generated": bool, "context": ...}.
+        "generated" só é True quando a resposta veio do modelo (e não de erro ou fallback);
+        "context" é o contexto devolvido pelo Ollama para continuar a conversa.
+        """
         try:
             print(f"Gerando resposta com modelo {self.model_name} via Ollama...")
             
-            # Configurar payload para a API do Ollama
-            payload = {
-                "model": self.model_name,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.1,  # Temperatura baixa para respostas mais factuais
-                    "top_p": 0.9,
-                    "top_k": 40
-                }
-            }
-            
             # Fazer a chamada para a API do Ollama
             start_time = time.time()
-            response = requests.post(f"{self.ollama_api_url}/generate", json=payload, timeout=120)
+            try:
+                response_data = await self.ollama.generate(
+                    self._generation_payload(prompt, model_context), timeout=120
+                )
+            except OllamaError as e:
+                print(f"Erro na API do Ollama: {e.status_code}")
+                print(f"Resposta: {e.text}")
+                LLM_REQUESTS.inc(mode="complete", outcome="error")
+                return {"response": f"Erro ao gerar resposta: API do Ollama retornou código {e.status_code}",
+                        "generated": False, "context": None}
             elapsed_time = time.time() - start_time
+            LLM_SECONDS.observe(elapsed_time, mode="complete")
+            # Contagens e durações do Ollama: prefill (prompt) e decode (geração)
+            record_ollama_stats("complete", response_data)
             
-            if response.status_code == 200:
-                response_data = response.json()
-                ia_response = response_data.get("response", "")
-                print(f"Resposta gerada em {elapsed_time:.2f} segundos")
-                
-                if ia_response and len(ia_response.strip()) > 5:
-                    # Processar a resposta para remover pensamento interno
-                    cleaned_response = self._clean_thinking_from_response(ia_response)
-                    return cleaned_response.strip()
-                else:
-                    return "O modelo não conseguiu gerar uma resposta adequada."
+            ia_response = response_data.get("response", "")
+            print(f"Resposta gerada em {elapsed_time:.2f} segundos")
+            
+            generated = bool(ia_response and len(ia_response.strip()) > 5)
+            LLM_REQUESTS.inc(mode="complete", outcome="generated" if generated else "empty")
+            if generated:
+                # Processar a resposta para remover pensamento interno
+                cleaned_response = self._clean_thinking_from_response(ia_response)
+                return {"response": cleaned_response.strip(), "generated": True,
+                        "context": response_data.get("context")}
             else:
-                print(f"Erro na API do Ollama: {response.status_code}")
-                print(f"Resposta: {response.text}")
-                return f"Erro ao gerar resposta: API do Ollama retornou código {response.status_code}"
+                return {"response": "O modelo não conseguiu gerar uma resposta adequada.", "generated": False,
+                        "context": None}
             
         except Exception as e:
             print(f"Erro ao gerar resposta via Ollama: {str(e)}")
             import traceback
             print(traceback.format_exc())
-            return self._fallback_response(prompt)
-            
+            LLM_REQUESTS.inc(mode="complete", outcome="error")
+            return {"response": self._fallback_response(prompt), "generated": False, "context": None}
+
+    async def stream_response(self, prompt: str, model_context: List[int] = None) -> AsyncIterator[Dict]:
+        """
+        Gera a resposta em streaming via API do Ollama.
+        Emite {"type": "token", "text": ...} conforme os tokens chegam (já sem o
+        raciocínio interno) e, ao final, {"type": "done", "response": ..., "stats": ...,
+        "generated": bool, "context": ...} com o tempo até o primeiro token e os tokens por segundo.
+        """
+        thinking_filter = StreamingThinkingFilter(self._clean_thinking_from_response)
+        visible_parts = []
+        final_chunk = {}
+        raw_tokens = 0
+        first_token_time = None
+        first_visible_time = None
+        # Resposta parcial (erro no meio do streaming) não conta como gerada
+        interrupted = False
+        start_time = time.perf_counter()
+
+        try:
+            print(f"Gerando resposta em streaming com modelo {self.model_name} via Ollama...")
+            async for chunk in self.ollama.stream_generate(self._generation_payload(prompt, model_context), timeout=120):
+                token = chunk.get("response", "")
+                if token:
+                    raw_tokens += 1
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter()
+                    visible = thinking_filter.feed(token)
+                    if visible:
+                        if first_visible_time is None:
+                            first_visible_time = time.perf_counter()
+                        visible_parts.append(visible)
+                        yield {"type": "token", "text": visible}
+                if chunk.get("done"):
+                    final_chunk = chunk
+                    break
+
+            tail = thinking_filter.finish()
+            if tail:
+                if first_visible_time is None:
+                    first_visible_time = time.perf_counter()
+                visible_parts.append(tail)
+                yield {"type": "token", "text": tail}
+        except OllamaError as e:
+            print(f"Erro na API do Ollama: {e.status_code}")
+            interrupted = True
+            LLM_REQUESTS.inc(mode="stream", outcome="error")
+            if not visible_parts:
+                yield {"type": "done",
+                       "response": f"Erro ao gerar resposta: API do Ollama retornou código {e.status_code}",
+                       "stats": {}, "generated": False, "context": None}
+                return
+        except Exception as e:
+            print(f"Erro ao gerar resposta em streaming via Ollama: {str(e)}")
+            interrupted = True
+            LLM_REQUESTS.inc(mode="stream", outcome="error")
+            if not visible_parts:
+                yield {"type": "done", "response": self._fallback_response(prompt), "stats": {}, "generated": False,
+                       "context": None}
+                return
+
+        elapsed = time.perf_counter() - start_time
+        eval_count = final_chunk.get("eval_count", raw_tokens)
+        eval_duration = final_chunk.get("eval_duration", 0) / 1e9
+        stats = {
+            "time_to_first_token": (first_token_time - start_time) if first_token_time else None,
+            "time_to_first_visible_token": (first_visible_time - start_time) if first_visible_time else None,
+            "total_seconds": elapsed,
+            "tokens": eval_count,
+            "tokens_per_second": eval_count / eval_duration if eval_duration > 0 else
+                                 (raw_tokens / elapsed if elapsed > 0 else 0.0),
+        }
+        print(f"Resposta em streaming: TTFT {stats['time_to_first_token'] or 0:.2f}s, "
+              f"{stats['tokens']} tokens, {stats['tokens_per_second']:.1f} tokens/s, total {elapsed:.2f}s")
+        LLM_SECONDS.observe(elapsed, mode="stream")
+        if first_token_time:
+            LLM_TIME_TO_FIRST_TOKEN.observe(first_token_time - start_time, mode="stream")
+        record_ollama_stats("stream", final_chunk)
+
+        answer = "".join(visible_parts).strip()
+        generated = len(answer) > 5 and not interrupted
+        if not interrupted:
+            LLM_REQUESTS.inc(mode="stream", outcome="generated" if generated else "empty")
+        if len(answer) <= 5:
+            answer = "O modelo não conseguiu gerar uma resposta adequada."
+        yield {"type": "done", "response": answer, "stats": stats, "generated": generated,
+               "context": final_chunk.get("context") if generated else None}
+
     def _clean_thinking_from_response(self, response: str) -> str:
         """
         Remove padrões de pensamento interno da resposta do modelo.
@@ -258,8 +742,11 @@ Responda de forma direta e concisa, baseando-se exclusivamente no conteúdo do P
         ]
         
         # Aplicar os padrões para limpar o texto
-        cleaned_text = response
         import re
+        # Blocos <think>...</think> do DeepSeek R1 (incluindo um fechamento sem abertura)
+        cleaned_text = re.sub(r"<think>.*?</think>", "", response, flags=re.DOTALL)
+        if "</think>" in cleaned_text:
+            cleaned_text = cleaned_text.split("</think>", 1)[1]
         
         # Verificar se há um padrão de reflexão seguido por uma resposta real
         for pattern in thinking_patterns:
@@ -314,31 +801,31 @@ Responda de forma direta e concisa, baseando-se exclusivamente no conteúdo do P
             
         return response
 
-    def add_to_history(self, question: str, answer: str):
-        """Adiciona uma interação ao histórico de conversa"""
-        self.conversation_history.append({"question": question, "answer": answer})
-        # Limitar o tamanho do histórico
-        if len(self.conversation_history) > self.max_history_length:
-            self.conversation_history = self.conversation_history[-self.max_history_length:]
-
-    def format_history(self) -> str:
+    def format_history(self, history: List[Dict] = None) -> str:
         """Formata o histórico de conversa para inclusão no prompt"""
-        if not self.conversation_history:
+        if history is None:
+            history = self.conversation_state()[0]
+        if not history:
             return ""
             
         history_text = "Histórico de conversa:\n"
-        for exchange in self.conversation_history:
+        for exchange in history:
             history_text += f"Pergunta: {exchange['question']}\n"
             history_text += f"Resposta: {exchange['answer']}\n\n"
             
         return history_text
 
-    def is_index_ready(self) -> bool:
+    def is_index_ready(self, document=None) -> bool:
         """Verifica se o índice FAISS está pronto para uso"""
-        return self.index is not None and len(self.text_chunks) > 0
+        target = self if document is None else document
+        return target.index is not None and len(target.text_chunks) > 0
 
     def truncate_context(self, text: str) -> str:
         """Limita o tamanho do contexto para não sobrecarregar o modelo"""
         if len(text) > self.max_context_length:
-            return text[:self.max_context_length] + "..."
+            truncated = text[:self.max_context_length]
+            sentence_end = max(truncated.rfind(". "), truncated.rfind("! "), truncated.rfind("? "))
+            if sentence_end > self.max_context_length // 2:
+                return truncated[:sentence_end + 1]
+            return truncated + "..."
         return text
\ No newline at end of file
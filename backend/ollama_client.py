@@ -0,0 +1,132 @@
+"""
+ollama_client.py - Cliente assíncrono para a API do Ollama
+
+Este módulo concentra toda a comunicação HTTP com o Ollama:
+1. Uma única sessão httpx.AsyncClient com conexões keep-alive reutilizadas
+2. Timeout configurável por chamada
+3. Novas tentativas com backoff exponencial para falhas transitórias
+   (conexão recusada, timeouts de conexão, respostas 5xx)
+4. Geração normal e em streaming (/api/generate) e listagem de modelos (/api/tags)
+
+Como nenhuma chamada bloqueia o loop de eventos, um único processo mantém várias
+gerações em andamento e continua respondendo a health checks e outros usuários.
+"""
+
+import asyncio
+import json
+import random
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+# Falhas em que vale a pena tentar de novo
+RETRYABLE_ERRORS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.PoolTimeout,
+    httpx.RemoteProtocolError,
+)
+RETRYABLE_STATUS = {500, 502, 503, 504}
+
+
+class OllamaError(Exception):
+    """Erro retornado pela API do Ollama (status HTTP diferente de 200)"""
+
+    def __init__(self, status_code: int, text: str = ""):
+        super().__init__(f"API do Ollama retornou código {status_code}")
+        self.status_code = status_code
+        self.text = text
+
+
+class AsyncOllamaClient:
+    def __init__(self, base_url: str, timeout: float = 120.0, max_retries: int = 2,
+                 backoff: float = 0.5, max_connections: int = 32):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_connections = max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Cria a sessão sob demanda (dentro do loop de eventos em execução)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._client
+
+    async def close(self):
+        """Fecha a sessão e suas conexões"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _sleep_before_retry(self, attempt: int):
+        delay = self.backoff * (2 ** attempt)
+        await asyncio.sleep(delay + random.uniform(0, delay / 2))
+
+    async def _request(self, method: str, path: str, timeout: float = None, **kwargs) -> httpx.Response:
+        """Faz a requisição com novas tentativas para falhas transitórias"""
+        client = self._get_client()
+        timeout = httpx.Timeout(timeout or self.timeout, connect=5.0)
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.request(method, path, timeout=timeout, **kwargs)
+            except RETRYABLE_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                await self._sleep_before_retry(attempt)
+                continue
+
+            if response.status_code in RETRYABLE_STATUS and attempt < self.max_retries:
+                await self._sleep_before_retry(attempt)
+                continue
+            return response
+        raise RuntimeError("Número de tentativas esgotado")
+
+    async def tags(self, timeout: float = 5.0) -> Dict:
+        """Lista os modelos disponíveis (/api/tags)"""
+        response = await self._request("GET", "/tags", timeout=timeout)
+        if response.status_code != 200:
+            raise OllamaError(response.status_code, response.text)
+        return response.json()
+
+    async def generate(self, payload: Dict, timeout: float = None) -> Dict:
+        """Gera uma resposta completa (/api/generate com stream=False)"""
+        response = await self._request("POST", "/generate", json={**payload, "stream": False}, timeout=timeout)
+        if response.status_code != 200:
+            raise OllamaError(response.status_code, response.text)
+        return response.json()
+
+    async def stream_generate(self, payload: Dict, timeout: float = None) -> AsyncIterator[Dict]:
+        """
+        Gera em streaming (/api/generate com stream=True), emitindo cada objeto JSON.
+        Novas tentativas só acontecem antes do primeiro byte da resposta.
+        """
+        client = self._get_client()
+        timeout = httpx.Timeout(timeout or self.timeout, connect=5.0)
+        body = {**payload, "stream": True}
+        started = False
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with client.stream("POST", "/generate", json=body, timeout=timeout) as response:
+                    if response.status_code in RETRYABLE_STATUS and attempt < self.max_retries:
+                        await self._sleep_before_retry(attempt)
+                        continue
+                    if response.status_code != 200:
+                        raise OllamaError(response.status_code, (await response.aread()).decode("utf-8", "replace"))
+                    async for line in response.aiter_lines():
+                        if line:
+                            started = True
+                            yield json.loads(line)
+                    return
+            except RETRYABLE_ERRORS:
+                if started or attempt == self.max_retries:
+                    raise
+                await self._sleep_before_retry(attempt)
@@ -0,0 +1,202 @@
+"""
+page_extractor.py - Extração de texto em camadas (rápida primeiro, layout só quando preciso)
+
+A extração com layout do pdfplumber (análise de caracteres e linhas do pdfminer)
+é a etapa mais cara do upload, e páginas só com imagem ou com pouco texto eram
+analisadas duas vezes. Este módulo extrai cada página em camadas:
+1. Sem texto: páginas sem fontes (ex: só imagens escaneadas) são detectadas
+   pelos recursos da página e não passam por nenhuma extração
+2. Rápida: texto direto do content stream com o PyPDF2, sem análise de layout
+3. Layout: pdfplumber com as tolerâncias padrão, só para páginas cujo resultado
+   rápido parece quebrado (pouco texto, caracteres ilegíveis, palavras coladas
+   ou letras separadas por espaços)
+4. Layout solto: pdfplumber com tolerâncias maiores, se o layout padrão ainda
+   devolver pouco texto
+
+O PyPDF2 lê o arquivo mapeado em memória (mmap): recebendo só o caminho, ele
+copiaria o PDF inteiro para um BytesIO. Assim um PDF grande não vira um pico
+de memória do mesmo tamanho por upload simultâneo.
+
+A camada usada fica registrada em cada página ("tier"), para acompanhar quantas
+páginas precisaram da extração cara. O prazo da página (cancellation.PageBudget)
+é verificado antes de cada camada.
+"""
+
+import mmap
+import threading
+from typing import Optional, Tuple
+
+import pdfplumber
+from PyPDF2 import PdfReader
+
+from cancellation import OperationCancelled, PageBudget
+
+TIER_EMPTY = "empty"
+TIER_FAST = "fast"
+TIER_LAYOUT = "layout"
+TIER_LOOSE = "layout-loose"
+
+
+class TieredExtractor:
+    """Configuração da extração em camadas (enviada também aos processos trabalhadores)"""
+
+    def __init__(self, fast_tier: bool = True, min_chars: int = 10, min_alnum_ratio: float = 0.5,
+                 max_average_word_length: float = 20.0, max_single_char_ratio: float = 0.5,
+                 max_unreadable_ratio: float = 0.02):
+        # False: sempre usa o pdfplumber (comportamento anterior)
+        self.fast_tier = fast_tier
+        # Menos caracteres que isso: a página é reextraída na camada seguinte
+        self.min_chars = min_chars
+        # Limites da heurística de qualidade do resultado rápido
+        self.min_alnum_ratio = min_alnum_ratio
+        self.max_average_word_length = max_average_word_length
+        self.max_single_char_ratio = max_single_char_ratio
+        self.max_unreadable_ratio = max_unreadable_ratio
+
+    @property
+    def version(self) -> str:
+        """Identifica as opções (entra na chave do cache em disco)"""
+        return "tiered" if self.fast_tier else "layout"
+
+    def looks_broken(self, text: Optional[str]) -> bool:
+        """True se o texto da camada rápida parece incompleto ou ilegível"""
+        if not text:
+            return True
+        words = text.split()
+        chars = sum(len(word) for word in words)
+        if chars < self.min_chars:
+            return True
+        # Glifos sem mapeamento para Unicode
+        unreadable = text.count("\ufffd") + text.count("(cid:") * 5
+        if unreadable > chars * self.max_unreadable_ratio:
+            return True
+        alnum = sum(1 for char in text if char.isalnum())
+        if alnum < chars * self.min_alnum_ratio:
+            return True
+        # Palavras coladas (espaços perdidos na ordem do content stream)
+        if chars / len(words) > self.max_average_word_length:
+            return True
+        # Letras soltas ("t e x t o"): espaçamento que só a análise de layout resolve
+        single = sum(1 for word in words if len(word) == 1)
+        return len(words) >= 10 and single > len(words) * self.max_single_char_ratio
+
+    def open(self, file_path: str) -> "ExtractionSession":
+        return ExtractionSession(file_path, self)
+
+
+def _may_contain_text(page) -> bool:
+    """False se a página certamente não tem texto (sem fontes e sem formulários com conteúdo próprio)"""
+    resources = page.get("/Resources")
+    if resources is None:
+        return False
+    resources = resources.get_object()
+    if "/Font" in resources:
+        return True
+    xobjects = resources.get("/XObject")
+    if xobjects is None:
+        return False
+    # Imagens não têm texto; formulários (Form XObject) podem ter
+    return any(xobject.get_object().get("/Subtype") != "/Image" for xobject in xobjects.get_object().values())
+
+
+class ExtractionSession:
+    """Um PDF aberto para extração em camadas (o pdfplumber só é aberto se alguma página precisar)"""
+
+    def __init__(self, file_path: str, extractor: TieredExtractor):
+        self.file_path = file_path
+        self.extractor = extractor
+        self._file = None
+        self._mapped = None
+        self._plumber = None
+        self._reader = self._open_reader(file_path) if extractor.fast_tier else None
+        # O PdfReader compartilha um único arquivo; as threads de extração se revezam nele
+        self._reader_lock = threading.Lock()
+        self._plumber_lock = threading.Lock()
+
+    def _open_reader(self, file_path: str) -> PdfReader:
+        """PdfReader sobre o arquivo mapeado em memória (ou sobre o próprio arquivo, se o mmap falhar)"""
+        self._file = open(file_path, "rb")
+        try:
+            self._mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            self._mapped = None
+        try:
+            return PdfReader(self._mapped if self._mapped is not None else self._file)
+        except Exception:
+            self.close()
+            raise
+
+    def __len__(self) -> int:
+        if self._reader is not None:
+            return len(self._reader.pages)
+        return len(self._layout_pdf().pages)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._plumber is not None:
+            self._plumber.close()
+            self._plumber = None
+        self._reader = None
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _layout_pdf(self):
+        with self._plumber_lock:
+            if self._plumber is None:
+                self._plumber = pdfplumber.open(self.file_path)
+            return self._plumber
+
+    def extract(self, index: int, budget: PageBudget = None) -> Tuple[str, str]:
+        """Texto bruto da página `index` e a camada que o produziu"""
+        budget = budget or PageBudget()
+        fast_text = ""
+        if self._reader is not None:
+            budget.check()
+            with self._reader_lock:
+                page = self._reader.pages[index]
+                try:
+                    if not _may_contain_text(page):
+                        return "", TIER_EMPTY
+                    fast_text = page.extract_text() or ""
+                except OperationCancelled:
+                    raise
+                except Exception:
+                    fast_text = ""
+            if not self.extractor.looks_broken(fast_text):
+                return fast_text, TIER_FAST
+
+        budget.check()
+        text, tier = self._extract_layout(index, budget)
+        if not text and fast_text.strip():
+            # O layout não trouxe nada melhor que o resultado rápido
+            return fast_text, TIER_FAST
+        return text, tier
+
+    def _extract_layout(self, index: int, budget: PageBudget) -> Tuple[str, str]:
+        page = self._layout_pdf().pages[index]
+        try:
+            # Garante que está usando a MediaBox
+            page.bbox = page.mediabox
+            text = page.extract_text(x_tolerance=3, y_tolerance=3)
+            if text and len(text.strip()) >= self.extractor.min_chars:
+                return text, TIER_LAYOUT
+            budget.check()
+            try:
+                # Tentar com tolerâncias maiores
+                return page.extract_text(x_tolerance=5, y_tolerance=10) or text or "", TIER_LOOSE
+            except OperationCancelled:
+                raise
+            except Exception:
+                return text or "", TIER_LAYOUT
+        finally:
+            # Liberar objetos de layout já usados para conter a memória
+            page.flush_cache()
@@ -0,0 +1,262 @@
+"""
+page_store.py - Armazenamento compacto de páginas e trechos
+
+Para documentos muito grandes mantidos em memória, uma lista de dicionários por
+página (mais uma segunda cópia do texto em cada trecho indexado) custa caro.
+Este módulo guarda:
+1. Todo o texto do documento num único buffer (as páginas separadas por "\\n\\n")
+2. Offsets, tamanhos e metadados de cada página em arrays tipados (valores
+   textuais repetidos, como idioma e camada de extração, como códigos)
+3. Os trechos indexados apenas como intervalos (início, fim) sobre o mesmo buffer
+
+O buffer é consolidado só por quem escreve (append, sob lock) e publicado como
+um TextSegments imutável: segmentos de páginas inteiras, fundidos quando o
+anterior não é maior que o novo (como um contador binário). Assim ficam
+O(log n) segmentos e cada caractere é copiado O(log n) vezes, em vez de o buffer
+inteiro ser refeito a cada lote. Os leitores (busca, Document) pegam o retrato
+publicado, sem lock, e ele nunca muda depois disso.
+
+O processador, o índice e o retrato imutável (Document) compartilham os mesmos
+segmentos, sem cópias. Para compatibilidade, indexar o PageStore devolve um
+dicionário montado sob demanda ({"number", "content", "word_count", ...}).
+"""
+
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from collections.abc import Sequence
+from typing import Dict, Iterable, List, Tuple
+
+PAGE_SEPARATOR = "\n\n"
+
+
+def dominant_language(page_languages: Iterable[Tuple[str, int]]) -> str:
+    """Idioma do documento: o mais frequente entre as páginas, ponderado pelo número de palavras"""
+    weights = Counter()
+    for language, word_count in page_languages:
+        if language and language != "N/A":
+            weights[language] += max(word_count, 1)
+    return weights.most_common(1)[0][0] if weights else "N/A"
+
+
+class _CodeColumn:
+    """Coluna de valores textuais repetidos (idioma, camada...) guardada como códigos de 1 byte"""
+
+    def __init__(self):
+        self.ids = array("b")
+        self.codes: List[str] = []
+
+    def append(self, value: str):
+        if value not in self.codes:
+            self.codes.append(value)
+        self.ids.append(self.codes.index(value))
+
+    def __getitem__(self, index: int) -> str:
+        return self.codes[self.ids[index]]
+
+    def values(self) -> Tuple[str, ...]:
+        codes = self.codes
+        return tuple(codes[value_id] for value_id in self.ids)
+
+    def counts(self) -> Dict[str, int]:
+        return {self.codes[value_id]: count for value_id, count in sorted(Counter(self.ids).items())}
+
+
+class TextSegments:
+    """Retrato imutável do buffer de texto: segmentos de páginas inteiras e onde cada um começa"""
+
+    __slots__ = ("segments", "starts", "length")
+
+    def __init__(self, segments: Tuple[str, ...] = (), starts: Tuple[int, ...] = ()):
+        self.segments = segments
+        self.starts = starts
+        self.length = starts[-1] + len(segments[-1]) if segments else 0
+
+    def slice(self, start: int, end: int) -> str:
+        """Texto entre os offsets (não atravessa páginas, então fica num único segmento)"""
+        if start >= end:
+            return ""
+        position = bisect_right(self.starts, start) - 1
+        base = self.starts[position]
+        return self.segments[position][start - base:end - base]
+
+    def head(self, max_chars: int) -> str:
+        """Primeiros `max_chars` caracteres, lidos dos segmentos (sem montar o texto completo)"""
+        parts = []
+        remaining = max_chars
+        for segment in self.segments:
+            if remaining <= 0:
+                break
+            parts.append(segment[:remaining])
+            remaining -= len(parts[-1])
+        return parts[0] if len(parts) == 1 else "".join(parts)
+
+    def join(self) -> str:
+        """Texto completo (sem cópia quando há um único segmento)"""
+        if len(self.segments) == 1:
+            return self.segments[0]
+        return "".join(self.segments)
+
+    def __len__(self) -> int:
+        return self.length
+
+
+class PageStore(Sequence):
+    def __init__(self):
+        # Retrato publicado do texto; trocado inteiro (sob _lock) a cada página adicionada
+        self._view = TextSegments()
+        self._lock = threading.Lock()
+        self.offsets = array("q")
+        self.lengths = array("l")
+        self.numbers = array("l")
+        self.word_counts = array("l")
+        self.success = array("b")
+        # Idioma detectado e camada de extração usada em cada página
+        self.languages = _CodeColumn()
+        self.tiers = _CodeColumn()
+        self._index_by_number: Dict[int, int] = {}
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[Dict]) -> "PageStore":
+        """Cria o armazenamento a partir de páginas no formato de dicionário"""
+        store = cls()
+        for page in pages:
+            store.append(page)
+        return store
+
+    def append(self, page: Dict):
+        """Adiciona uma página ao fim do buffer"""
+        content = page.get("content") or ""
+        with self._lock:
+            view = self._view
+            offset = view.length
+            segments = list(view.segments)
+            starts = list(view.starts)
+            segments.append(content + PAGE_SEPARATOR)
+            starts.append(offset)
+            while len(segments) > 1 and len(segments[-2]) <= len(segments[-1]):
+                tail = segments.pop()
+                starts.pop()
+                segments[-1] += tail
+            # Publicar o texto antes dos metadados: quem vê a página já encontra o conteúdo
+            self._view = TextSegments(tuple(segments), tuple(starts))
+
+            number = page.get("number", len(self.numbers) + 1)
+            self.offsets.append(offset)
+            self.lengths.append(len(content))
+            self.word_counts.append(page.get("word_count", len(content.split())))
+            self.success.append(1 if page.get("extracted_success", True) else 0)
+            self.languages.append(page.get("language", "N/A"))
+            self.tiers.append(page.get("tier", "N/A"))
+            self._index_by_number[number] = len(self.numbers)
+            self.numbers.append(number)
+
+    @property
+    def view(self) -> TextSegments:
+        """Retrato imutável do texto de todas as páginas adicionadas até agora"""
+        return self._view
+
+    @property
+    def text(self) -> str:
+        """Texto de todas as páginas num único buffer"""
+        return self._view.join()
+
+    def content(self, index: int) -> str:
+        """Texto da página na posição `index`"""
+        start = self.offsets[index]
+        return self._view.slice(start, start + self.lengths[index])
+
+    def index_of(self, number: int) -> int:
+        """Posição da página com o número informado"""
+        return self._index_by_number[number]
+
+    @property
+    def total_words(self) -> int:
+        return sum(self.word_counts)
+
+    @property
+    def page_languages(self) -> Tuple[str, ...]:
+        return self.languages.values()
+
+    def tier_counts(self) -> Dict[str, int]:
+        """Quantas páginas foram extraídas por cada camada (ver page_extractor.py)"""
+        return self.tiers.counts()
+
+    def dominant_language(self) -> str:
+        return dominant_language(zip(self.page_languages, self.word_counts))
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return {
+            "number": self.numbers[index],
+            "content": self.content(index),
+            "word_count": self.word_counts[index],
+            "extracted_success": bool(self.success[index]),
+            "language": self.languages[index],
+            "tier": self.tiers[index],
+        }
+
+    def memory_usage(self) -> int:
+        """Bytes ocupados pelo buffer de texto e pelos arrays de metadados"""
+        size = sum(sys.getsizeof(segment) for segment in self._view.segments)
+        for values in (self.offsets, self.lengths, self.numbers, self.word_counts, self.success,
+                       self.languages.ids, self.tiers.ids):
+            size += values.buffer_info()[1] * values.itemsize
+        return size
+
+
+class ChunkStore(Sequence):
+    """Trechos indexados como intervalos sobre o buffer de um PageStore"""
+
+    def __init__(self, page_store: PageStore):
+        self.page_store = page_store
+        self.starts = array("q")
+        self.ends = array("q")
+        self.pages = array("l")
+        self.metadata = _ChunkMetadata(self)
+
+    def extend(self, chunks: Iterable[Dict]):
+        """Adiciona trechos ({"page", "start", "end"} relativos à página)"""
+        for chunk in chunks:
+            page_offset = self.page_store.offsets[self.page_store.index_of(chunk["page"])]
+            self.starts.append(page_offset + chunk["start"])
+            self.ends.append(page_offset + chunk["end"])
+            self.pages.append(chunk["page"])
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        # O texto só é copiado para os trechos efetivamente lidos (resultados da busca)
+        return self.page_store.view.slice(self.starts[index], self.ends[index])
+
+    def memory_usage(self) -> int:
+        return sum(values.buffer_info()[1] * values.itemsize for values in (self.starts, self.ends, self.pages))
+
+
+class _ChunkMetadata(Sequence):
+    """Visão de metadados ({"page", "start", "end"}) de um ChunkStore"""
+
+    def __init__(self, chunks: ChunkStore):
+        self._chunks = chunks
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        chunks = self._chunks
+        page = chunks.pages[index]
+        page_offset = chunks.page_store.offsets[chunks.page_store.index_of(page)]
+        return {"page": page, "start": chunks.starts[index] - page_offset, "end": chunks.ends[index] - page_offset}
@@ -12,73 +12,151 @@ Utiliza várias bibliotecas para processamento de PDF, incluindo PyPDF2 e pdfmin
 permitindo a extração eficiente de conteúdo mesmo de PDFs complexos.
 """
 
-import pdfplumber
 import logging
-import re
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterator, List, Optional
 import concurrent.futures
-from functools import lru_cache
-from langdetect import detect, LangDetectException
-import math # Adicionado para math.ceil
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+import os
+import threading
 import time
+from cancellation import (CancellationToken, OperationCancelled, PageBudget, REASON_ERROR, REASON_PAGE_BUDGET,
+                          page_alarm)
+from chunker import TextChunker
+from language_detector import LanguageDetector
+from metrics import PAGE_EXTRACTION_SECONDS, STAGE_SECONDS
+from page_extractor import TieredExtractor
+from page_store import PageStore
+from request_profiler import profiled
+from text_normalizer import TextNormalizer
 
 # Configurar logging
 logging.getLogger("pdfminer").setLevel(logging.WARNING)
 # Configurar logging langdetect
 logging.getLogger('langdetect').setLevel(logging.WARNING)
 
+# Versão do pipeline de extração/limpeza; alterar invalida o cache em disco
+EXTRACTOR_VERSION = "tiered-1"
+
+# Pool de processos compartilhado entre uploads (criado sob demanda)
+_process_pool = None
+_process_pool_workers = 0
+_process_pool_lock = threading.Lock()
+# Processador usado dentro de cada processo trabalhador
+_worker_processor = None
+
+
+def _get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Retorna o pool de processos compartilhado, recriando-o se o tamanho mudar"""
+    global _process_pool, _process_pool_workers
+    with _process_pool_lock:
+        if _process_pool is None or _process_pool_workers != max_workers:
+            if _process_pool is not None:
+                _process_pool.shutdown(wait=False)
+            # "spawn" evita herdar threads/locks do servidor (torch, uvicorn) via fork
+            _process_pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _process_pool_workers = max_workers
+        return _process_pool
+
+
+def shutdown_process_pool():
+    """Encerra o pool de processos compartilhado (chamado no desligamento do servidor)"""
+    global _process_pool, _process_pool_workers
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+            _process_pool_workers = 0
+
+
+def _extract_page_range(file_path: str, start: int, end: int, normalizer: "TextNormalizer" = None,
+                        extractor: "TieredExtractor" = None, token: CancellationToken = None) -> List[Dict]:
+    """
+    Executado no processo trabalhador: abre o PDF e extrai as páginas [start, end).
+    Cada processo tem seu próprio interpretador, então o layout do pdfminer roda
+    em paralelo de verdade (sem disputar o GIL). Aqui a página que estoura o
+    orçamento é interrompida de fato (ver cancellation.page_alarm), e o
+    cancelamento pedido pelo processo principal é visto entre as páginas
+    (arquivo de cancelamento do token).
+    """
+    global _worker_processor
+    if _worker_processor is None:
+        logging.getLogger('pdfminer').setLevel(logging.ERROR)
+        _worker_processor = PDFProcessor()
+    # Mesmas opções de normalização e extração do processador que enviou a tarefa
+    _worker_processor.normalizer = normalizer or TextNormalizer()
+    _worker_processor.extractor = extractor or TieredExtractor()
+
+    results = []
+    with _worker_processor.extractor.open(file_path) as session:
+        for i in range(start, end):
+            reason = token.reason if token is not None else None
+            if reason is not None:
+                # Cancelado (ex: cliente desconectou): liberar o processo sem abrir as páginas restantes
+                results.extend({"number": number, "skipped": reason} for number in range(i + 1, end + 1))
+                break
+            result = _worker_processor._process_page(session, i + 1, token)
+            if result:
+                results.append(result)
+    return results
+
+
+def _discard_when_done(futures, token: CancellationToken):
+    """Remove o arquivo de cancelamento do token quando todas as tarefas terminarem"""
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def on_done(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            token.discard_cancel_file()
+
+    if not futures:
+        token.discard_cancel_file()
+    for future in futures:
+        future.add_done_callback(on_done)
+
 
 class PDFProcessor:
-    def __init__(self):
-        self.pages = []
+    def __init__(self, extraction_mode: str = "thread", max_workers: int = None, pages_per_task: int = 8,
+                 normalizer: TextNormalizer = None, extractor: TieredExtractor = None,
+                 chunker: TextChunker = None):
+        # Texto das páginas num buffer único com metadados em arrays (ver page_store.py)
+        self.pages = PageStore()
         self.pdf_loaded = False
-        self._executor = ThreadPoolExecutor(max_workers=4)
+        # "thread": threads no mesmo processo; "process": pool de processos por intervalo de páginas
+        self.extraction_mode = extraction_mode
+        self.max_workers = max_workers or (os.cpu_count() or 4)
+        self.pages_per_task = pages_per_task
+        self.total_pages = 0
         self.total_words = 0
-        self.detected_language = "N/A" # Novo atributo
+        self.chunker = chunker or TextChunker()
+        # Idioma de cada página detectado na extração (uma vez por documento)
+        self.language_detector = LanguageDetector()
+        self.normalizer = normalizer or TextNormalizer()
+        # Extração em camadas: PyPDF2 primeiro, pdfplumber só para páginas problemáticas
+        self.extractor = extractor or TieredExtractor()
+        # Páginas puladas na última extração: [{"number", "skipped": motivo}]
+        self.skipped_pages: List[Dict] = []
 
-    @lru_cache(maxsize=100)
     def clean_text(self, text: Optional[str]) -> str: # Adicionado Optional
-        """Limpa o texto extraído"""
-        if not text:
-            return ""
-        # Remover caracteres especiais e espaços extras
-        text = re.sub(r'\s+', ' ', text)
-        # Remover caracteres não imprimíveis
-        text = ''.join(char for char in text if char.isprintable())
-        return text.strip()
+        """Limpa o texto extraído (ver text_normalizer.py)"""
+        return self.normalizer.normalize(text)
 
     def process_pdf(self, file_path: str):
-        """Lê e extrai texto de um PDF usando pdfplumber"""
+        """Lê e extrai texto de um PDF (extração em camadas, ver page_extractor.py)"""
         print("Iniciando processamento do PDF...")
-        self.pages = []
+        self.pages = PageStore()
         self.pdf_loaded = False
         
         try:
-            # Suprime avisos específicos do pdfplumber
-            logging.getLogger('pdfminer').setLevel(logging.ERROR)
-            
-            with pdfplumber.open(file_path) as pdf:
-                total_pages = len(pdf.pages)
-                print(f"Total de páginas encontradas: {total_pages}")
-                
-                # Processar páginas em paralelo
-                with ThreadPoolExecutor(max_workers=4) as executor:
-                    futures = []
-                    for i, page in enumerate(pdf.pages):
-                        futures.append(
-                            executor.submit(self._process_page, page, i + 1)
-                        )
-                    
-                    # Coletar resultados
-                    for future in futures:
-                        try:
-                            result = future.result()
-                            if result:
-                                self.pages.append(result)
-                        except Exception as e:
-                            print(f"Erro ao processar página: {str(e)}")
-                            continue
+            for page in self.iter_pages(file_path):
+                self.pages.append(page)
 
             if not self.pages:
                 print("Nenhuma página foi processada com sucesso.")
@@ -93,37 +171,172 @@ class PDFProcessor:
             self.pdf_loaded = False
             return False, f"Erro ao processar PDF: {str(e)}", []
 
-    def _process_page(self, page, page_number):
-        """Processa uma única página do PDF"""
+    def iter_pages(self, file_path: str, token: CancellationToken = None) -> Iterator[Dict]:
+        """
+        Extrai as páginas e as entrega em ordem assim que ficam prontas,
+        permitindo que limpeza, chunking e embeddings avancem em paralelo.
+        O total de páginas fica disponível em self.total_pages antes da primeira página.
+
+        Com um token, a extração respeita os orçamentos de tempo e para quando ele é
+        cancelado; as páginas não extraídas ficam em self.skipped_pages.
+        """
+        # Suprime avisos específicos do pdfplumber
+        logging.getLogger('pdfminer').setLevel(logging.ERROR)
+        token = token or CancellationToken()
+        self.skipped_pages = []
+
+        with self.extractor.open(file_path) as session:
+            self.total_pages = len(session)
+            print(f"Total de páginas encontradas: {self.total_pages}")
+
+            if self.extraction_mode != "process" or self.total_pages <= self.pages_per_task:
+                yield from self._without_skipped(self._extract_with_threads(session, token))
+                return
+
+        yield from self._without_skipped(self._extract_with_processes(file_path, self.total_pages, token))
+
+    def _without_skipped(self, pages: Iterator[Dict]) -> Iterator[Dict]:
+        """Registra as páginas puladas (orçamento, cancelamento ou erro) e as métricas, e entrega as demais"""
+        for page in pages:
+            if "skipped" in page:
+                self.skipped_pages.append(page)
+                continue
+            # Tempos medidos no trabalhador (thread ou processo): registrados aqui, no servidor
+            timings = page.pop("timings", None)
+            if timings:
+                PAGE_EXTRACTION_SECONDS.observe(timings["extraction"], tier=page["tier"])
+                STAGE_SECONDS.observe(timings["cleaning"], stage="page_cleaning")
+            yield page
+
+    @staticmethod
+    def _wait(future, token: CancellationToken, page_budget: Callable[[], Optional[PageBudget]] = None,
+              poll_interval: float = 0.25):
+        """
+        Resultado do future, desistindo (OperationCancelled) se o token for cancelado
+        antes ou, com `page_budget` (prazo da página, conhecido quando ela começa),
+        se a página passar do prazo. Nas threads o alarme não interrompe a página:
+        ela é registrada como pulada e as seguintes continuam.
+        """
+        while True:
+            if future.done():
+                return future.result()
+            token.check()
+            budget = page_budget() if page_budget is not None else None
+            if budget is not None and budget.deadline is not None and time.time() >= budget.deadline:
+                raise OperationCancelled(REASON_PAGE_BUDGET)
+            try:
+                return future.result(timeout=poll_interval)
+            except concurrent.futures.TimeoutError:
+                continue
+
+    def _extract_with_threads(self, session, token: CancellationToken) -> Iterator[Dict]:
+        """Extrai as páginas com threads no processo atual"""
+        executor = ThreadPoolExecutor(max_workers=min(4, self.max_workers))
+        # Prazo de cada página, definido quando uma thread começa a processá-la
+        budgets: Dict[int, PageBudget] = {}
+
+        def process(page_number):
+            budget = budgets[page_number] = token.page()
+            return self._process_page(session, page_number, token, budget)
+
+        # No perfil de uma requisição, as threads do pool entram nele enquanto processam as páginas
+        process = profiled(process)
         try:
-            # Garante que está usando a MediaBox
-            page.bbox = page.mediabox
-            text = page.extract_text(x_tolerance=3, y_tolerance=3)
-            
-            # Tenta extrair texto com configurações alternativas se estiver vazio
-            if not text or len(text.strip()) < 10:
+            futures = []
+            for i in range(len(session)):
+                futures.append(executor.submit(process, i + 1))
+
+            # Coletar resultados na ordem das páginas
+            for page_number, future in enumerate(futures, 1):
+                try:
+                    result = self._wait(future, token, lambda: budgets.get(page_number))
+                    if result:
+                        yield result
+                except OperationCancelled as e:
+                    yield {"number": page_number, "skipped": e.reason}
+                except Exception as e:
+                    print(f"Erro ao processar página: {str(e)}")
+                    continue
+        finally:
+            # Não esperar páginas em andamento nem iniciar as pendentes (elas param no próximo ponto de verificação)
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _extract_with_processes(self, file_path: str, total_pages: int, token: CancellationToken) -> Iterator[Dict]:
+        """Divide o documento em intervalos de páginas e extrai cada um num processo"""
+        pool = _get_process_pool(self.max_workers)
+        # Os trabalhadores recebem uma cópia do token: o cancelamento chega a eles por arquivo
+        token.share_with_processes()
+        futures = []
+        for start in range(0, total_pages, self.pages_per_task):
+            end = min(start + self.pages_per_task, total_pages)
+            futures.append((start, end, pool.submit(
+                _extract_page_range, file_path, start, end, self.normalizer, self.extractor, token
+            )))
+        print(f"Extração em {len(futures)} tarefas com até {self.max_workers} processos")
+
+        # Os futures estão na ordem das páginas, então a junção preserva a ordem
+        try:
+            for start, end, future in futures:
                 try:
-                    # Tentar com configurações diferentes
-                    text = page.extract_text(x_tolerance=5, y_tolerance=10)
-                except:
-                    pass
-                    
+                    yield from self._wait(future, token)
+                except OperationCancelled as e:
+                    # Cancelar o intervalo se ainda não começou; se já começou, o trabalhador
+                    # vê o cancelamento (ou o prazo) antes da próxima página e libera o processo
+                    future.cancel()
+                    for number in range(start + 1, end + 1):
+                        yield {"number": number, "skipped": e.reason}
+                except Exception as e:
+                    # Processo falhou (ou morreu): as páginas do intervalo contam como puladas
+                    print(f"Erro ao processar as páginas {start + 1}-{end}: {str(e)}")
+                    for number in range(start + 1, end + 1):
+                        yield {"number": number, "skipped": f"{REASON_ERROR}: {e}"}
+        finally:
+            # Consumidor desistiu (erro/cancelamento): não deixar tarefas pendentes no pool
+            # nem intervalos em andamento ocupando processos
+            pending = [future for _, _, future in futures if not future.cancel() and not future.done()]
+            if pending:
+                token.signal_workers()
+            _discard_when_done([future for _, _, future in futures], token)
+
+    def _process_page(self, session, page_number, token: CancellationToken = None, budget: PageBudget = None):
+        """Processa uma única página do PDF (session: ExtractionSession do documento)"""
+        if budget is None and token is not None:
+            budget = token.page()
+        try:
+            start = time.perf_counter()
+            with page_alarm(budget.remaining() if budget is not None else None):
+                text, tier = session.extract(page_number - 1, budget)
+            extracted = time.perf_counter()
+
             if text:
                 # Limpar o texto para melhorar a qualidade
                 text = self.clean_text(text)
+                cleaned = time.perf_counter()
                 words = text.split()
                 
                 return {
                     "number": page_number,
                     "content": text,
                     "word_count": len(words),
-                    "extracted_success": True
+                    "extracted_success": True,
+                    "language": self.language_detector.detect_page(text),
+                    "tier": tier,
+                    "timings": {"extraction": extracted - start, "cleaning": cleaned - extracted},
                 }
             return None
+        except OperationCancelled as e:
+            print(f"Página {page_number} pulada ({e.reason})")
+            return {"number": page_number, "skipped": e.reason}
         except Exception as e:
             print(f"Erro ao processar página {page_number}: {str(e)}")
             return None
 
+    def load_pages(self, pages: List[Dict]):
+        """Carrega páginas já extraídas (ex: vindas do cache em disco)"""
+        self.pages = pages if isinstance(pages, PageStore) else PageStore.from_pages(pages)
+        self.pdf_loaded = bool(self.pages)
+        return self.pdf_loaded
+
     def is_loaded(self):
         """Retorna True se o PDF foi carregado corretamente."""
         return self.pdf_loaded
@@ -141,6 +354,16 @@ class PDFProcessor:
             # Fallback para formato simplificado
             return [page.get("content", "") for page in self.pages if page.get("content")]
 
+    def get_chunks_for_indexing(self):
+        """Retorna os trechos (com página e offsets) das páginas para indexação"""
+        if not self.pages:
+            print("Nenhuma página disponível para indexação.")
+            return []
+
+        chunks = self.chunker.chunk_pages(self.pages)
+        print(f"{len(self.pages)} páginas divididas em {len(chunks)} trechos.")
+        return chunks
+
     def get_statistics(self):
         """Retorna estatísticas do PDF processado"""
         if not self.pages:
@@ -155,7 +378,7 @@ class PDFProcessor:
             }
         
         total_pages = len(self.pages)
-        total_words = sum(page["word_count"] for page in self.pages)
+        total_words = self.pages.total_words
         average_words = total_words / total_pages if total_pages > 0 else 0
         
         return {
@@ -165,36 +388,13 @@ class PDFProcessor:
             "processed_pages": total_pages,
             "total_words": total_words,
             "average_words_per_page": average_words,
-            "language": "pt"  # Assumindo português por padrão
+            "language": self.pages.dominant_language()
         }
 
     def detect_language(self) -> str:
-        """Detecta o idioma principal do texto extraído."""
+        """Idioma principal do texto extraído (páginas já detectadas na extração, ponderadas pelas palavras)"""
         if not self.pages:
             return "N/A"
-
-        # Usar uma amostra do texto para detecção (primeiras N páginas ou M caracteres)
-        sample_text = " ".join(p["content"] for p in self.pages[:5]) # Amostra das 5 primeiras páginas
-        sample_text = sample_text[:2000] # Limitar a 2000 caracteres
-
-        if not sample_text:
-             return "N/A"
-
-        try:
-            lang = detect(sample_text)
-            print(f"Idioma detectado: {lang}")
-            return lang
-        except LangDetectException:
-            print("Não foi possível detectar o idioma.")
-            return "N/A"
-        except Exception as e:
-            print(f"Erro na detecção de idioma: {e}")
-            return "N/A"
-
-    def __del__(self):
-        """Cleanup ao destruir a instância"""
-        if self._executor:
-            self._executor.shutdown(wait=True)
-            print("Recurso Executor liberado.")
+        return self.pages.dominant_language()
 
 # Remover get_summary e outros métodos não utilizados se houver
@@ -0,0 +1,288 @@
+"""
+request_profiler.py - Perfil sob demanda de requisições lentas (upload e chat)
+
+Quando um PDF específico demora para ser ingerido, as métricas mostram em qual
+etapa o tempo foi, mas não em qual função. Este módulo permite perfilar uma
+requisição isolada, sem custo quando desligado:
+1. StackSampler: amostrador em uma thread própria que lê, em intervalos fixos
+   (sys._current_frames), só as pilhas das threads da requisição: a thread do
+   loop de eventos e as threads que executam o trabalho que ela entrega
+   (extração, limpeza, embeddings), marcadas por profiled() enquanto o executam.
+   Threads ociosas dos pools e o trabalho de outras requisições ficam de fora
+2. ProfileStore: grava cada perfil no formato de pilhas colapsadas ("folded",
+   aceito pelo flamegraph.pl e pelo speedscope), com os metadados ao lado, pelo
+   ID da requisição. Mantém só os perfis mais recentes
+3. RequestProfiler: decide quais requisições perfilar. Pode ser pelo cabeçalho
+   X-Profile (com o token de administração) ou por /admin/profile, que arma as
+   próximas N requisições
+4. ProfilingMiddleware: middleware ASGI puro. Só é instalado com um token
+   configurado e, para as demais requisições, apenas repassa a chamada
+
+O amostrador mede tempo de parede: as threads da requisição aparecem esperando
+quando param, o que também mostra quanto tempo ela passou aguardando o Ollama ou
+as filas. O loop de eventos é compartilhado, então corrotinas de requisições
+concorrentes ainda podem aparecer na pilha dele.
+Páginas extraídas no pool de processos (PDF_EXTRACTION_MODE=process) rodam em
+outros processos e não aparecem no perfil. Para ver o pdfplumber e a limpeza
+página a página, perfile com PDF_EXTRACTION_MODE=thread.
+"""
+
+import functools
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+
+class StackSampler:
+    """Amostra as pilhas das threads da requisição até stop()"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        # Threads amostradas: ident -> quantas execuções da requisição estão em andamento nela
+        self._threads: Counter = Counter()
+        self._threads_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        """Começa a amostrar, a partir da thread que chama (a do loop de eventos)"""
+        self.add_thread(threading.get_ident())
+        self._thread.start()
+
+    def add_thread(self, ident: int):
+        with self._threads_lock:
+            self._threads[ident] += 1
+
+    def remove_thread(self, ident: int):
+        with self._threads_lock:
+            self._threads[ident] -= 1
+            if self._threads[ident] <= 0:
+                del self._threads[ident]
+
+    def stop(self) -> Counter:
+        """Para a amostragem e retorna {pilha colapsada: número de amostras}"""
+        self._stop.set()
+        self._thread.join()
+        return self._stacks
+
+    def _run(self):
+        names: Dict[int, str] = {}
+        while not self._stop.wait(self.interval):
+            with self._threads_lock:
+                threads = list(self._threads)
+            frames = sys._current_frames()
+            for ident in threads:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                self._stacks[self._collapse(names.get(ident, str(ident)), frame)] += 1
+            self.samples += 1
+
+    @staticmethod
+    def _collapse(thread_name: str, frame) -> str:
+        """Pilha no formato colapsado: "thread;externa;...;interna" (função, arquivo e linha da definição)"""
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stack.append(thread_name)
+        return ";".join(part.replace(";", ",") for part in reversed(stack))
+
+
+# Amostrador da requisição em andamento (propagado às threads por profiled())
+_ACTIVE_SAMPLER: ContextVar[Optional[StackSampler]] = ContextVar("request_profiler_sampler", default=None)
+
+
+def profiled(fn: Callable) -> Callable:
+    """
+    Envolve `fn`, entregue a outra thread, para que essa thread entre no perfil da
+    requisição atual enquanto a executa (repassando o perfil ao que ela entregar a
+    outras threads). Sem perfil ativo, devolve `fn` sem mudanças.
+    """
+    sampler = _ACTIVE_SAMPLER.get()
+    if sampler is None:
+        return fn
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        ident = threading.get_ident()
+        sampler.add_thread(ident)
+        token = _ACTIVE_SAMPLER.set(sampler)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _ACTIVE_SAMPLER.reset(token)
+            sampler.remove_thread(ident)
+
+    return run
+
+
+class ProfileStore:
+    """Perfis gravados em disco: <id>.folded (pilhas) e <id>.json (metadados)"""
+
+    def __init__(self, directory: str, max_profiles: int = 50):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, profile_id: str, extension: str) -> str:
+        if not re.fullmatch(r"[0-9a-f]{32}", profile_id or ""):
+            raise KeyError(profile_id)
+        return os.path.join(self.directory, f"{profile_id}.{extension}")
+
+    def save(self, profile_id: str, stacks: Counter, metadata: Dict):
+        folded = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        with self._lock:
+            with open(self._path(profile_id, "folded"), "w", encoding="utf-8") as f:
+                f.write(folded)
+            with open(self._path(profile_id, "json"), "w", encoding="utf-8") as f:
+                json.dump({"id": profile_id, **metadata}, f)
+            self._prune()
+
+    def _prune(self):
+        """Remove os perfis mais antigos além de max_profiles"""
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in entries[:max(0, len(entries) - self.max_profiles)]:
+            profile_id = entry.name[:-len(".json")]
+            for extension in ("json", "folded"):
+                try:
+                    os.remove(os.path.join(self.directory, f"{profile_id}.{extension}"))
+                except OSError:
+                    pass
+
+    def list(self) -> List[Dict]:
+        """Metadados dos perfis gravados, do mais recente ao mais antigo"""
+        profiles = []
+        with self._lock:
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    with open(entry.path, encoding="utf-8") as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return sorted(profiles, key=lambda profile: profile.get("started_at", 0), reverse=True)
+
+    def folded_path(self, profile_id: str) -> Optional[str]:
+        """Caminho das pilhas colapsadas do perfil (None se não existir)"""
+        try:
+            path = self._path(profile_id, "folded")
+        except KeyError:
+            return None
+        return path if os.path.exists(path) else None
+
+
+class RequestProfiler:
+    """Quais requisições perfilar e onde guardar os perfis"""
+
+    def __init__(self, token: str, store: ProfileStore, paths: Iterable[str] = ("/upload-pdf", "/chat"),
+                 interval: float = 0.005):
+        self.token = token
+        self.store = store
+        # Prefixos: "/chat" cobre também "/chat/stream"
+        self.paths = tuple(paths)
+        self.interval = interval
+        self.armed = 0
+        self._lock = threading.Lock()
+
+    def authorized(self, value: Optional[str]) -> bool:
+        return bool(value) and hmac.compare_digest(value.encode("utf-8"), self.token.encode("utf-8"))
+
+    def arm(self, count: int) -> int:
+        """Perfila as próximas `count` requisições dos caminhos monitorados; retorna quantas estão armadas"""
+        with self._lock:
+            self.armed = max(0, count)
+            return self.armed
+
+    def should_profile(self, path: str, header: Optional[bytes]) -> bool:
+        if not path.startswith(self.paths):
+            return False
+        if header is not None and self.authorized(header.decode("latin-1")):
+            return True
+        with self._lock:
+            if self.armed > 0:
+                self.armed -= 1
+                return True
+        return False
+
+    def get_stats(self) -> Dict:
+        return {"armed": self.armed, "paths": list(self.paths), "interval": self.interval,
+                "directory": self.store.directory}
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI: envolve as requisições selecionadas pelo RequestProfiler num StackSampler"""
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = next((value for name, value in scope["headers"] if name == PROFILE_HEADER), None)
+        if not self.profiler.should_profile(scope["path"], header):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        status = {"code": None}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (PROFILE_ID_HEADER, profile_id.encode("ascii"))]}
+            await send(message)
+
+        sampler = StackSampler(self.profiler.interval)
+        started_at = time.time()
+        start = time.perf_counter()
+        sampler.start()
+        active = _ACTIVE_SAMPLER.set(sampler)
+        try:
+            # Inclui o corpo inteiro da resposta (ex: streaming SSE até o evento "done")
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _ACTIVE_SAMPLER.reset(active)
+            stacks = await run_in_threadpool(sampler.stop)
+            duration = time.perf_counter() - start
+            metadata = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status["code"],
+                "started_at": started_at,
+                "duration_seconds": duration,
+                "samples": sampler.samples,
+                "interval": self.profiler.interval,
+            }
+            try:
+                await run_in_threadpool(self.profiler.store.save, profile_id, stacks, metadata)
+                print(f"Perfil {profile_id} gravado: {scope['method']} {scope['path']} em {duration:.2f}s "
+                      f"({sampler.samples} amostras)")
+            except OSError as e:
+                print(f"Não foi possível gravar o perfil {profile_id}: {str(e)}")
@@ -0,0 +1,125 @@
+"""
+scheduler.py - Controle de admissão e filas limitadas de trabalho
+
+Este módulo limita o trabalho simultâneo do servidor:
+1. Cada tipo de trabalho (ingestão de PDFs, geração de respostas) tem sua
+   própria fila com limite de concorrência e limite de espera
+2. Quando a fila está cheia, a requisição é rejeitada na hora (HTTP 429 com
+   Retry-After) em vez de esperar até estourar o timeout
+3. Profundidade da fila, tempo de espera e rejeições ficam disponíveis como
+   métricas para dimensionar a capacidade
+
+Todas as operações rodam no loop de eventos (asyncio), sem threads adicionais.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict
+
+
+class QueueFullError(Exception):
+    """A fila de trabalho está cheia; o cliente deve tentar de novo mais tarde"""
+
+    def __init__(self, queue_name: str, retry_after: int):
+        super().__init__(f"Fila '{queue_name}' cheia, tente novamente em {retry_after}s")
+        self.queue_name = queue_name
+        self.retry_after = retry_after
+
+
+class WorkQueue:
+    def __init__(self, name: str, max_concurrency: int, max_waiting: int, sample_size: int = 1000):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self._wait_times = deque(maxlen=sample_size)
+        self._service_times = deque(maxlen=sample_size)
+
+    def retry_after(self) -> int:
+        """Estimativa (em segundos) de quando haverá espaço na fila"""
+        service = (sum(self._service_times) / len(self._service_times)) if self._service_times else 1.0
+        return max(1, math.ceil(service * (self.waiting + 1) / self.max_concurrency))
+
+    def check_admission(self):
+        """Rejeita (QueueFullError) se a fila estiver cheia, sem ocupar vaga"""
+        if self.in_flight >= self.max_concurrency and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise QueueFullError(self.name, self.retry_after())
+
+    async def acquire(self) -> float:
+        """Entra na fila (ou é rejeitado se estiver cheia). Retorna o instante de início."""
+        self.check_admission()
+
+        self.waiting += 1
+        enqueued = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        started = time.perf_counter()
+        self._wait_times.append(started - enqueued)
+        self.in_flight += 1
+        self.admitted += 1
+        return started
+
+    def release(self, started: float):
+        """Libera a vaga ocupada desde `started`"""
+        self.in_flight -= 1
+        self.completed += 1
+        self._service_times.append(time.perf_counter() - started)
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Ocupa uma vaga durante o bloco `async with`"""
+        started = await self.acquire()
+        try:
+            yield
+        finally:
+            self.release(started)
+
+    @staticmethod
+    def _percentile(values, fraction: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def get_stats(self) -> Dict:
+        """Métricas da fila: profundidade, vagas em uso e tempos de espera"""
+        wait_times = list(self._wait_times)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_waiting": self.max_waiting,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_seconds_avg": sum(wait_times) / len(wait_times) if wait_times else 0.0,
+            "wait_seconds_p50": self._percentile(wait_times, 0.50),
+            "wait_seconds_p95": self._percentile(wait_times, 0.95),
+            "wait_seconds_max": max(wait_times) if wait_times else 0.0,
+        }
+
+
+class Scheduler:
+    def __init__(self, ingestion_concurrency: int = 2, ingestion_waiting: int = 8,
+                 generation_concurrency: int = 4, generation_waiting: int = 16):
+        self.ingestion = WorkQueue("ingestion", ingestion_concurrency, ingestion_waiting)
+        self.generation = WorkQueue("generation", generation_concurrency, generation_waiting)
+
+    def get_stats(self) -> Dict:
+        return {
+            "ingestion": self.ingestion.get_stats(),
+            "generation": self.generation.get_stats(),
+        }
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Módulos do backend são importados pelo nome (from thinking_filter import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
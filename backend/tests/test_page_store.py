@@ -0,0 +1,36 @@
+from document import Document
+from page_store import ChunkStore, PageStore
+
+
+def _page(number, content):
+    return {"number": number, "content": content, "word_count": len(content.split())}
+
+
+def test_pages_and_chunks_read_from_published_segments():
+    store = PageStore.from_pages(_page(n, f"página {n} " * 3) for n in range(1, 101))
+    assert len(store.view.segments) <= 8
+    assert store.content(41) == "página 42 " * 3
+    assert store.text == "".join(f"{'página %d ' % n * 3}\n\n" for n in range(1, 101))
+
+    chunks = ChunkStore(store)
+    chunks.extend([{"page": 42, "start": 0, "end": 9}, {"page": 100, "start": 11, "end": 21}])
+    assert list(chunks) == ["página 42", "página 100"]
+
+
+def test_snapshot_is_not_changed_by_later_pages():
+    store = PageStore.from_pages([_page(1, "primeira"), _page(2, "segunda")])
+    document = Document.from_page_store(store)
+    store.append(_page(3, "terceira"))
+
+    assert document.page_count == 2
+    assert document.full_text == "primeira\n\nsegunda\n\n"
+    assert document.page_text(1) == "segunda"
+    assert store.content(2) == "terceira"
+
+
+def test_head_reads_the_start_across_segments():
+    store = PageStore.from_pages(_page(n, "abcd") for n in range(1, 8))
+    document = Document.from_page_store(store)
+    assert len(store.view.segments) > 1
+    assert document.head(15) == "abcd\n\nabcd\n\nabc"
+    assert document.head(1000) == document.full_text
@@ -0,0 +1,23 @@
+from text_normalizer import TextNormalizer
+
+
+def test_collapses_whitespace_and_removes_non_printable():
+    assert TextNormalizer().normalize("  a\t\tb\n\nc\x00d  ") == "a b cd"
+
+
+def test_dehyphenates_words_across_line_breaks():
+    normalizer = TextNormalizer(dehyphenate=True)
+    assert normalizer.normalize("infor-\nmação") == "informação"
+    assert normalizer.normalize("infor- \r\n  mação") == "informação"
+
+
+def test_keeps_hyphens_between_numbers():
+    normalizer = TextNormalizer(dehyphenate=True)
+    assert normalizer.normalize("páginas 10-\n20") == "páginas 10- 20"
+    assert normalizer.normalize("CNPJ 12.345.678/0001-\n90") == "CNPJ 12.345.678/0001- 90"
+    assert normalizer.normalize("cláusula 3-\nA") == "cláusula 3- A"
+    assert normalizer.normalize("item A-\n1") == "item A- 1"
+
+
+def test_dehyphenation_is_optional():
+    assert TextNormalizer().normalize("infor-\nmação") == "infor- mação"
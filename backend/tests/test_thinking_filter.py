@@ -0,0 +1,53 @@
+from thinking_filter import StreamingThinkingFilter
+
+
+def run(chunks, head_chars=200):
+    """Alimenta o filtro pedaço a pedaço; retorna (saída por pedaço, texto final)"""
+    thinking_filter = StreamingThinkingFilter(lambda text: text, head_chars=head_chars)
+    outputs = [thinking_filter.feed(chunk) for chunk in chunks]
+    outputs.append(thinking_filter.finish())
+    return outputs, "".join(outputs)
+
+
+def split_every(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_removes_think_block():
+    _, text = run(["<think>raciocínio</think>", "Resposta final."])
+    assert text == "Resposta final."
+
+
+def test_tags_split_across_chunks():
+    raw = "<think>pensando no contrato</think>O prazo é de doze meses."
+    for size in range(1, len(raw)):
+        _, text = run(split_every(raw, size))
+        assert text == "O prazo é de doze meses.", size
+
+
+def test_missing_open_tag():
+    _, text = run(["Preciso achar o prazo", " no contrato.", "</thi", "nk>O prazo é de doze meses."])
+    assert text == "O prazo é de doze meses."
+
+
+def test_missing_open_tag_longer_than_head():
+    reasoning = "Okay, the user wants the deadline. " * 40
+    raw = reasoning + "</think>O prazo é de doze meses."
+    outputs, text = run(split_every(raw, 7), head_chars=200)
+    assert len(reasoning) > 200
+    assert text == "O prazo é de doze meses."
+    assert all("</think>" not in output and "Okay" not in output for output in outputs)
+
+
+def test_without_tags_releases_everything_at_the_end():
+    outputs, text = run(["O prazo ", "é de doze ", "meses."])
+    assert text == "O prazo é de doze meses."
+    assert outputs[:-1] == ["", "", ""]
+
+
+def test_streams_after_reasoning():
+    answer = "Resposta longa sobre o documento. " * 20
+    outputs, text = run(["</think>"] + split_every(answer, 10), head_chars=50)
+    assert text == answer
+    # Depois do início da resposta, os pedaços passam direto
+    assert outputs[-2] == split_every(answer, 10)[-1]
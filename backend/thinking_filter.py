@@ -0,0 +1,118 @@
+"""
+thinking_filter.py - Remoção incremental do raciocínio interno do modelo
+
+Versão em streaming da limpeza feita por ModelManager._clean_thinking_from_response:
+1. Descarta os blocos <think>...</think> do DeepSeek R1 conforme os tokens chegam,
+   inclusive quando uma tag vem quebrada entre dois pedaços
+2. Até a primeira tag, segura toda a saída: o R1 costuma omitir a abertura
+   (ela vem no template do prompt) e o raciocínio só termina no "</think>",
+   por mais longo que seja. Sem nenhuma tag, a saída é liberada no fim
+3. Segura o início da resposta visível (algumas centenas de caracteres) para
+   aplicar as heurísticas de "pensamento" em inglês antes de liberá-lo
+4. Depois disso, repassa cada pedaço imediatamente ao cliente
+
+Assim o raciocínio é suprimido em tempo real, sem esperar a resposta completa.
+"""
+
+import re
+from typing import Callable
+
+OPEN_TAG = "<think>"
+CLOSE_TAG = "</think>"
+TRAILING_WHITESPACE = re.compile(r'\s*$')
+
+
+def _partial_suffix(text: str, tag: str) -> int:
+    """Tamanho do maior sufixo de `text` que é prefixo (incompleto) de `tag`"""
+    for size in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:size]):
+            return size
+    return 0
+
+
+class StreamingThinkingFilter:
+    def __init__(self, clean_head: Callable[[str], str], head_chars: int = 200):
+        self.clean_head = clean_head
+        self.head_chars = head_chars
+        self._pending = ""
+        self._in_think = False
+        self._head = ""
+        self._head_done = False
+        # Texto anterior à primeira tag: raciocínio se ela for um "</think>" sem abertura
+        self._unresolved = ""
+        self._tag_seen = False
+
+    def feed(self, text: str) -> str:
+        """Recebe um pedaço bruto do modelo e retorna o texto que pode ser exibido"""
+        self._pending += text
+        return self._release(self._consume_tags(final=False), final=False)
+
+    def finish(self) -> str:
+        """Libera o que restou ao fim da geração"""
+        return self._release(self._consume_tags(final=True), final=True)
+
+    def _consume_tags(self, final: bool) -> str:
+        """Remove os blocos <think> de self._pending, guardando tags incompletas"""
+        visible = []
+        while self._pending:
+            if self._in_think:
+                end = self._pending.find(CLOSE_TAG)
+                if end == -1:
+                    keep = 0 if final else _partial_suffix(self._pending, CLOSE_TAG)
+                    self._pending = self._pending[len(self._pending) - keep:] if keep else ""
+                    break
+                self._pending = self._pending[end + len(CLOSE_TAG):]
+                self._in_think = False
+                continue
+
+            start = self._pending.find(OPEN_TAG)
+            end = self._pending.find(CLOSE_TAG)
+            if end != -1 and (start == -1 or end < start) and not self._tag_seen:
+                # "</think>" sem abertura (a tag de abertura veio no template do prompt):
+                # tudo antes dela era raciocínio
+                self._tag_seen = True
+                self._unresolved = ""
+                self._pending = self._pending[end + len(CLOSE_TAG):]
+                continue
+            if start == -1:
+                keep = 0 if final else max(_partial_suffix(self._pending, OPEN_TAG),
+                                            _partial_suffix(self._pending, CLOSE_TAG))
+                cut = len(self._pending) - keep
+                visible.append(self._pending[:cut])
+                self._pending = self._pending[cut:]
+                break
+            visible.append(self._pending[:start])
+            self._pending = self._pending[start + len(OPEN_TAG):]
+            self._in_think = True
+            if not self._tag_seen:
+                # A abertura veio antes de qualquer fechamento: o texto anterior é resposta
+                self._tag_seen = True
+                visible.insert(0, self._unresolved)
+                self._unresolved = ""
+
+        if not self._tag_seen:
+            # Nenhuma tag ainda: pode ser raciocínio sem abertura; só libera no fim
+            self._unresolved += "".join(visible)
+            if not final:
+                return ""
+            visible = [self._unresolved]
+            self._unresolved = ""
+        return "".join(visible)
+
+    def _release(self, visible: str, final: bool) -> str:
+        """Segura o início da resposta até poder limpá-lo; depois repassa direto"""
+        if self._head_done:
+            return visible
+
+        self._head += visible
+        if not final and len(self._head) < self.head_chars and not (
+                "\n\n" in self._head.lstrip() and len(self._head.strip()) >= 40):
+            return ""
+
+        self._head_done = True
+        head = self._head
+        self._head = ""
+        cleaned = self.clean_head(head)
+        if not cleaned:
+            return ""
+        return cleaned + TRAILING_WHITESPACE.search(head).group()
@@ -0,0 +1,87 @@
+"""
+upload_limit.py - Limite de tamanho aplicado enquanto o upload chega
+
+O FastAPI só chama o endpoint depois de receber o corpo multipart inteiro (e
+gravá-lo num arquivo temporário), então um limite verificado no endpoint só vale
+depois que todos os bytes chegaram. Este middleware ASGI aplica o limite antes:
+1. Content-Length acima do limite: responde 413 sem ler o corpo
+2. Sem Content-Length (envio em blocos) ou com um valor falso: conta os bytes
+   recebidos e interrompe a leitura assim que o limite é ultrapassado,
+   respondendo 413 no lugar da resposta do endpoint
+
+Como o corpo é lido aqui, o middleware também mede a recepção (etapa
+upload_receive): da primeira leitura do corpo até o último bloco recebido.
+
+As demais rotas passam direto, sem nenhum custo adicional.
+"""
+
+import json
+import time
+from typing import Iterable
+
+from metrics import STAGE_SECONDS
+
+
+class UploadLimitMiddleware:
+    def __init__(self, app, max_bytes: int, paths: Iterable[str] = ("/upload-pdf",)):
+        self.app = app
+        self.max_bytes = max_bytes
+        # Prefixos: "/upload-pdf" cobre também "/upload-pdf/stream"
+        self.paths = tuple(paths)
+
+    async def _reject(self, send):
+        body = json.dumps({
+            "detail": f"Arquivo PDF excede o limite de {self.max_bytes // (1024 ** 2)} MB."
+        }).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("ascii")),
+                        (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = next((value for name, value in scope["headers"] if name == b"content-length"), None)
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        state = {"received": 0, "exceeded": False, "rejected": False, "started": None}
+
+        async def limited_receive():
+            if state["exceeded"]:
+                return {"type": "http.disconnect"}
+            if state["started"] is None:
+                state["started"] = time.perf_counter()
+            message = await receive()
+            if message["type"] == "http.request":
+                state["received"] += len(message.get("body", b""))
+                if state["received"] > self.max_bytes:
+                    # Parar a leitura: o endpoint vê o corpo como interrompido
+                    state["exceeded"] = True
+                    return {"type": "http.disconnect"}
+                if not message.get("more_body", False):
+                    STAGE_SECONDS.observe(time.perf_counter() - state["started"], stage="upload_receive")
+            return message
+
+        async def guarded_send(message):
+            if not state["exceeded"]:
+                await send(message)
+            elif not state["rejected"]:
+                # Trocar a resposta do endpoint (erro de leitura do corpo) pelo 413
+                state["rejected"] = True
+                await self._reject(send)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not state["exceeded"]:
+                raise
+        if state["exceeded"] and not state["rejected"]:
+            state["rejected"] = True
+            await self._reject(send)
@@ -0,0 +1,91 @@
+"""
+vector_index.py - Escolha e construção do índice vetorial (FAISS)
+
+A busca exata (força bruta) é ótima para documentos pequenos, mas vira o
+gargalo quando há muitos trechos. Este módulo escolhe o tipo de índice pelo
+tamanho do corpus:
+1. Abaixo de `hnsw_min_vectors`: IndexFlatIP (busca exata)
+2. Entre `hnsw_min_vectors` e `ivf_min_vectors`: HNSW (grafo), com efSearch configurado
+3. A partir de `ivf_min_vectors`: IVF com nlist ≈ 4·√n listas, treinado numa
+   amostra dos vetores, com nprobe ajustado automaticamente
+
+Todos os índices usam produto interno sobre vetores normalizados, ou seja,
+similaridade de cosseno (a métrica do all-MiniLM).
+"""
+
+import math
+from typing import Optional
+
+import faiss
+import numpy as np
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    """Normaliza os vetores (norma L2 = 1) no próprio array float32 contíguo"""
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    faiss.normalize_L2(embeddings)
+    return embeddings
+
+
+class IndexBuilder:
+    def __init__(self, hnsw_min_vectors: int = 20000, ivf_min_vectors: int = 500000,
+                 hnsw_m: int = 32, ef_construction: int = 80, ef_search: int = 64,
+                 nprobe: Optional[int] = None, nprobe_fraction: float = 0.03, min_nprobe: int = 8):
+        self.hnsw_min_vectors = hnsw_min_vectors
+        self.ivf_min_vectors = ivf_min_vectors
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        # nprobe fixo; se None, é uma fração do número de listas (nunca abaixo de min_nprobe)
+        self.nprobe = nprobe
+        self.nprobe_fraction = nprobe_fraction
+        self.min_nprobe = min_nprobe
+
+    def choose(self, count: int) -> str:
+        """Tipo de índice ("flat", "hnsw" ou "ivf") para `count` vetores"""
+        if count >= self.ivf_min_vectors:
+            return "ivf"
+        if count >= self.hnsw_min_vectors:
+            return "hnsw"
+        return "flat"
+
+    def new_flat(self, dim: int):
+        """Índice exato vazio, usado enquanto a ingestão em streaming está em andamento"""
+        return faiss.IndexFlatIP(dim)
+
+    def build(self, embeddings: np.ndarray, kind: str = None):
+        """Constrói e popula o índice para os vetores (já normalizados)"""
+        count, dim = embeddings.shape
+        kind = kind or self.choose(count)
+
+        if kind == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = self.ef_construction
+        elif kind == "ivf":
+            nlist = max(1, min(count // 39, int(4 * math.sqrt(count))))
+            quantizer = faiss.IndexFlatIP(dim)
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            # Treinar numa amostra (até 256 vetores por lista) para limitar o custo do k-means
+            sample_size = min(count, 256 * nlist)
+            if sample_size < count:
+                rng = np.random.default_rng(0)
+                sample = embeddings[np.sort(rng.choice(count, sample_size, replace=False))]
+            else:
+                sample = embeddings
+            index.train(sample)
+        else:
+            index = faiss.IndexFlatIP(dim)
+
+        index.add(embeddings)
+        self.configure(index)
+        print(f"Índice vetorial {kind} criado com {count} vetores")
+        return index
+
+    def configure(self, index):
+        """Aplica os parâmetros de busca (efSearch/nprobe), inclusive em índices vindos do cache"""
+        if hasattr(index, "hnsw"):
+            index.hnsw.efSearch = max(self.ef_search, 1)
+        if hasattr(index, "nprobe"):
+            nprobe = self.nprobe or max(self.min_nprobe, int(round(index.nlist * self.nprobe_fraction)))
+            index.nprobe = min(nprobe, index.nlist)
+        return index
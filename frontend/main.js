@@ -19,6 +19,8 @@ class ChatApp {
 
         // Estado
         this.isPdfUploaded = false;
+        this.documentId = null;
+        this.conversationId = null;
         this.isDarkMode = true;
 
         // Elementos de loading
@@ -149,42 +151,35 @@ class ChatApp {
         formData.append('file', file);
 
         try {
-            const xhr = new XMLHttpRequest();
-
-            // Configura o evento de progresso
-            xhr.upload.addEventListener('progress', (e) => {
-                if (e.lengthComputable) {
-                    const progress = (e.loaded / e.total) * 100;
-                    this.updateProgress(progress);
-                }
-            });
-
-            // Configura o evento de conclusão
-            xhr.addEventListener('load', () => {
-                if (xhr.status === 200) {
-                    const data = JSON.parse(xhr.responseText);
-                    this.isPdfUploaded = true;
-                    this.uploadArea.style.display = 'none';
-                    this.chatMessages.style.display = 'block';
-                    this.inputArea.style.display = 'flex';
-                    this.messageInput.disabled = false;
-                    this.sendButton.disabled = false;
-                    this.addMessage('Sistema', data.statistics, 'bot');
-                } else {
-                    const data = JSON.parse(xhr.responseText);
-                    this.addMessage('Sistema', 'Erro ao processar o PDF: ' + data.error, 'bot');
-                }
-            });
-
-            // Configura o evento de erro
-            xhr.addEventListener('error', () => {
-                this.addMessage('Sistema', 'Erro ao enviar o arquivo', 'bot');
+            // Upload com progresso da ingestão via Server-Sent Events
+            const response = await fetch('http://localhost:8000/upload-pdf/stream', {
+                method: 'POST',
+                body: formData
             });
 
-            // Inicia o upload
-            xhr.open('POST', 'http://localhost:8000/upload-pdf');
-            xhr.send(formData);
+            if (!response.ok) {
+                const data = await response.json();
+                this.addMessage('Sistema', 'Erro ao processar o PDF: ' + (data.detail || response.statusText), 'bot');
+                return;
+            }
 
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                // Cada evento SSE termina com uma linha em branco
+                let separator;
+                while ((separator = buffer.indexOf('\n\n')) !== -1) {
+                    const rawEvent = buffer.slice(0, separator);
+                    buffer = buffer.slice(separator + 2);
+                    this.handleUploadEvent(rawEvent);
+                }
+            }
         } catch (error) {
             this.addMessage('Sistema', 'Erro ao enviar o arquivo: ' + error.message, 'bot');
         } finally {
@@ -194,6 +189,53 @@ class ChatApp {
         }
     }
 
+    handleUploadEvent(rawEvent) {
+        const dataLine = rawEvent.split('\n').find(line => line.startsWith('data: '));
+        if (!dataLine) return;
+        const event = JSON.parse(dataLine.slice(6));
+
+        switch (event.event) {
+            case 'registered':
+                this.documentId = event.document_id;
+                // Nova conversa por documento: histórico próprio no servidor
+                this.conversationId = window.crypto && crypto.randomUUID
+                    ? crypto.randomUUID()
+                    : Date.now().toString(36) + Math.random().toString(36).slice(2);
+                break;
+            case 'page':
+                if (event.total_pages) {
+                    this.updateProgress((event.page / event.total_pages) * 100);
+                }
+                break;
+            case 'indexed':
+                // Primeiro lote indexado: o documento já pode ser consultado
+                if (!this.isPdfUploaded) {
+                    this.enableChat();
+                    this.addMessage('Sistema', 'O PDF ainda está sendo processado. As respostas usam as páginas já indexadas.', 'bot');
+                }
+                break;
+            case 'done':
+                this.documentId = event.document_id;
+                this.enableChat();
+                this.addMessage('Sistema', event.statistics, 'bot');
+                break;
+            case 'error':
+                this.addMessage('Sistema', 'Erro ao processar o PDF: ' + event.message, 'bot');
+                break;
+        }
+    }
+
+    enableChat() {
+        // Já habilitado no primeiro lote: não reabilitar o envio durante uma pergunta
+        if (this.isPdfUploaded) return;
+        this.isPdfUploaded = true;
+        this.uploadArea.style.display = 'none';
+        this.chatMessages.style.display = 'block';
+        this.inputArea.style.display = 'flex';
+        this.messageInput.disabled = false;
+        this.sendButton.disabled = false;
+    }
+
     async sendMessage() {
         const message = this.messageInput.value.trim();
         if (!message) return;
@@ -214,24 +256,53 @@ class ChatApp {
             this.chatMessages.appendChild(typingDiv);
             this.chatMessages.scrollTop = this.chatMessages.scrollHeight;
 
-            const response = await fetch('http://localhost:8000/chat', {
+            // Resposta em streaming (SSE): tokens aparecem conforme o modelo gera
+            const response = await fetch('http://localhost:8000/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ message })
+                body: JSON.stringify({ message, document_id: this.documentId, conversation_id: this.conversationId })
             });
 
-            const data = await response.json();
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            const typingText = typingDiv.querySelector('p');
+            let buffer = '';
+            let streamedText = '';
+            let finalEvent = null;
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                let separator;
+                while ((separator = buffer.indexOf('\n\n')) !== -1) {
+                    const rawEvent = buffer.slice(0, separator);
+                    buffer = buffer.slice(separator + 2);
+                    const dataLine = rawEvent.split('\n').find(line => line.startsWith('data: '));
+                    if (!dataLine) continue;
+
+                    const event = JSON.parse(dataLine.slice(6));
+                    if (event.event === 'token') {
+                        streamedText += event.text;
+                        typingText.textContent = streamedText;
+                        this.chatMessages.scrollTop = this.chatMessages.scrollHeight;
+                    } else if (event.event === 'done') {
+                        finalEvent = event;
+                    }
+                }
+            }
 
-            // Remover indicador de digitação
+            // Remover indicador de digitação e exibir a resposta final formatada
             this.chatMessages.removeChild(typingDiv);
 
-            if (data.success) {
-                this.addMessage('Assistente', data.response, 'bot');
+            if (finalEvent && finalEvent.success) {
+                this.addMessage('Assistente', finalEvent.response, 'bot');
             } else {
                 // Tratar erro na resposta
-                this.addMessage('Sistema', data.response || 'Ocorreu um erro ao processar sua pergunta.', 'bot');
+                this.addMessage('Sistema', (finalEvent && finalEvent.response) || 'Ocorreu um erro ao processar sua pergunta.', 'bot');
             }
         } catch (error) {
             console.error('Erro ao enviar mensagem:', error);